@@ -1,15 +1,34 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Request, Query
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import uvicorn
 import os
-import shutil
-from fastapi.responses import FileResponse, JSONResponse
+import json
+import time
+import uuid
+import asyncio
+import functools
+import threading
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware # Import CORS
 
-from movie import MovieGenerator
-from yc_coach import YCCoach, get_project
+from jobs import JobManager, QueueFullError, RENDER_WORKERS, scratch_estimate
+from scratch import ScratchSpace, ScratchSpaceError, SCRATCH_JANITOR_INTERVAL
+from movie import RENDER_ENGINES, DEFAULT_IMAGE_SIZE, image_durations_for
+from preview import PreviewRenderer, DEFAULT_PREVIEW_DIR, PREVIEW_FPS
+from ffmpeg_engine import OUTPUT_FORMATS
+from image_cache import ImageCache
+from audio_cache import SoundtrackCache
+from catalog import MediaCatalog, CatalogError
+from blobs import BlobStore
+from uploads import (
+    MAX_UPLOAD_BYTES, ResumableUploads, UploadBusyError, UploadError, UploadNotFoundError, UploadTooLargeError,
+    iter_file, safe_filename, write_stream_atomic,
+)
+from render_cache import RenderCache, render_cache_key, file_digest
+from media_response import media_file_response
+from llm import llm_clients, estimate_tokens
 
 
 # Remove YC Coach parts for this example if not strictly needed for the UI
@@ -46,12 +65,108 @@ os.makedirs(IMAGE_DIR, exist_ok=True)
 os.makedirs(VIDEO_DIR, exist_ok=True)
 os.makedirs(UPLOADED_VIDEOS_DIR, exist_ok=True)
 
+# Catalog media type -> directory it indexes
+CATALOG_DIRS = {
+    "music": MUSIC_DIR,
+    "image": IMAGE_DIR,
+    "uploaded_video": UPLOADED_VIDEOS_DIR,
+    "generated_video": VIDEO_DIR,
+}
+CATALOG_RECONCILE_INTERVAL = int(os.getenv("CATALOG_RECONCILE_INTERVAL", "300"))
+BLOB_MEDIA_TYPES = ("music", "image", "uploaded_video") # Uploaded media, stored once per distinct content
+STREAM_CHUNK_SIZE = 256 * 1024
+STREAM_POLL_INTERVAL = 0.25 # seconds between checks for newly encoded bytes
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "100"))
+# Previews and contact sheets rendering at once in the API process; more are refused with 429 like a full render queue
+PREVIEW_CONCURRENCY = int(os.getenv("PREVIEW_CONCURRENCY", str(RENDER_WORKERS)))
+MAX_BATCHES = 200 # Batch reports kept for /video/batches/{batch_id}
+MAX_RENDITIONS = 6 # Sizes per /video/generate request, all encoded by one ffmpeg process
+
+# Renders run in a separate process pool (sized by RENDER_WORKERS / RENDER_QUEUE_DEPTH), or with
+# RENDER_BACKEND=queue on render_worker.py processes that share the render queue database
+job_manager = JobManager()
+# Same scratch location as the render workers: used to refuse jobs on a full disk and to reap orphans
+scratch_space = ScratchSpace()
+# Identical render requests are served from this cache (size budget: RENDER_CACHE_MAX_BYTES)
+render_cache = RenderCache(VIDEO_DIR)
+# Uploaded images are pre-normalized to the render resolution so renders skip decode/resize
+image_cache = ImageCache()
+soundtrack_cache = SoundtrackCache()
+# Draft renders and contact sheets are made in the API process: they take well under a second
+preview_renderer = PreviewRenderer(image_cache, soundtrack_cache)
+preview_slots = asyncio.Semaphore(max(1, PREVIEW_CONCURRENCY))
+# Part files live under ASSETS_DIR so completing an upload is a same-filesystem rename
+resumable_uploads = ResumableUploads(os.path.join(ASSETS_DIR, ".uploads"))
+# Listings are served from this index instead of scanning the directories
+catalog = MediaCatalog(os.path.join(ASSETS_DIR, "catalog.db"))
+# Uploaded files are stored once per content (assets/blobs) and linked under each name they were uploaded as
+blob_store = BlobStore()
+
+# The LLM agents import LangChain and the OpenAI SDK, over a second of a worker's boot, so they are
+# built on first use. API_WARMUP ("llm", "render" or "all", comma separated) loads them at startup instead.
+WARMUP_SUBSYSTEMS = ("llm", "render")
+API_WARMUP = [name.strip() for name in os.getenv("API_WARMUP", "").split(",") if name.strip()]
+_lazy_lock = threading.RLock()
+
+def _lazy(factory):
+    """Wraps factory so it runs once, on the first call from any thread; get.loaded() tells whether it has."""
+    instance = []
+
+    @functools.wraps(factory)
+    def get():
+        if not instance:
+            with _lazy_lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+    get.loaded = lambda: bool(instance)
+    return get
+
+async def _loaded(get):
+    # The first call imports the subsystem, keep that off the event loop
+    return get() if get.loaded() else await asyncio.to_thread(get)
+
+@_lazy
+def get_yc_coach():
+    from yc_coach import YCCoach
+    return YCCoach()
+
+@_lazy
+def get_translation_agent():
+    from translate import TranslationAgent
+    return TranslationAgent()
+
+@_lazy
+def get_translation_batcher():
+    # Short /translate requests arriving together share one prompt
+    from translate import TranslationBatcher
+    return TranslationBatcher(get_translation_agent())
+
+def warm_up(subsystems: List[str]):
+    """Loads lazily imported subsystems now: "llm" builds the LLM agents, "render" starts the render pool workers."""
+    started = time.perf_counter()
+    if "all" in subsystems:
+        subsystems = list(WARMUP_SUBSYSTEMS)
+    for name in subsystems:
+        try:
+            if name == "llm":
+                get_yc_coach()
+                get_translation_batcher()
+            elif name == "render":
+                job_manager.warm_up()
+            else:
+                print(f"Unknown warm-up subsystem '{name}', use one of: {', '.join(WARMUP_SUBSYSTEMS)} or all")
+        except Exception as e:
+            print(f"Warm-up of {name} failed: {e}")
+    print(f"Warm-up of {', '.join(subsystems)} took {time.perf_counter() - started:.2f}s")
+
 
 # Mount static directories
 app.mount("/static/music", StaticFiles(directory=MUSIC_DIR), name="static_music")
 app.mount("/static/images", StaticFiles(directory=IMAGE_DIR), name="static_images")
 app.mount("/static/videos", StaticFiles(directory=VIDEO_DIR), name="static_generated_videos")
 app.mount("/static/uploaded_videos", StaticFiles(directory=UPLOADED_VIDEOS_DIR), name="static_uploaded_videos")
+app.mount("/static/previews", StaticFiles(directory=DEFAULT_PREVIEW_DIR), name="static_previews")
 
 
 @app.get("/")
@@ -60,28 +175,30 @@ def read_root():
 
 # List endpoints
 @app.get("/list/{media_type}")
-async def list_media(media_type: str):
-    directory = ""
-    if media_type == "music":
-        directory = MUSIC_DIR
-    elif media_type == "image":
-        directory = IMAGE_DIR
-    elif media_type == "uploaded_video": # Differentiate uploaded videos from generated ones
-        directory = UPLOADED_VIDEOS_DIR
-    elif media_type == "generated_video":
-        directory = VIDEO_DIR
-    else:
+async def list_media(
+    media_type: str,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: str = "name", # "name", "created_at" or "size"
+    order: str = "asc",
+    prefix: Optional[str] = None,
+):
+    if media_type not in CATALOG_DIRS: # uploaded_video and generated_video are listed separately
         raise HTTPException(status_code=400, detail="Invalid media type. Use 'music', 'image', 'uploaded_video', or 'generated_video'")
-    
+
     try:
-        files = [f for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f)) and not f.startswith('.')]
-        return {"files": files}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        items, next_cursor = await asyncio.to_thread(
+            catalog.list, media_type, limit=limit, cursor=cursor, sort=sort, order=order, prefix=prefix
+        )
+    except CatalogError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    for item in items:
+        del item["media_type"], item["mtime_ns"]
+    return {"files": [item["filename"] for item in items], "items": items, "next_cursor": next_cursor}
 
 # Get media file
 @app.get("/media/{media_type}/{filename}")
-async def get_media(media_type: str, filename: str):
+async def get_media(media_type: str, filename: str, request: Request):
     directory = ""
     if media_type == "music":
         directory = MUSIC_DIR
@@ -97,30 +214,196 @@ async def get_media(media_type: str, filename: str):
     file_path = os.path.join(directory, filename)
     if not os.path.exists(file_path) or not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="File not found")
-    
-    return FileResponse(path=file_path, filename=filename)
+
+    sha256 = await asyncio.to_thread(_media_digest, media_type, file_path)
+    # Generated videos are content-addressed (see render_cache), so their bytes never change
+    return media_file_response(request.headers, file_path, filename, sha256, ASSETS_DIR, immutable=(media_type == "generated_video"))
+
+def _media_digest(media_type: str, file_path: str) -> str:
+    entry = catalog.get(media_type, os.path.basename(file_path))
+    stat = os.stat(file_path)
+    if entry and entry["sha256"] and (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+        return entry["sha256"]
+    return file_digest(file_path)
 
 
 # Media Upload
-@app.post("/media/{media_type}/upload")
-async def upload_media(media_type: str, file: UploadFile = File(...)):
-    directory = ""
+def _upload_directory(media_type: str) -> str:
     if media_type == "music":
-        directory = MUSIC_DIR
+        return MUSIC_DIR
     elif media_type == "image":
-        directory = IMAGE_DIR
+        return IMAGE_DIR
     elif media_type == "video": # This will now be for raw video uploads
-        directory = UPLOADED_VIDEOS_DIR
-    else:
-        raise HTTPException(status_code=400, detail="Invalid media type for upload. Use 'music', 'image', or 'video'")
-        
-    file_path = os.path.join(directory, file.filename)
+        return UPLOADED_VIDEOS_DIR
+    raise HTTPException(status_code=400, detail="Invalid media type for upload. Use 'music', 'image', or 'video'")
+
+def _upload_target(media_type: str, filename: str) -> str:
+    directory = _upload_directory(media_type)
+    try:
+        return os.path.join(directory, safe_filename(filename))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _upload_error(e: UploadError) -> HTTPException:
+    if isinstance(e, UploadTooLargeError):
+        return HTTPException(status_code=413, detail=str(e))
+    if isinstance(e, UploadNotFoundError):
+        return HTTPException(status_code=404, detail=str(e))
+    if isinstance(e, UploadBusyError):
+        return HTTPException(status_code=409, detail=str(e))
+    return HTTPException(status_code=400, detail=str(e))
+
+async def _upload_finished(media_type: str, file_path: str, size: int, sha256: str, background_tasks: BackgroundTasks) -> JSONResponse:
+    catalog_type = "uploaded_video" if media_type == "video" else media_type
+    deduplicated = False
+    try:
+        deduplicated = (await asyncio.to_thread(blob_store.adopt, catalog_type, file_path, sha256))["deduplicated"]
+    except OSError as e:
+        print(f"Could not store {file_path} as a blob, keeping it as a plain file: {e}")
+    if media_type == "image":
+        background_tasks.add_task(_warm_image_cache, file_path)
+    elif media_type == "music":
+        background_tasks.add_task(_warm_soundtrack_cache, file_path)
+    background_tasks.add_task(catalog.upsert, catalog_type, file_path, sha256)
+    filename = os.path.basename(file_path)
+    return JSONResponse(content={"message": f"{media_type.capitalize()} file '{filename}' uploaded successfully", "filename": filename, "media_type": media_type, "size": size, "sha256": sha256, "deduplicated": deduplicated}, status_code=201)
+
+@app.post("/media/{media_type}/upload")
+async def upload_media(media_type: str, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    file_path = _upload_target(media_type, file.filename)
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        return JSONResponse(content={"message": f"{media_type.capitalize()} file '{file.filename}' uploaded successfully", "filename": file.filename, "media_type": media_type}, status_code=201)
+        size, sha256 = await write_stream_atomic(iter_file(file.file), file_path, MAX_UPLOAD_BYTES[media_type])
+    except UploadError as e:
+        raise _upload_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not upload file: {str(e)}")
+    return await _upload_finished(media_type, file_path, size, sha256, background_tasks)
+
+# Streaming upload: the raw request body is written straight to the media directory,
+# skipping the multipart spool file
+@app.put("/media/{media_type}/upload/{filename}")
+async def upload_media_stream(media_type: str, filename: str, request: Request, background_tasks: BackgroundTasks):
+    file_path = _upload_target(media_type, filename)
+    max_bytes = MAX_UPLOAD_BYTES[media_type]
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {max_bytes} byte limit")
+    try:
+        size, sha256 = await write_stream_atomic(request.stream(), file_path, max_bytes)
+    except UploadError as e:
+        raise _upload_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not upload file: {str(e)}")
+    return await _upload_finished(media_type, file_path, size, sha256, background_tasks)
+
+# Resumable chunked uploads, for large videos over unreliable connections
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: int # total size in bytes
+
+@app.post("/media/{media_type}/uploads", status_code=201)
+async def create_upload_session(media_type: str, request: UploadSessionRequest):
+    _upload_target(media_type, request.filename)
+    try:
+        session = resumable_uploads.create(media_type, request.filename, request.size, MAX_UPLOAD_BYTES[media_type])
+    except UploadError as e:
+        raise _upload_error(e)
+    return session
+
+def _upload_session(media_type: str, upload_id: str) -> dict:
+    try:
+        session = resumable_uploads.get(upload_id)
+    except UploadError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if session["media_type"] != media_type:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+@app.get("/media/{media_type}/uploads/{upload_id}")
+async def get_upload_session(media_type: str, upload_id: str):
+    return _upload_session(media_type, upload_id)
+
+@app.patch("/media/{media_type}/uploads/{upload_id}")
+async def append_upload_chunk(media_type: str, upload_id: str, request: Request):
+    _upload_session(media_type, upload_id)
+    offset = request.headers.get("upload-offset")
+    if offset is None or not offset.isdigit():
+        raise HTTPException(status_code=400, detail="Upload-Offset header is required")
+    try:
+        session = await resumable_uploads.append(upload_id, int(offset), request.stream())
+    except UploadError as e:
+        raise _upload_error(e)
+    return session
+
+@app.post("/media/{media_type}/uploads/{upload_id}/complete")
+async def complete_upload(media_type: str, upload_id: str, background_tasks: BackgroundTasks, sha256: Optional[str] = None):
+    session = _upload_session(media_type, upload_id)
+    file_path = _upload_target(media_type, session["filename"])
+    try:
+        result = await asyncio.to_thread(resumable_uploads.complete, upload_id, file_path, sha256)
+    except UploadError as e:
+        raise _upload_error(e)
+    return await _upload_finished(media_type, file_path, result["size"], result["sha256"], background_tasks)
+
+@app.on_event("startup")
+async def start_warm_up():
+    if API_WARMUP:
+        # In the background, so requests that need none of it are served while it runs
+        app.state.warm_up = asyncio.create_task(asyncio.to_thread(warm_up, API_WARMUP))
+
+@app.on_event("startup")
+def purge_stale_uploads():
+    resumable_uploads.purge_expired()
+
+async def _reconcile_catalog_forever():
+    # Render cache keys and derived caches reuse the blob hashes instead of re-reading every upload
+    try:
+        await asyncio.to_thread(blob_store.seed_digests)
+    except Exception as e:
+        print(f"Could not load blob digests: {e}")
+    # Picks up files added or removed outside the API (and render cache evictions)
+    while True:
+        for media_type, directory in CATALOG_DIRS.items():
+            try:
+                if media_type in BLOB_MEDIA_TYPES:
+                    await asyncio.to_thread(blob_store.reconcile, media_type, directory)
+                await asyncio.to_thread(catalog.reconcile, media_type, directory)
+            except Exception as e:
+                print(f"Catalog reconcile of {media_type} failed: {e}")
+        try:
+            await asyncio.to_thread(blob_store.collect_garbage)
+        except Exception as e:
+            print(f"Blob garbage collection failed: {e}")
+        await asyncio.sleep(CATALOG_RECONCILE_INTERVAL)
+
+@app.on_event("startup")
+async def start_catalog_reconciler():
+    app.state.catalog_reconciler = asyncio.create_task(_reconcile_catalog_forever())
+
+async def _purge_scratch_forever():
+    # Scratch directories of render workers that crashed or were killed mid-job
+    while True:
+        try:
+            await asyncio.to_thread(scratch_space.purge_orphans)
+        except Exception as e:
+            print(f"Scratch cleanup failed: {e}")
+        await asyncio.sleep(SCRATCH_JANITOR_INTERVAL)
+
+@app.on_event("startup")
+async def start_scratch_janitor():
+    app.state.scratch_janitor = asyncio.create_task(_purge_scratch_forever())
+
+def _warm_image_cache(file_path: str):
+    try:
+        image_cache.get(file_path, DEFAULT_IMAGE_SIZE)
+    except Exception as e:
+        print(f"Could not pre-normalize image {file_path}: {e}")
+
+def _warm_soundtrack_cache(file_path: str):
+    try:
+        soundtrack_cache.normalized(file_path)
+    except Exception as e:
+        print(f"Could not pre-normalize soundtrack {file_path}: {e}")
 
 # Delete Media File (NEW ENDPOINT)
 @app.delete("/media/{media_type}/{filename}")
@@ -141,81 +424,631 @@ async def delete_media(media_type: str, filename: str):
         raise HTTPException(status_code=404, detail="File not found")
 
     try:
-        os.remove(file_path)
-        return {"message": f"{media_type.capitalize()} file '{filename}' deleted successfully"}
+        # Only the name goes away; the content's space is reclaimed once no other name refers to it
+        released = await asyncio.to_thread(blob_store.release, media_type, file_path)
+        await asyncio.to_thread(catalog.remove, media_type, filename)
+        return {"message": f"{media_type.capitalize()} file '{filename}' deleted successfully", **released}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not delete file: {str(e)}")
 
 
 # Video Generation
+class Rendition(BaseModel):
+    height: int
+    width: Optional[int] = None # None keeps the aspect ratio of image_size
+    video_bitrate: Optional[int] = None # kbit/s; None uses x264's default quality
+    name: Optional[str] = None # e.g. "720p", echoed in the manifest
+
 class VideoGenerationRequest(BaseModel):
     image_filenames: List[str]
     music_filename: Optional[str] = None
     video_duration: Optional[float] = None # if music is shorter than total image duration, or vice versa
     image_duration: float = 3.0 # seconds per image
+    image_durations: Optional[List[float]] = None # seconds for each image, overrides image_duration/video_duration
     fps: int = 24
+    image_size: Optional[Tuple[int, int]] = None # (width, height); None uses the default 1280x720
+    engine: Optional[str] = None # "auto", "ffmpeg" or "moviepy"; None uses the server default
+    output_format: str = "mp4" # "mp4", "fmp4" (playable while rendering) or "hls"
+    preview: bool = False # Low-resolution, low-fps draft rendered right away instead of queued
+    preview_audio: bool = False # Include the soundtrack in a preview
+    renditions: Optional[List[Rendition]] = None # Several sizes of the same video from one decode, see MAX_RENDITIONS
+
+class ContactSheetRequest(BaseModel):
+    image_filenames: List[str]
+    image_size: Optional[Tuple[int, int]] = None # Aspect ratio of the frames; None uses the default 1280x720
+    columns: int = 8
+    thumbnail_width: int = 160
+
+class BatchVideoGenerationRequest(BaseModel):
+    items: List[VideoGenerationRequest]
+
+# batch_id -> planned items and timings, oldest first
+batches: Dict[str, Dict[str, Any]] = {}
+# ladder_id -> manifest entries of a multi-rendition request, oldest first
+ladders: Dict[str, List[Dict[str, Any]]] = {}
+
+def _video_url(path: str) -> str:
+    relative_path = os.path.relpath(path, VIDEO_DIR)
+    if os.sep in relative_path: # HLS playlist inside its own directory
+        return f"/static/videos/{relative_path}"
+    return f"/media/generated_video/{relative_path}"
 
-@app.post("/video/generate")
+def _resolve_video_request(request: VideoGenerationRequest):
+    """Validates a render request and returns (image_paths, music_path, render_params)."""
+    if request.engine is not None and request.engine not in RENDER_ENGINES:
+        raise HTTPException(status_code=400, detail=f"Invalid engine. Use one of: {', '.join(RENDER_ENGINES)}")
+    if request.output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid output_format. Use one of: {', '.join(OUTPUT_FORMATS)}")
+    if request.image_size is not None and (request.image_size[0] <= 0 or request.image_size[1] <= 0):
+        raise HTTPException(status_code=400, detail="Invalid image_size")
+    if request.image_durations is not None and (
+        len(request.image_durations) != len(request.image_filenames) or any(d <= 0 for d in request.image_durations)
+    ):
+        raise HTTPException(status_code=400, detail="image_durations needs one positive duration per image")
+
+    image_paths = [os.path.join(IMAGE_DIR, filename) for filename in request.image_filenames]
+    for p in image_paths:
+        if not os.path.exists(p):
+            raise HTTPException(status_code=404, detail=f"Image file not found: {os.path.basename(p)}")
+
+    music_path = os.path.join(MUSIC_DIR, request.music_filename) if request.music_filename else None
+    if music_path and not os.path.exists(music_path) and request.music_filename: # check request.music_filename to avoid error if None
+         raise HTTPException(status_code=404, detail=f"Music file not found: {request.music_filename}")
+
+    render_params = {
+        "video_duration": request.video_duration,
+        "image_duration": request.image_duration,
+        "fps": request.fps,
+        "output_format": request.output_format,
+    }
+    if request.image_size is not None: # Only keyed when set, so default-size cache entries stay valid
+        render_params["image_size"] = list(request.image_size)
+    if request.image_durations is not None:
+        render_params["image_durations"] = request.image_durations
+    if request.engine is not None: # Engines differ in rate control (see create_video_renditions), so an explicit one is keyed
+        render_params["engine"] = request.engine
+    return image_paths, music_path, render_params
+
+def _cached_response(cached_path: str) -> dict:
+    return {"status": "succeeded", "cached": True, "filename": os.path.relpath(cached_path, VIDEO_DIR), "url": _video_url(cached_path)}
+
+def _check_scratch_space(estimated_bytes: int):
+    if job_manager.backend == "queue":
+        return # Rendered on the workers' scratch space; each of them stops claiming tasks while its own is full
+    try:
+        scratch_space.check_free(estimated_bytes)
+    except ScratchSpaceError as e:
+        raise HTTPException(status_code=507, detail=str(e))
+
+def _queued_response(job) -> dict:
+    return {"job_id": job.job_id, "status": job.status, "cached": False, "status_url": f"/video/jobs/{job.job_id}", "stream_url": f"/video/jobs/{job.job_id}/stream"}
+
+def _preview_url(path: str) -> str:
+    return f"/static/previews/{os.path.basename(path)}"
+
+async def _preview_call(func, *args):
+    # Runs a preview renderer call in a thread, holding one of the PREVIEW_CONCURRENCY slots
+    if preview_slots.locked():
+        raise HTTPException(status_code=429, detail=f"{PREVIEW_CONCURRENCY} previews are already rendering, retry shortly")
+    async with preview_slots:
+        return await asyncio.to_thread(func, *args)
+
+async def _render_preview(request: VideoGenerationRequest) -> dict:
+    image_paths, music_path, render_params = _resolve_video_request(request)
+    durations = image_durations_for(
+        len(image_paths), request.image_duration, request.video_duration, request.image_durations
+    )
+    try:
+        path = await _preview_call(
+            preview_renderer.render, image_paths, music_path, durations,
+            tuple(request.image_size or DEFAULT_IMAGE_SIZE), min(request.fps, PREVIEW_FPS), request.preview_audio,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Preview render failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Preview render failed: {e}")
+    return {"message": "Preview generated successfully", "status": "succeeded", "preview": True, "url": _preview_url(path)}
+
+def _rendition_size(rendition: Rendition, base_size: Tuple[int, int]) -> Tuple[int, int]:
+    # Nearest even width for the aspect ratio, e.g. 854x480 for 16:9
+    width = rendition.width or 2 * int(round(rendition.height * base_size[0] / base_size[1] / 2))
+    return width - width % 2, rendition.height - rendition.height % 2
+
+async def _generate_renditions(request: VideoGenerationRequest):
+    if len(request.renditions) > MAX_RENDITIONS:
+        raise HTTPException(status_code=400, detail=f"Too many renditions, the limit is {MAX_RENDITIONS}")
+    for rendition in request.renditions:
+        if not 16 <= rendition.height <= 4320 or (rendition.width is not None and not 16 <= rendition.width <= 7680):
+            raise HTTPException(status_code=400, detail="Rendition sizes must be between 16 and 4320 pixels high and 7680 wide")
+        if rendition.video_bitrate is not None and not 50 <= rendition.video_bitrate <= 100000:
+            raise HTTPException(status_code=400, detail="video_bitrate must be between 50 and 100000 kbit/s")
+    image_paths, music_path, render_params = _resolve_video_request(request)
+    base_size = tuple(request.image_size or DEFAULT_IMAGE_SIZE)
+    sizes = [_rendition_size(rendition, base_size) for rendition in request.renditions]
+    if len({(size, r.video_bitrate) for size, r in zip(sizes, request.renditions)}) != len(sizes):
+        raise HTTPException(status_code=400, detail="Renditions must differ in size or video_bitrate")
+
+    # Every rendition is cached like a single render of that size, so earlier renders are reused
+    rendition_params = []
+    for rendition, size in zip(request.renditions, sizes):
+        params = dict(render_params, image_size=list(size))
+        if rendition.video_bitrate is not None:
+            params["video_bitrate"] = rendition.video_bitrate
+        rendition_params.append(params)
+    keys = await asyncio.to_thread(lambda: [render_cache_key(image_paths, music_path, params) for params in rendition_params])
+
+    manifest = []
+    pending = []
+    for rendition, size, cache_key in zip(request.renditions, sizes, keys):
+        entry = {"name": rendition.name or f"{size[1]}p", "width": size[0], "height": size[1], "video_bitrate": rendition.video_bitrate}
+        cached_path = await asyncio.to_thread(render_cache.get, cache_key)
+        if cached_path:
+            entry.update(_cached_response(cached_path))
+        else:
+            pending.append(len(manifest))
+        manifest.append(entry)
+
+    if pending:
+        params = {"image_paths": image_paths, "music_path": music_path, "engine": request.engine, **render_params}
+        params.pop("image_size", None)
+        _check_scratch_space(scratch_estimate(params, len(pending)))
+        try:
+            jobs = job_manager.submit_renditions(
+                params=params,
+                renditions=[
+                    {
+                        "image_size": rendition_params[index]["image_size"],
+                        "video_bitrate": rendition_params[index].get("video_bitrate"),
+                        "output_filename": render_cache.output_filename(keys[index], request.output_format),
+                        "cache_key": keys[index],
+                    }
+                    for index in pending
+                ],
+                output_dir=VIDEO_DIR,
+                on_success=_register_render,
+            )
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        for index, job in zip(pending, jobs):
+            manifest[index].update(_queued_response(job))
+
+    ladder_id = uuid.uuid4().hex
+    ladders[ladder_id] = manifest
+    while len(ladders) > MAX_BATCHES:
+        del ladders[next(iter(ladders))]
+    message = "Video renditions queued" if pending else "Video generated successfully"
+    return JSONResponse(
+        content={"message": message, "ladder_id": ladder_id, "status_url": f"/video/renditions/{ladder_id}", **_ladder_manifest(manifest)},
+        status_code=202 if pending else 200,
+    )
+
+def _ladder_manifest(manifest: List[Dict[str, Any]]) -> dict:
+    renditions = []
+    for entry in manifest:
+        item = dict(entry)
+        job = job_manager.get(entry["job_id"]) if "job_id" in entry else None
+        if job is not None:
+            item.update(_job_response(job))
+        renditions.append(item)
+    statuses = {item["status"] for item in renditions}
+    status = "failed" if "failed" in statuses else "succeeded" if statuses == {"succeeded"} else "running"
+    return {"status": status, "renditions": renditions}
+
+@app.get("/video/renditions/{ladder_id}")
+async def get_video_renditions(ladder_id: str):
+    manifest = ladders.get(ladder_id)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Renditions not found")
+    return {"ladder_id": ladder_id, **_ladder_manifest(manifest)}
+
+@app.post("/video/generate", status_code=202)
 async def generate_video_endpoint(request: VideoGenerationRequest): # Renamed to avoid conflict
+    if request.preview and request.renditions:
+        raise HTTPException(status_code=400, detail="A preview has a single size, leave out renditions")
+    if request.preview:
+        return JSONResponse(content=await _render_preview(request), status_code=200)
+    if request.renditions:
+        return await _generate_renditions(request)
+    image_paths, music_path, render_params = _resolve_video_request(request)
+    # Hashing reads every input file, keep it off the event loop
+    cache_key = await asyncio.to_thread(render_cache_key, image_paths, music_path, render_params)
+    cached_path = await asyncio.to_thread(render_cache.get, cache_key)
+    if cached_path:
+        return JSONResponse(content={"message": "Video generated successfully", **_cached_response(cached_path)}, status_code=200)
+
+    params = {
+        "image_paths": image_paths,
+        "music_path": music_path,
+        "engine": request.engine,
+        **render_params,
+    }
+    _check_scratch_space(scratch_estimate(params))
     try:
-        image_paths = [os.path.join(IMAGE_DIR, filename) for filename in request.image_filenames]
-        for p in image_paths:
-            if not os.path.exists(p):
-                raise HTTPException(status_code=404, detail=f"Image file not found: {os.path.basename(p)}")
+        job = job_manager.submit(
+            params=params,
+            output_dir=VIDEO_DIR,
+            output_filename=render_cache.output_filename(cache_key, request.output_format),
+            cache_key=cache_key,
+            on_success=_register_render,
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"message": "Video generation queued", **_queued_response(job)}
 
-        music_path = os.path.join(MUSIC_DIR, request.music_filename) if request.music_filename else None
-        if music_path and not os.path.exists(music_path) and request.music_filename: # check request.music_filename to avoid error if None
-             raise HTTPException(status_code=404, detail=f"Music file not found: {request.music_filename}")
-        
-        # Ensure unique output filename
-        count = 1
-        while True:
-            output_filename = f"generated_video_{count}.mp4"
-            output_path = os.path.join(VIDEO_DIR, output_filename)
-            if not os.path.exists(output_path):
-                break
-            count += 1
-        
-        generator = MovieGenerator() # Make sure this class is defined or imported
-        result_path = generator.create_video_from_images_and_music(
-            image_paths=image_paths,
-            output_path=output_path,
-            music_path=music_path,
-            video_duration=request.video_duration,
-            image_duration=request.image_duration,
-            fps=request.fps,
+@app.post("/video/preview/contact_sheet")
+async def generate_contact_sheet(request: ContactSheetRequest):
+    """Poster frame and a numbered thumbnail grid of the images, without encoding any video."""
+    if not request.image_filenames:
+        raise HTTPException(status_code=400, detail="No images given")
+    if request.image_size is not None and (request.image_size[0] <= 0 or request.image_size[1] <= 0):
+        raise HTTPException(status_code=400, detail="Invalid image_size")
+    if request.columns < 1 or not 16 <= request.thumbnail_width <= 640:
+        raise HTTPException(status_code=400, detail="columns must be positive and thumbnail_width between 16 and 640")
+    image_paths = [os.path.join(IMAGE_DIR, filename) for filename in request.image_filenames]
+    for p in image_paths:
+        if not os.path.exists(p):
+            raise HTTPException(status_code=404, detail=f"Image file not found: {os.path.basename(p)}")
+    try:
+        poster_path, sheet_path = await _preview_call(
+            preview_renderer.contact_sheet, image_paths, tuple(request.image_size or DEFAULT_IMAGE_SIZE),
+            request.columns, request.thumbnail_width,
         )
-        
-        if result_path and os.path.exists(result_path):
-            # Return the filename, not the full path, for client-side URL construction
-            return {"message": "Video generated successfully", "filename": os.path.basename(result_path), "url": f"/static/videos/{os.path.basename(result_path)}"}
-        raise HTTPException(status_code=500, detail="Failed to generate video or result path not found.")
-    except HTTPException as e: # Re-raise HTTPExceptions
-        raise e
+    except HTTPException:
+        raise
     except Exception as e:
-        # Log the exception for debugging
-        print(f"Error during video generation: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+        print(f"Contact sheet failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Contact sheet failed: {e}")
+    return {"poster_url": _preview_url(poster_path), "contact_sheet_url": _preview_url(sheet_path)}
+
+@app.post("/video/generate/batch", status_code=202)
+async def generate_video_batch(request: BatchVideoGenerationRequest):
+    """
+    Plans many renders together: identical items are rendered once, each distinct image/size and
+    soundtrack is decoded once up front, and items that differ only in music share one video encode.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No items to render")
+    if len(request.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many items, the limit is {MAX_BATCH_ITEMS}")
+    if any(item.preview for item in request.items):
+        raise HTTPException(status_code=400, detail="Previews are rendered right away, request them from /video/generate")
+    if any(item.renditions for item in request.items):
+        raise HTTPException(status_code=400, detail="Request renditions from /video/generate, one slideshow at a time")
+    started = time.perf_counter()
+    timings = {}
+
+    resolved = [_resolve_video_request(item) for item in request.items]
+    keys = await asyncio.gather(*[
+        asyncio.to_thread(render_cache_key, image_paths, music_path, render_params)
+        for image_paths, music_path, render_params in resolved
+    ])
+    timings["hash_seconds"] = time.perf_counter() - started
+
+    results: List[Optional[dict]] = [None] * len(request.items)
+    groups: Dict[tuple, List[int]] = {} # Items that render the same video track
+    planned_keys = {}
+    for index, (item, (image_paths, music_path, render_params), cache_key) in enumerate(zip(request.items, resolved, keys)):
+        cached_path = await asyncio.to_thread(render_cache.get, cache_key)
+        if cached_path:
+            results[index] = _cached_response(cached_path)
+            continue
+        if cache_key in planned_keys: # Duplicate of an earlier item
+            continue
+        planned_keys[cache_key] = index
+        # render_params never include the music, so variants differing only in soundtrack group together
+        group_key = (tuple(image_paths), item.engine, repr(sorted(render_params.items())))
+        groups.setdefault(group_key, []).append(index)
+
+    _check_scratch_space(sum(
+        scratch_estimate({"image_paths": resolved[indexes[0]][0], **resolved[indexes[0]][2]}, len(indexes))
+        for indexes in groups.values()
+    ))
+
+    # Decode every distinct image at each requested size and every soundtrack once, in parallel,
+    # so the render workers only read cached derived assets
+    phase_started = time.perf_counter()
+    warmups = {}
+    for indexes in groups.values():
+        image_paths, music_path, render_params = resolved[indexes[0]]
+        image_size = tuple(render_params.get("image_size") or DEFAULT_IMAGE_SIZE)
+        for path in image_paths:
+            warmups.setdefault(("image", path, image_size), (image_cache.get, path, image_size))
+        for index in indexes:
+            music_path = resolved[index][1]
+            if music_path:
+                warmups.setdefault(("music", music_path), (soundtrack_cache.normalized, music_path))
+    warmup_results = await asyncio.gather(
+        *[asyncio.to_thread(func, *args) for func, *args in warmups.values()], return_exceptions=True
+    )
+    for error in warmup_results:
+        if isinstance(error, Exception): # The render decodes it itself instead
+            print(f"Error preparing batch asset: {error}")
+    timings["decode_seconds"] = time.perf_counter() - phase_started
+
+    phase_started = time.perf_counter()
+    for (_, engine, _), indexes in groups.items():
+        image_paths, _, render_params = resolved[indexes[0]]
+        try:
+            jobs = job_manager.submit_variants(
+                params={"image_paths": image_paths, "engine": engine, **render_params},
+                variants=[
+                    {
+                        "music_path": resolved[index][1],
+                        "output_filename": render_cache.output_filename(keys[index], render_params["output_format"]),
+                        "cache_key": keys[index],
+                    }
+                    for index in indexes
+                ],
+                output_dir=VIDEO_DIR,
+                on_success=_register_render,
+            )
+        except QueueFullError as e:
+            for index in indexes:
+                results[index] = {"status": "rejected", "error": str(e)}
+            continue
+        for index, job in zip(indexes, jobs):
+            results[index] = _queued_response(job)
+    timings["submit_seconds"] = time.perf_counter() - phase_started
+
+    for index, cache_key in enumerate(keys):
+        if results[index] is None: # Duplicate, reuse the result of the item it repeats
+            results[index] = dict(results[planned_keys[cache_key]])
+    timings["planning_seconds"] = time.perf_counter() - started
+
+    batch_id = uuid.uuid4().hex
+    batches[batch_id] = {
+        "created_at": time.time(),
+        "items": results,
+        "shared_encodes": len(groups),
+        "timings": {name: round(seconds, 4) for name, seconds in timings.items()},
+    }
+    while len(batches) > MAX_BATCHES:
+        del batches[next(iter(batches))]
+    return {"batch_id": batch_id, "status_url": f"/video/batches/{batch_id}", **_batch_report(batches[batch_id])}
+
+def _batch_report(batch: Dict[str, Any]) -> dict:
+    items = []
+    statuses: Dict[str, int] = {}
+    stage_seconds: Dict[str, float] = {}
+    render_seconds = 0.0
+    finished_at = None
+    for index, result in enumerate(batch["items"]):
+        item = dict(result, index=index)
+        job = job_manager.get(result["job_id"]) if "job_id" in result else None
+        if job is not None:
+            item.update(_job_response(job))
+            for name, seconds in (job.stats or {}).get("stages", {}).items():
+                stage_seconds[name] = stage_seconds.get(name, 0.0) + seconds
+            render_seconds += (job.stats or {}).get("total_seconds", 0.0)
+            if job.finished_at:
+                finished_at = max(finished_at or 0.0, job.finished_at)
+        statuses[item["status"]] = statuses.get(item["status"], 0) + 1
+        items.append(item)
+    done = all(status in ("succeeded", "failed", "rejected") for status in statuses)
+    return {
+        "items": items,
+        "statuses": statuses,
+        "report": {
+            **batch["timings"],
+            "items": len(items),
+            "shared_encodes": batch["shared_encodes"],
+            "render_seconds": round(render_seconds, 4),
+            "stage_seconds": {name: round(seconds, 4) for name, seconds in stage_seconds.items()},
+            "wall_seconds": round(finished_at - batch["created_at"], 4) if done and finished_at else None,
+        },
+    }
+
+@app.get("/video/batches/{batch_id}")
+async def get_video_batch(batch_id: str):
+    batch = batches.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _batch_report(batch)
+
+
+def _register_render(job):
+    render_cache.put(job.cache_key, job.result_path)
+    if os.path.dirname(job.result_path) == VIDEO_DIR: # HLS directories are not catalogued
+        catalog.upsert("generated_video", job.result_path)
+
+def _job_response(job) -> dict:
+    data = job.to_dict()
+    if job.result_path:
+        data["filename"] = os.path.relpath(job.result_path, VIDEO_DIR)
+        data["url"] = _video_url(job.result_path)
+    return data
+
+@app.get("/video/jobs")
+async def list_video_jobs():
+    return {"jobs": [_job_response(job) for job in job_manager.list()]}
+
+@app.get("/video/jobs/{job_id}")
+async def get_video_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
+
+async def _tail_render_output(job_id: str, path: str):
+    # Follows the file ffmpeg is writing until the job finishes, like `tail -f`
+    offset = 0
+    while True:
+        job = job_manager.get(job_id)
+        finished = job is None or job.status in ("succeeded", "failed")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                f.seek(offset)
+                while True:
+                    chunk = await asyncio.to_thread(f.read, STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    offset += len(chunk)
+                    yield chunk
+        if finished:
+            break
+        await asyncio.sleep(STREAM_POLL_INTERVAL)
+
+@app.get("/video/jobs/{job_id}/stream")
+async def stream_video_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    output_format = job.params.get("output_format", "mp4")
+    if output_format == "hls":
+        return RedirectResponse(_video_url(job.output_path))
+    if output_format == "fmp4":
+        return StreamingResponse(_tail_render_output(job_id, job.output_path), media_type="video/mp4")
+    if job.status == "succeeded":
+        return RedirectResponse(_video_url(job.result_path))
+    raise HTTPException(status_code=409, detail="This render is not streamable while in progress. Request output_format 'fmp4' or 'hls'.")
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "render": job_manager.metrics.snapshot(),
+        "jobs": await asyncio.to_thread(job_manager.queue_stats),
+        "render_workers": await asyncio.to_thread(job_manager.worker_stats),
+        "render_cache": await asyncio.to_thread(render_cache.stats),
+        "scratch": await asyncio.to_thread(scratch_space.stats),
+        "blobs": await asyncio.to_thread(blob_store.stats),
+        "llm": llm_clients.stats(),
+        "translation_batches": get_translation_batcher().stats() if get_translation_batcher.loaded() else None,
+    }
+
+@app.get("/video/cache/stats")
+async def render_cache_stats():
+    return render_cache.stats()
+
+@app.on_event("shutdown")
+def shutdown_render_pool():
+    job_manager.shutdown()
+    render_cache.flush()
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    await llm_clients.aclose()
+
+
+def _sse_response(chunks) -> StreamingResponse:
+    # Server-sent events: one "data" event per chunk of text, then "done" (or "error" if the model call fails)
+    async def events():
+        try:
+            async for text in chunks:
+                yield f"data: {json.dumps({'delta': text}, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            print(f"LLM stream failed: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)}, ensure_ascii=False)}\n\n"
+            return
+        yield "event: done\ndata: {}\n\n"
+    # X-Accel-Buffering stops nginx from holding the events back until the response ends
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 # YC Coach - keeping it for completeness from your snippet, but not used in the UI below
 class YCRequest(BaseModel):
-    project_name: str = "default"
-    current_event_logs: str
+    project_name: Optional[str] = None # Keeps a history when set; without it only this request's logs are used
+    current_event_logs: str # Appended to the named project's event log before asking
+    use_cache: bool = True # False forces a fresh suggestion
+
+class ProjectUpdate(BaseModel):
+    project_purpose: Optional[str] = None
+    user_personality: Optional[str] = None
+
+async def _coach_prompt(request: YCRequest, background_tasks: BackgroundTasks) -> Dict[str, str]:
+    # Records the new event, builds the prompt from the summary and recent events, and folds
+    # older events into the summary once the response has been sent
+    yc_coach_agent = await _loaded(get_yc_coach)
+    name = request.project_name
+    if not yc_coach_agent.keeps_history(name):
+        # No project, or the shared "default" profile: this request's logs only, nothing is stored for other callers
+        return await asyncio.to_thread(yc_coach_agent.stateless_prompt, request.current_event_logs)
+    if await asyncio.to_thread(yc_coach_agent.store.get_project, name) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown project '{name}'")
+    if request.current_event_logs.strip():
+        await asyncio.to_thread(yc_coach_agent.record_event, name, request.current_event_logs.strip())
+    background_tasks.add_task(yc_coach_agent.asummarize, name)
+    return await asyncio.to_thread(yc_coach_agent.project_prompt, name)
 
 @app.post("/yc_coach")
-async def yc_coach(request: YCRequest):
-    agent = YCCoach()  
-    project = get_project(request.project_name)
-    result = agent.suggest_next_steps(
-        project_purpose=project['project_purpose'],
-        user_personality=project['user_personality'],
-        current_event_logs=request.current_event_logs,
+async def yc_coach(request: YCRequest, background_tasks: BackgroundTasks):
+    variables = await _coach_prompt(request, background_tasks)
+    result = await get_yc_coach().asuggest_next_steps(**variables, use_cache=request.use_cache)
+    return {"message": result}
+
+@app.post("/yc_coach/stream")
+async def yc_coach_stream(request: YCRequest, background_tasks: BackgroundTasks):
+    variables = await _coach_prompt(request, background_tasks)
+    return _sse_response(get_yc_coach().astream_next_steps(**variables, use_cache=request.use_cache))
+
+@app.get("/yc_coach/projects/{project_name}")
+async def get_coach_project(project_name: str):
+    yc_coach_agent = await _loaded(get_yc_coach)
+    project = await asyncio.to_thread(yc_coach_agent.store.get_project, project_name)
+    if project is None:
+        raise HTTPException(status_code=404, detail=f"Unknown project '{project_name}'")
+    return project
+
+@app.put("/yc_coach/projects/{project_name}")
+async def put_coach_project(project_name: str, update: ProjectUpdate):
+    yc_coach_agent = await _loaded(get_yc_coach)
+    return await asyncio.to_thread(
+        yc_coach_agent.store.upsert_project, project_name, update.project_purpose, update.user_personality
     )
+
+
+class TranslateRequest(BaseModel):
+    text: str
+    source_lang: str = "auto"
+    target_lang: str = "en"
+    use_cache: bool = True
+
+class TranslateBatchRequest(BaseModel):
+    texts: List[str]
+    source_lang: str = "auto"
+    target_lang: str = "en"
+    use_cache: bool = True
+
+MAX_TRANSLATE_BATCH_ITEMS = 2000
+
+@app.post("/translate")
+async def translate(request: TranslateRequest):
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="text must not be empty")
+    translation_batcher = await _loaded(get_translation_batcher)
+    from translate import TRANSLATION_BATCH_TOKENS # already imported by the batcher
+    if estimate_tokens(request.text) <= TRANSLATION_BATCH_TOKENS // 2:
+        result = await translation_batcher.translate(
+            request.text, request.source_lang, request.target_lang, use_cache=request.use_cache
+        )
+    else:
+        result = await translation_batcher.agent.atranslate(
+            request.text, request.source_lang, request.target_lang, use_cache=request.use_cache
+        )
     return {"message": result}
 
+@app.post("/translate/batch")
+async def translate_batch(request: TranslateBatchRequest):
+    if not request.texts or len(request.texts) > MAX_TRANSLATE_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"texts must hold between 1 and {MAX_TRANSLATE_BATCH_ITEMS} items")
+    if any(not text.strip() for text in request.texts):
+        raise HTTPException(status_code=400, detail="texts must not be empty")
+    translation_agent = await _loaded(get_translation_agent)
+    results = await translation_agent.atranslate_many(
+        request.texts, request.source_lang, request.target_lang, use_cache=request.use_cache
+    )
+    return {"translations": results}
+
+@app.post("/translate/stream")
+async def translate_stream(request: TranslateRequest):
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="text must not be empty")
+    translation_agent = await _loaded(get_translation_agent)
+    return _sse_response(translation_agent.astream_translate(
+        request.text, request.source_lang, request.target_lang, use_cache=request.use_cache
+    ))
+
 
 if __name__ == "__main__":
     # Create dummy files for testing listing
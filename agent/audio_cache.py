@@ -0,0 +1,73 @@
+import os
+import json
+import logging
+import threading
+from typing import Any, Dict
+
+from ffmpeg_engine import AUDIO_SAMPLE_RATE, FFmpegError, probe_duration, run_ffmpeg
+from render_cache import file_digest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AUDIO_CACHE_DIR = os.getenv(
+    "AUDIO_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "derived", "audio"),
+)
+AUDIO_BITRATE = "192k"
+
+
+class SoundtrackCache:
+    """
+    Soundtracks transcoded once to AAC at the render sample rate, plus copies looped/trimmed to
+    a given duration by stream copy. Renders can then mux the audio without decoding or encoding it.
+    """
+
+    def __init__(self, directory: str = DEFAULT_AUDIO_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _replace_atomically(self, args, final_path: str):
+        # Unique per thread too: API threads and render workers can normalize one soundtrack at once
+        tmp_path = f"{final_path}.{os.getpid()}.{threading.get_ident()}.tmp.m4a"
+        try:
+            run_ffmpeg(args + [tmp_path])
+            os.replace(tmp_path, final_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def normalized(self, audio_path: str) -> Dict[str, Any]:
+        """Returns {"path", "duration"} of the track transcoded to AAC, creating it on first use."""
+        digest = file_digest(audio_path)[:32]
+        track_path = os.path.join(self.directory, f"{digest}.m4a")
+        meta_path = os.path.join(self.directory, f"{digest}.json")
+        if os.path.exists(track_path) and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                return {"path": track_path, "duration": json.load(f)["duration"]}
+
+        self._replace_atomically(
+            ["-i", audio_path, "-vn", "-c:a", "aac", "-b:a", AUDIO_BITRATE, "-ar", str(AUDIO_SAMPLE_RATE), "-ac", "2"],
+            track_path,
+        )
+        duration = probe_duration(track_path)
+        if not duration:
+            raise FFmpegError(f"Could not read the duration of {audio_path}")
+        # Readers take the track as ready once the meta exists, so it must never be seen half-written
+        tmp_meta_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_meta_path, "w") as f:
+            json.dump({"source": os.path.basename(audio_path), "duration": duration}, f)
+        os.replace(tmp_meta_path, meta_path)
+        logger.info(f"Normalized soundtrack {os.path.basename(audio_path)} ({duration:.2f}s)")
+        return {"path": track_path, "duration": duration}
+
+    def fitted(self, audio_path: str, duration: float) -> str:
+        """Returns the track looped or trimmed to duration, built by stream copy (no re-encode)."""
+        track = self.normalized(audio_path)
+        base = os.path.splitext(track["path"])[0]
+        fitted_path = f"{base}_{int(round(duration * 1000))}ms.m4a"
+        if os.path.exists(fitted_path):
+            return fitted_path
+
+        args = ["-i", track["path"]] if track["duration"] >= duration else ["-stream_loop", "-1", "-i", track["path"]]
+        self._replace_atomically(args + ["-t", f"{duration:.6f}", "-map", "0:a:0", "-c:a", "copy", "-movflags", "+faststart"], fitted_path)
+        return fitted_path
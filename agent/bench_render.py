@@ -0,0 +1,223 @@
+"""
+Offline render benchmark. Generates synthetic images and a soundtrack, renders every combination
+of the swept parameters and writes the per-stage timings to a JSON file for regression tracking.
+
+    python bench_render.py --images 5 20 --resolutions 640x360 1280x720 --fps 24 --engines segments ffmpeg moviepy
+
+Each case runs in a fresh process so peak RSS is measured per render, with cold image/audio caches.
+To measure multi-core scaling, sweep the encoder count (and chunking for the ffmpeg engine):
+
+    python bench_render.py --images 200 --durations 1 --engines segments ffmpeg --encode-workers 1 2 4 8 --chunk-sizes 0 25
+
+The report's "speedups" compare every case against the same case with one encoder.
+"""
+import os
+import sys
+import json
+import math
+import time
+import wave
+import struct
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import itertools
+import multiprocessing
+from typing import Any, Dict, List, Tuple
+
+from PIL import Image, ImageDraw
+
+
+def make_images(directory: str, count: int, size: Tuple[int, int], seed: int = 0) -> List[str]:
+    """Gradient images with shapes, roughly as hard to encode as photos without shipping any."""
+    rng = random.Random(seed)
+    width, height = size
+    paths = []
+    for i in range(count):
+        top = tuple(rng.randrange(256) for _ in range(3))
+        bottom = tuple(rng.randrange(256) for _ in range(3))
+        img = Image.new("RGB", size)
+        draw = ImageDraw.Draw(img)
+        for y in range(height):
+            t = y / max(1, height - 1)
+            draw.line([(0, y), (width, y)], fill=tuple(int(a + (b - a) * t) for a, b in zip(top, bottom)))
+        for _ in range(12):
+            x0, y0 = rng.randrange(width), rng.randrange(height)
+            x1, y1 = x0 + rng.randrange(width // 3 + 1), y0 + rng.randrange(height // 3 + 1)
+            draw.ellipse([x0, y0, x1, y1], fill=tuple(rng.randrange(256) for _ in range(3)))
+        draw.text((10, 10), f"frame {i}", fill=(255, 255, 255))
+        path = os.path.join(directory, f"bench_{size[0]}x{size[1]}_{i:04d}.jpg")
+        img.save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def make_soundtrack(path: str, duration: float, sample_rate: int = 44100):
+    """Stereo 16-bit WAV with a two-tone chord."""
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        frames = bytearray()
+        for n in range(int(duration * sample_rate)):
+            t = n / sample_rate
+            sample = int(8000 * (math.sin(2 * math.pi * 440 * t) + math.sin(2 * math.pi * 660 * t)))
+            frames += struct.pack("<hh", sample, sample)
+        wav.writeframes(bytes(frames))
+
+
+def _run_case(case: Dict[str, Any], work_dir: str, queue):
+    # Imported here so each case pays its own import cost in its own process
+    from movie import MovieGenerator
+    from image_cache import ImageCache
+    from audio_cache import SoundtrackCache
+    from segment_cache import SegmentCache
+
+    generator = MovieGenerator(
+        image_cache=ImageCache(os.path.join(work_dir, "image_cache")),
+        soundtrack_cache=SoundtrackCache(os.path.join(work_dir, "audio_cache")),
+        segment_cache=SegmentCache(os.path.join(work_dir, "segment_cache")),
+    )
+    output_path = os.path.join(work_dir, "output.mp4")
+    try:
+        result = generator.create_video_from_images_and_music(
+            image_paths=case["image_paths"],
+            output_path=output_path,
+            music_path=case["music_path"],
+            image_duration=case["image_duration"],
+            fps=case["fps"],
+            image_size=case["render_size"],
+            engine=case["engine"],
+            encode_workers=case["encode_workers"],
+            chunk_size=case["chunk_size"],
+        )
+        stats = dict(generator.last_render_stats or {})
+        stats["output_bytes"] = os.path.getsize(result) if result and os.path.exists(result) else None
+        queue.put(stats)
+    except Exception as e:
+        queue.put({"succeeded": False, "error": str(e)})
+    finally:
+        generator.cleanup()
+
+
+def run_case(case: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    work_dir = tempfile.mkdtemp(prefix="bench_render_")
+    started = time.perf_counter()
+    process = ctx.Process(target=_run_case, args=(case, work_dir, queue))
+    process.start()
+    try:
+        stats = queue.get(timeout=timeout)
+    except Exception:
+        process.kill()
+        stats = {"succeeded": False, "error": f"Timed out after {timeout}s"}
+    process.join()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    stats["wall_seconds"] = round(time.perf_counter() - started, 4)
+    return stats
+
+
+def speedups(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Mean encode time of each case relative to the same case rendered with one encoder in a single pass."""
+    def mean_encode(runs):
+        times = [r["stages"]["encode"] for r in runs if r.get("succeeded") and "encode" in r.get("stages", {})]
+        return sum(times) / len(times) if times else None
+
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for r in results:
+        key = (r["images"], r["resolution"], r["fps"], r["image_duration"], r["engine"], r["encode_workers"], r["chunk_size"])
+        groups.setdefault(key, []).append(r)
+    rows = []
+    for key, runs in groups.items():
+        baseline = groups.get(key[:5] + (1, 0))
+        encode, baseline_encode = mean_encode(runs), mean_encode(baseline) if baseline else None
+        if encode is None or baseline_encode is None:
+            continue
+        images, resolution, fps, image_duration, engine, workers, chunk_size = key
+        rows.append({
+            "images": images, "resolution": resolution, "fps": fps, "image_duration": image_duration,
+            "engine": engine, "encode_workers": workers, "chunk_size": chunk_size,
+            "encode_seconds": round(encode, 4),
+            "speedup": round(baseline_encode / encode, 2),
+        })
+    return rows
+
+
+def _parse_size(value: str) -> Tuple[int, int]:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark MovieGenerator renders on synthetic media.")
+    parser.add_argument("--images", type=int, nargs="+", default=[5, 20], help="Image counts to sweep")
+    parser.add_argument("--resolutions", type=_parse_size, nargs="+", default=[(640, 360), (1280, 720)],
+                        help="Render resolutions to sweep, e.g. 1280x720")
+    parser.add_argument("--source-size", type=_parse_size, default=(1920, 1080), help="Resolution of the synthetic images")
+    parser.add_argument("--fps", type=int, nargs="+", default=[24], help="Frame rates to sweep")
+    parser.add_argument("--durations", type=float, nargs="+", default=[3.0], help="Seconds per image to sweep")
+    parser.add_argument("--engines", nargs="+", default=["segments", "ffmpeg", "moviepy"], help="Render engines to sweep")
+    parser.add_argument("--encode-workers", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                        help="Concurrent encoder counts to sweep")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[0],
+                        help="Images per chunk for the ffmpeg engine to sweep, 0 for a single pass")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case")
+    parser.add_argument("--timeout", type=float, default=1800, help="Seconds before a case is abandoned")
+    parser.add_argument("--output", default="bench_render_results.json", help="Where to write the JSON results")
+    args = parser.parse_args(argv)
+
+    media_dir = tempfile.mkdtemp(prefix="bench_media_")
+    results = []
+    try:
+        source_images = make_images(media_dir, max(args.images), args.source_size)
+        longest = max(args.images) * max(args.durations)
+        music_path = os.path.join(media_dir, "bench_music.wav")
+        make_soundtrack(music_path, min(longest, 60.0)) # Shorter than long renders, so looping is exercised too
+
+        for count, size, fps, duration, engine, workers, chunk_size in itertools.product(
+            args.images, args.resolutions, args.fps, args.durations, args.engines, args.encode_workers, args.chunk_sizes
+        ):
+            case = {
+                "images": count,
+                "resolution": f"{size[0]}x{size[1]}",
+                "fps": fps,
+                "image_duration": duration,
+                "engine": engine,
+                "encode_workers": workers,
+                "chunk_size": chunk_size,
+            }
+            for run in range(args.repeat):
+                print(f"Running {case} (run {run + 1}/{args.repeat})", flush=True)
+                stats = run_case(
+                    dict(case, image_paths=source_images[:count], music_path=music_path, render_size=size),
+                    args.timeout,
+                )
+                results.append(dict(case, run=run, **stats))
+                print(f"  {stats.get('total_seconds')}s total, {stats.get('frames_per_second')} fps, "
+                      f"peak RSS {stats.get('peak_rss_mb')} MB, stages {stats.get('stages')}", flush=True)
+    finally:
+        shutil.rmtree(media_dir, ignore_errors=True)
+
+    report = {
+        "created_at": time.time(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "source_size": f"{args.source_size[0]}x{args.source_size[1]}",
+        "results": results,
+        "speedups": speedups(results),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    for row in report["speedups"]:
+        print(f"{row['engine']} {row['images']} images @ {row['resolution']}: {row['encode_workers']} workers, "
+              f"chunks of {row['chunk_size']} -> {row['speedup']}x")
+    print(f"Wrote {len(results)} results to {args.output}")
+    return 0 if all(r.get("succeeded") for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
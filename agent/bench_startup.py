@@ -0,0 +1,132 @@
+"""
+Cold-start benchmark of the API server. Imports `api` in fresh interpreters with -X importtime,
+reports the median import time with a breakdown by top-level package, and fails when it exceeds
+the budget or when a subsystem that should load lazily (MoviePy, LangChain, ...) was imported.
+
+    python bench_startup.py --runs 5 --budget 1.5
+
+Exits 1 on a regression, so it can run next to the tests or in CI. The breakdown shows where the
+time goes when the budget is exceeded:
+
+    python bench_startup.py --top 30 --output bench_startup_results.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+from typing import Any, Dict, List
+
+# Only needed by the moviepy render engine or the LLM endpoints, which import them on first use
+LAZY_MODULES = ["moviepy", "numpy", "langchain", "langchain_core", "langchain_deepseek", "openai", "bs4", "requests"]
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "1.5"))
+
+_PROBE = """
+import sys, json, time
+started = time.perf_counter()
+import api
+seconds = time.perf_counter() - started
+print(json.dumps({"seconds": seconds, "modules": sorted(sys.modules)}))
+"""
+
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """Self time in seconds of every module imported, from `python -X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = [field.strip() for field in line[len("import time:"):].split("|")]
+        if not fields[0].isdigit(): # header line
+            continue
+        modules[fields[2]] = int(fields[0]) / 1e6
+    return modules
+
+
+def run_once(directory: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE],
+        cwd=directory, capture_output=True, text=True, timeout=120,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing api failed:\n{proc.stderr[-2000:]}")
+    probe = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {
+        "import_seconds": probe["seconds"],
+        "process_seconds": wall,
+        "modules": probe["modules"],
+        "self_seconds": parse_importtime(proc.stderr),
+    }
+
+
+def breakdown(self_seconds: Dict[str, float]) -> Dict[str, float]:
+    """Import self time summed per top-level package, slowest first."""
+    packages: Dict[str, float] = {}
+    for name, seconds in self_seconds.items():
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + seconds
+    return dict(sorted(packages.items(), key=lambda item: item[1], reverse=True))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the cold start (import time) of the API server.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time; the median is checked")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_SECONDS, help="Maximum median import time in seconds")
+    parser.add_argument("--lazy", nargs="*", default=LAZY_MODULES, help="Modules that must not be imported at startup")
+    parser.add_argument("--top", type=int, default=15, help="Packages to show in the breakdown")
+    parser.add_argument("--output", default=None, help="Where to write the JSON results, if anywhere")
+    args = parser.parse_args(argv)
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    run_once(directory) # Writes the bytecode caches, so every timed run is a normal worker boot
+    runs: List[Dict[str, Any]] = []
+    for run in range(args.runs):
+        result = run_once(directory)
+        runs.append(result)
+        print(f"Run {run + 1}/{args.runs}: import api {result['import_seconds']:.3f}s, "
+              f"process {result['process_seconds']:.3f}s", flush=True)
+
+    median = statistics.median(r["import_seconds"] for r in runs)
+    packages = breakdown(runs[-1]["self_seconds"])
+    eagerly_loaded = sorted({name.split(".")[0] for name in runs[-1]["modules"]} & set(args.lazy))
+
+    print("\nImport time by package (self time, last run):")
+    for package, seconds in list(packages.items())[:args.top]:
+        print(f"  {package:<30} {seconds * 1000:8.1f} ms")
+
+    failures = []
+    if median > args.budget:
+        failures.append(f"median import time {median:.3f}s exceeds the {args.budget:.3f}s budget")
+    if eagerly_loaded:
+        failures.append(f"imported at startup but should load lazily: {', '.join(eagerly_loaded)}")
+
+    if args.output:
+        report = {
+            "created_at": time.time(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "budget_seconds": args.budget,
+            "median_import_seconds": round(median, 4),
+            "runs": [{k: round(r[k], 4) for k in ("import_seconds", "process_seconds")} for r in runs],
+            "packages": {package: round(seconds, 4) for package, seconds in packages.items()},
+            "eagerly_loaded": eagerly_loaded,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote results to {args.output}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print(f"OK: median import time {median:.3f}s, budget {args.budget:.3f}s")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
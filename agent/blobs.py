@@ -0,0 +1,257 @@
+import os
+import time
+import uuid
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from render_cache import file_digest, remember_digest
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = os.getenv(
+    "BLOB_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "blobs"),
+)
+BLOB_DB_PATH = os.getenv("BLOB_DB_PATH", os.path.join(os.path.dirname(BLOB_DIR), "blobs.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    media_type TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    path TEXT NOT NULL,
+    sha256 TEXT NOT NULL REFERENCES blobs (sha256),
+    created_at REAL NOT NULL,
+    PRIMARY KEY (media_type, filename)
+);
+CREATE INDEX IF NOT EXISTS aliases_sha256 ON aliases (sha256);
+"""
+
+
+class BlobStore:
+    """
+    Content-addressed storage for uploaded media. Each distinct file is stored once under its SHA-256
+    and every name it was uploaded under is an alias: a hard link in the media directory, so static
+    serving and renders keep using plain paths. The aliases table is the reference count; a blob's
+    space is reclaimed when its last alias is deleted or replaced. Blobs and media directories must be
+    on one filesystem. Changes run in IMMEDIATE transactions, so API workers in several processes can
+    share the store.
+    """
+
+    def __init__(self, directory: str = BLOB_DIR, db_path: str = BLOB_DB_PATH):
+        self.directory = directory
+        self.db_path = db_path
+        os.makedirs(self.directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _open(self) -> sqlite3.Connection:
+        # One short-lived connection per call keeps this safe to use from any thread
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = self._open()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # Held while files are linked or removed, so the table and the filesystem change together
+        conn = self._open()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.directory, sha256[:2], sha256)
+
+    def _same_blob(self, path: str, sha256: str) -> bool:
+        try:
+            return os.path.samefile(path, self.blob_path(sha256))
+        except FileNotFoundError:
+            return False
+
+    def _collect(self, conn: sqlite3.Connection, sha256: str) -> int:
+        """Removes the blob if no alias references it any more; returns the bytes reclaimed."""
+        if conn.execute("SELECT 1 FROM aliases WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone():
+            return 0
+        row = conn.execute("SELECT size FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+        try:
+            os.remove(self.blob_path(sha256))
+        except FileNotFoundError:
+            pass
+        logger.info(f"Removed blob {sha256[:16]}, its last alias is gone")
+        return row["size"] if row else 0
+
+    def adopt(self, media_type: str, path: str, sha256: str) -> Dict[str, Any]:
+        """
+        Registers the file just written at path (e.g. a finished upload) as an alias of its content.
+        Content that is already stored replaces the file with a link to the existing blob, freeing the copy.
+        Returns {"sha256", "deduplicated", "reclaimed_bytes"}; the latter counts a blob freed because
+        this name pointed at different content before.
+        """
+        blob_path = self.blob_path(sha256)
+        filename = os.path.basename(path)
+        deduplicated = False
+        with self._transaction() as conn:
+            previous = conn.execute(
+                "SELECT sha256 FROM aliases WHERE media_type = ? AND filename = ?", (media_type, filename)
+            ).fetchone()
+            if os.path.exists(blob_path):
+                if not os.path.samefile(path, blob_path):
+                    # Link under a temporary name first, so the name never disappears
+                    link_path = os.path.join(os.path.dirname(path), f".{filename}.{uuid.uuid4().hex}.link")
+                    os.link(blob_path, link_path)
+                    os.replace(link_path, path)
+                    deduplicated = True
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.link(path, blob_path)
+                # Aliases share the blob's inode: read-only so nothing edits every alias in place
+                os.chmod(blob_path, 0o444)
+            conn.execute(
+                "INSERT OR IGNORE INTO blobs (sha256, size, created_at) VALUES (?, ?, ?)",
+                (sha256, os.path.getsize(blob_path), time.time()),
+            )
+            conn.execute(
+                """
+                INSERT INTO aliases (media_type, filename, path, sha256, created_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (media_type, filename) DO UPDATE SET path = excluded.path, sha256 = excluded.sha256
+                """,
+                (media_type, filename, os.path.abspath(path), sha256, time.time()),
+            )
+            reclaimed = self._collect(conn, previous["sha256"]) if previous and previous["sha256"] != sha256 else 0
+        remember_digest(path, sha256)
+        if deduplicated:
+            logger.info(f"Upload {media_type}/{filename} is a duplicate of blob {sha256[:16]}, stored once")
+        return {"sha256": sha256, "deduplicated": deduplicated, "reclaimed_bytes": reclaimed}
+
+    def release(self, media_type: str, path: str) -> Dict[str, Any]:
+        """
+        Deletes the alias at path. The blob's space is reclaimed only with its last alias.
+        Files the store does not track are simply removed. Returns {"reclaimed_bytes", "references"}.
+        """
+        filename = os.path.basename(path)
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT sha256 FROM aliases WHERE media_type = ? AND filename = ?", (media_type, filename)
+            ).fetchone()
+            untracked_size = 0
+            if row is None or not self._same_blob(path, row["sha256"]):
+                stat = os.stat(path)
+                untracked_size = stat.st_size if stat.st_nlink == 1 else 0
+            os.remove(path)
+            if row is None:
+                return {"reclaimed_bytes": untracked_size, "references": 0}
+            conn.execute("DELETE FROM aliases WHERE media_type = ? AND filename = ?", (media_type, filename))
+            reclaimed = self._collect(conn, row["sha256"])
+            references = conn.execute("SELECT COUNT(*) FROM aliases WHERE sha256 = ?", (row["sha256"],)).fetchone()[0]
+        return {"reclaimed_bytes": reclaimed + untracked_size, "references": references}
+
+    def sha256_of(self, media_type: str, filename: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT sha256 FROM aliases WHERE media_type = ? AND filename = ?", (media_type, filename)
+            ).fetchone()
+        return row["sha256"] if row else None
+
+    def seed_digests(self) -> int:
+        """
+        Hands every alias's blob hash to file_digest, so render cache keys and derived image/audio caches
+        use it instead of re-reading the file. Aliases replaced outside the store are skipped.
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT path, sha256 FROM aliases").fetchall()
+        seeded = 0
+        for row in rows:
+            if self._same_blob(row["path"], row["sha256"]):
+                remember_digest(row["path"], row["sha256"])
+                seeded += 1
+        return seeded
+
+    def reconcile(self, media_type: str, directory: str) -> Dict[str, int]:
+        """
+        Brings the aliases of media_type in line with directory: files added or replaced outside the API
+        are hashed and adopted (duplicates collapse into one blob), aliases whose file is gone are released.
+        """
+        with self._connect() as conn:
+            known = {row["filename"]: row["sha256"] for row in conn.execute(
+                "SELECT filename, sha256 FROM aliases WHERE media_type = ?", (media_type,)
+            )}
+        adopted = released = 0
+        seen = set()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False):
+                    continue
+                seen.add(entry.name)
+                sha256 = known.get(entry.name)
+                if sha256 and self._same_blob(entry.path, sha256):
+                    continue
+                try:
+                    self.adopt(media_type, entry.path, file_digest(entry.path))
+                    adopted += 1
+                except FileNotFoundError: # Deleted while we were scanning
+                    seen.discard(entry.name)
+                except OSError as e: # e.g. a filesystem without hard links
+                    logger.warning(f"Could not store {entry.path} as a blob: {e}")
+        for filename in set(known) - seen:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM aliases WHERE media_type = ? AND filename = ?", (media_type, filename))
+                self._collect(conn, known[filename])
+            released += 1
+        if adopted or released:
+            logger.info(f"Reconciled {media_type} blobs: {adopted} adopted, {released} released")
+        return {"adopted": adopted, "released": released}
+
+    def collect_garbage(self) -> int:
+        """Removes blob files without a row or without aliases, e.g. left by a crash mid-upload. Returns bytes freed."""
+        freed = 0
+        with self._transaction() as conn:
+            referenced = {row[0] for row in conn.execute("SELECT DISTINCT sha256 FROM aliases")}
+            for row in conn.execute("SELECT sha256 FROM blobs").fetchall():
+                if row["sha256"] not in referenced:
+                    freed += self._collect(conn, row["sha256"])
+            for prefix in os.listdir(self.directory):
+                prefix_dir = os.path.join(self.directory, prefix)
+                if not os.path.isdir(prefix_dir):
+                    continue
+                for name in os.listdir(prefix_dir):
+                    if name not in referenced:
+                        path = os.path.join(prefix_dir, name)
+                        freed += os.path.getsize(path)
+                        os.remove(path)
+        return freed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            blobs, stored = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            aliases, logical = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM aliases a JOIN blobs b ON b.sha256 = a.sha256"
+            ).fetchone()
+        return {
+            "blobs": blobs,
+            "aliases": aliases,
+            "stored_bytes": stored,
+            "logical_bytes": logical,
+            "saved_bytes": logical - stored,
+        }
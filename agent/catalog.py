@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import base64
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+from ffmpeg_engine import probe_duration
+from render_cache import file_digest
+
+logger = logging.getLogger(__name__)
+
+SORT_COLUMNS = {"name": "filename", "created_at": "created_at", "size": "size"}
+IMAGE_TYPES = ("image",)
+TIMED_TYPES = ("music", "uploaded_video", "generated_video")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    media_type TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT,
+    width INTEGER,
+    height INTEGER,
+    duration REAL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (media_type, filename)
+);
+CREATE INDEX IF NOT EXISTS media_created ON media (media_type, created_at, filename);
+CREATE INDEX IF NOT EXISTS media_size ON media (media_type, size, filename);
+"""
+
+
+class CatalogError(Exception):
+    """Raised for invalid catalog queries (unknown sort column, malformed cursor)."""
+
+
+def _encode_cursor(value: Any, filename: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, filename]).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        value, filename = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return value, filename
+    except Exception:
+        raise CatalogError("Invalid cursor")
+
+
+class MediaCatalog:
+    """
+    SQLite index of the media directories, kept current by upload/delete/generate and a
+    periodic reconcile pass, so listings never have to scan the filesystem.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per call keeps this safe to use from any thread; committed on
+        # success and always closed
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _describe(self, media_type: str, path: str, sha256: Optional[str]) -> Dict[str, Any]:
+        stat = os.stat(path)
+        entry = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256 or file_digest(path),
+            "width": None,
+            "height": None,
+            "duration": None,
+        }
+        try:
+            if media_type in IMAGE_TYPES:
+                with Image.open(path) as img: # Header only
+                    entry["width"], entry["height"] = img.size
+            elif media_type in TIMED_TYPES:
+                entry["duration"] = probe_duration(path)
+        except Exception as e:
+            logger.warning(f"Could not read metadata of {path}: {e}")
+        return entry
+
+    def upsert(self, media_type: str, path: str, sha256: Optional[str] = None):
+        """Indexes (or re-indexes) a file. created_at is kept from the first time it was seen."""
+        entry = self._describe(media_type, path, sha256)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO media (media_type, filename, size, mtime_ns, sha256, width, height, duration, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (media_type, filename) DO UPDATE SET
+                    size = excluded.size, mtime_ns = excluded.mtime_ns, sha256 = excluded.sha256,
+                    width = excluded.width, height = excluded.height, duration = excluded.duration
+                """,
+                (media_type, os.path.basename(path), entry["size"], entry["mtime_ns"], entry["sha256"],
+                 entry["width"], entry["height"], entry["duration"], time.time()),
+            )
+
+    def remove(self, media_type: str, filename: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM media WHERE media_type = ? AND filename = ?", (media_type, filename))
+
+    def get(self, media_type: str, filename: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM media WHERE media_type = ? AND filename = ?", (media_type, filename)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def reconcile(self, media_type: str, directory: str) -> Dict[str, int]:
+        """Brings the index in line with the directory; only new or changed files are re-read."""
+        with self._connect() as conn:
+            known = {
+                row["filename"]: (row["size"], row["mtime_ns"])
+                for row in conn.execute("SELECT filename, size, mtime_ns FROM media WHERE media_type = ?", (media_type,))
+            }
+        seen = set()
+        added = updated = 0
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                previous = known.get(entry.name)
+                if previous == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                try:
+                    self.upsert(media_type, entry.path)
+                except FileNotFoundError: # Deleted while we were scanning
+                    seen.discard(entry.name)
+                    continue
+                if previous is None:
+                    added += 1
+                else:
+                    updated += 1
+        stale = [name for name in known if name not in seen]
+        if stale:
+            with self._connect() as conn:
+                conn.executemany(
+                    "DELETE FROM media WHERE media_type = ? AND filename = ?", [(media_type, name) for name in stale]
+                )
+        if added or updated or stale:
+            logger.info(f"Reconciled {media_type}: {added} added, {updated} updated, {len(stale)} removed")
+        return {"added": added, "updated": updated, "removed": len(stale)}
+
+    def list(
+        self,
+        media_type: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: str = "name",
+        order: str = "asc",
+        prefix: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Keyset-paginated listing. Returns (items, next_cursor); next_cursor is None on the last page."""
+        if sort not in SORT_COLUMNS:
+            raise CatalogError(f"Invalid sort. Use one of: {', '.join(SORT_COLUMNS)}")
+        if order not in ("asc", "desc"):
+            raise CatalogError("Invalid order. Use 'asc' or 'desc'")
+        column = SORT_COLUMNS[sort]
+        comparison = ">" if order == "asc" else "<"
+
+        query = "SELECT * FROM media WHERE media_type = ?"
+        args: List[Any] = [media_type]
+        if prefix:
+            # Range scan instead of LIKE so '%'/'_' in the prefix are taken literally
+            query += " AND filename >= ? AND filename < ?"
+            args += [prefix, prefix + "\U0010ffff"]
+        if cursor:
+            value, filename = _decode_cursor(cursor)
+            if column == "filename":
+                query += f" AND filename {comparison} ?"
+                args.append(filename)
+            else:
+                query += f" AND ({column}, filename) {comparison} (?, ?)"
+                args += [value, filename]
+        direction = order.upper()
+        query += f" ORDER BY {column} {direction}, filename {direction} LIMIT ?"
+        args.append(limit + 1)
+
+        with self._connect() as conn:
+            rows = [dict(row) for row in conn.execute(query, args)]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = _encode_cursor(last[column], last["filename"])
+        return rows, next_cursor
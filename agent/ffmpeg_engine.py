@@ -0,0 +1,404 @@
+import os
+import re
+import math
+import subprocess
+import logging
+from typing import Callable, List, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def _find_ffmpeg() -> str:
+    # Prefer the binary bundled with imageio-ffmpeg (what MoviePy uses), then the system one
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+
+FFMPEG_BINARY = _find_ffmpeg()
+
+# Encoder settings shared by every ffmpeg render so outputs match MoviePy's write_videofile defaults
+X264_PRESET = "medium"
+PREVIEW_X264_PRESET = "ultrafast" # Draft renders: bigger files, several times faster to encode
+AUDIO_SAMPLE_RATE = 44100
+
+# Container layouts: "mp4" is a regular MP4 with the index moved to the front (faststart),
+# "fmp4" is fragmented MP4 playable while it is still being written, "hls" writes an
+# EVENT playlist plus fMP4 segments into the output path's directory.
+OUTPUT_FORMATS = ("mp4", "fmp4", "hls")
+STREAMING_KEYFRAME_INTERVAL = 2.0 # seconds per fragment/segment
+
+
+class FFmpegError(Exception):
+    """Raised when an ffmpeg invocation fails or the fast path cannot handle the input."""
+
+
+def run_ffmpeg(
+    args: List[str],
+    total_duration: Optional[float] = None,
+    progress_callback: Optional[Callable[[float], None]] = None
+) -> None:
+    """
+    Runs ffmpeg with the given arguments (without the binary itself).
+    If total_duration and progress_callback are given, encode progress is reported as a 0.0-1.0 fraction.
+    """
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-nostats", "-loglevel", "error", "-y", "-progress", "pipe:1"] + args
+    logger.debug(f"Running ffmpeg: {' '.join(cmd)}")
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except OSError as e:
+        raise FFmpegError(f"Could not start ffmpeg: {e}")
+
+    last_reported = 0.0
+    for line in proc.stdout:
+        if not (progress_callback and total_duration) or not line.startswith("out_time_us="):
+            continue
+        try:
+            fraction = min(1.0, int(line.split("=", 1)[1]) / 1_000_000 / total_duration)
+        except ValueError: # "N/A" before the first frame
+            continue
+        if fraction - last_reported >= 0.01:
+            last_reported = fraction
+            try:
+                progress_callback(fraction)
+            except Exception as e:
+                logger.debug(f"Progress callback failed: {e}")
+
+    _, stderr = proc.communicate()
+    if proc.returncode != 0:
+        raise FFmpegError(f"ffmpeg exited with code {proc.returncode}: {stderr.strip()[-2000:]}")
+    if progress_callback and total_duration:
+        progress_callback(1.0)
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """Reads a media file's duration in seconds from ffmpeg's stream info, or None if unknown."""
+    try:
+        proc = subprocess.run([FFMPEG_BINARY, "-hide_banner", "-i", path], capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise FFmpegError(f"Could not probe {path}: {e}")
+    # ffmpeg exits non-zero without an output file, the info is still on stderr
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", proc.stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def output_format_args(output_format: str, output_path: str, encoding: bool = True) -> List[str]:
+    """
+    Muxer arguments placed right before the output path for the given OUTPUT_FORMATS entry.
+    Pass encoding=False when the video is stream-copied; its keyframes must then already be in place.
+    """
+    if output_format == "mp4":
+        return ["-movflags", "+faststart"]
+    # Streaming layouts need a keyframe at every fragment/segment boundary
+    keyframes = ["-force_key_frames", f"expr:gte(t,n_forced*{STREAMING_KEYFRAME_INTERVAL})"] if encoding else []
+    if output_format == "fmp4":
+        return keyframes + [
+            "-movflags", "+frag_keyframe+empty_moov+default_base_moof",
+            "-frag_duration", str(int(STREAMING_KEYFRAME_INTERVAL * 1_000_000)),
+            "-f", "mp4",
+        ]
+    if output_format == "hls":
+        return keyframes + [
+            "-f", "hls",
+            "-hls_time", str(STREAMING_KEYFRAME_INTERVAL),
+            "-hls_playlist_type", "event",
+            "-hls_segment_type", "fmp4",
+            "-hls_flags", "independent_segments",
+            "-hls_segment_filename", os.path.join(os.path.dirname(os.path.abspath(output_path)), "segment_%05d.m4s"),
+        ]
+    raise FFmpegError(f"Unknown output format: {output_format}")
+
+
+def _even(value: int) -> int:
+    # libx264 with yuv420p needs even dimensions
+    return max(2, value - value % 2)
+
+
+def _concat_path(path: str) -> str:
+    return "'" + os.path.abspath(path).replace("'", "'\\''") + "'"
+
+
+def write_concat_list(image_paths: List[str], image_durations: List[float], list_path: str) -> None:
+    """Writes a concat-demuxer script that shows each image for its duration in seconds."""
+    with open(list_path, "w") as f:
+        f.write("ffconcat version 1.0\n")
+        for path, duration in zip(image_paths, image_durations):
+            f.write(f"file {_concat_path(path)}\nduration {duration:.6f}\n")
+        # The demuxer ignores the duration of the last entry unless the file is repeated
+        f.write(f"file {_concat_path(image_paths[-1])}\n")
+
+
+def slideshow_video_filter(image_paths: List[str], fps: int, image_size: Optional[Tuple[int, int]]) -> str:
+    """
+    Builds the filter that mirrors MoviePy's output. MoviePy's resize(width=..., height=...) keeps the
+    aspect ratio and fits the height, and concatenate_videoclips("compose") centers every clip on a
+    black canvas as large as the biggest clip.
+    """
+    sizes = []
+    for path in image_paths:
+        with Image.open(path) as img: # Only reads the header
+            sizes.append(img.size)
+
+    if image_size:
+        target_height = _even(image_size[1])
+        widths = [math.ceil(w * target_height / h) for w, h in sizes]
+        width, height = _even(max(widths) + 1), target_height
+        geometry = f"scale=-2:{height},"
+    else:
+        width, height = _even(max(w for w, _ in sizes)), _even(max(h for _, h in sizes))
+        geometry = ""
+    geometry += f"crop='min(iw,{width})':'min(ih,{height})',pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black"
+    return f"{geometry},setsar=1,fps={fps},format=yuv420p"
+
+
+def render_slideshow(
+    image_paths: List[str],
+    audio_path: Optional[str],
+    output_path: str,
+    work_dir: str,
+    image_duration: float = 3.0,
+    fps: int = 24,
+    video_duration: Optional[float] = None,
+    image_size: Optional[Tuple[int, int]] = None,
+    progress_callback: Optional[Callable[[float], None]] = None,
+    output_format: str = "mp4",
+    audio_fitted: bool = False,
+    image_durations: Optional[List[float]] = None,
+    threads: Optional[int] = None,
+    preset: str = X264_PRESET
+) -> str:
+    """
+    Renders a static slideshow with a single ffmpeg invocation. Each image is decoded once by the
+    concat demuxer, and the soundtrack is looped/trimmed to the video length with ffmpeg filters.
+    With audio_fitted the soundtrack is already AAC of the right length and is muxed by stream copy.
+    image_durations, if given, sets each image's duration and takes precedence over the other two.
+    threads caps the encoder's threads when several encodes run side by side; preset is the x264 preset.
+    """
+    if not image_paths:
+        raise FFmpegError("Image list is empty.")
+
+    num_images = len(image_paths)
+    if not image_durations:
+        image_durations = [(video_duration / num_images) if video_duration else image_duration] * num_images
+    total_duration = sum(image_durations)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    list_path = os.path.join(work_dir, f"concat-{os.urandom(4).hex()}.txt")
+    write_concat_list(image_paths, image_durations, list_path)
+
+    try:
+        args = ["-f", "concat", "-safe", "0", "-i", list_path]
+        has_audio = bool(audio_path and os.path.exists(audio_path) and os.path.getsize(audio_path) > 0)
+        if has_audio and audio_fitted:
+            args += ["-i", audio_path]
+        elif has_audio:
+            # Loop the input indefinitely, then cut it to the video length
+            args += ["-stream_loop", "-1", "-i", audio_path]
+
+        args += ["-vf", slideshow_video_filter(image_paths, fps, image_size)]
+        args += ["-map", "0:v:0", "-c:v", "libx264", "-preset", preset]
+        if threads:
+            args += ["-threads", str(threads)]
+        if has_audio and audio_fitted:
+            args += ["-map", "1:a:0", "-c:a", "copy"]
+        elif has_audio:
+            args += [
+                "-map", "1:a:0",
+                "-af", f"atrim=0:{total_duration:.6f},asetpts=PTS-STARTPTS",
+                "-c:a", "aac", "-ar", str(AUDIO_SAMPLE_RATE),
+            ]
+        args += ["-t", f"{total_duration:.6f}"] + output_format_args(output_format, output_path) + [output_path]
+
+        logger.info(f"Rendering {num_images} images with ffmpeg fast path to: {output_path}")
+        run_ffmpeg(args, total_duration=total_duration, progress_callback=progress_callback)
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+
+    return output_path
+
+
+def _bitrate_args(video_bitrate: Optional[int]) -> List[str]:
+    # Average bitrate in kbit/s with a matching cap; None keeps x264's default quality
+    if not video_bitrate:
+        return []
+    return ["-b:v", f"{video_bitrate}k", "-maxrate", f"{video_bitrate}k", "-bufsize", f"{2 * video_bitrate}k"]
+
+
+def render_renditions(
+    image_paths: List[str],
+    audio_path: Optional[str],
+    renditions: List[dict],
+    work_dir: str,
+    image_durations: List[float],
+    fps: int = 24,
+    image_size: Optional[Tuple[int, int]] = None,
+    progress_callback: Optional[Callable[[float], None]] = None,
+    output_format: str = "mp4",
+    audio_fitted: bool = False,
+    preset: str = X264_PRESET
+) -> List[str]:
+    """
+    Renders a static slideshow at several sizes in one ffmpeg invocation. The images are decoded and
+    composed once (as in render_slideshow, at image_size), then split into one scaler and x264 encoder per
+    rendition ({"output_path", "image_size", "video_bitrate"}; video_bitrate in kbit/s, None for x264's
+    default quality). The soundtrack is processed once too: stream-copied into every output when
+    audio_fitted, otherwise looped/trimmed and AAC-encoded per output.
+    """
+    if not image_paths:
+        raise FFmpegError("Image list is empty.")
+    if not renditions:
+        raise FFmpegError("No renditions to render.")
+
+    total_duration = sum(image_durations)
+    list_path = os.path.join(work_dir, f"concat-{os.urandom(4).hex()}.txt")
+    write_concat_list(image_paths, image_durations, list_path)
+
+    try:
+        args = ["-f", "concat", "-safe", "0", "-i", list_path]
+        has_audio = bool(audio_path and os.path.exists(audio_path) and os.path.getsize(audio_path) > 0)
+        if has_audio and audio_fitted:
+            args += ["-i", audio_path]
+        elif has_audio:
+            args += ["-stream_loop", "-1", "-i", audio_path]
+
+        count = len(renditions)
+        graph = [f"[0:v]{slideshow_video_filter(image_paths, fps, image_size)},split={count}" + "".join(f"[s{i}]" for i in range(count))]
+        for i, rendition in enumerate(renditions):
+            width, height = _even(rendition["image_size"][0]), _even(rendition["image_size"][1])
+            graph.append(
+                f"[s{i}]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black,setsar=1[v{i}]"
+            )
+        if has_audio and not audio_fitted:
+            graph.append(
+                f"[1:a]atrim=0:{total_duration:.6f},asetpts=PTS-STARTPTS,asplit={count}" + "".join(f"[a{i}]" for i in range(count))
+            )
+        args += ["-filter_complex", ";".join(graph)]
+
+        for i, rendition in enumerate(renditions):
+            output_path = rendition["output_path"]
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+            args += ["-map", f"[v{i}]", "-c:v", "libx264", "-preset", preset] + _bitrate_args(rendition.get("video_bitrate"))
+            if has_audio and audio_fitted:
+                args += ["-map", "1:a:0", "-c:a", "copy"]
+            elif has_audio:
+                args += ["-map", f"[a{i}]", "-c:a", "aac", "-ar", str(AUDIO_SAMPLE_RATE)]
+            args += ["-t", f"{total_duration:.6f}"] + output_format_args(output_format, output_path) + [output_path]
+
+        logger.info(f"Rendering {len(image_paths)} images as {count} renditions in one ffmpeg pass")
+        run_ffmpeg(args, total_duration=total_duration, progress_callback=progress_callback)
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+
+    return [rendition["output_path"] for rendition in renditions]
+
+
+def mux_audio(
+    video_path: str,
+    audio_path: Optional[str],
+    output_path: str,
+    duration: float,
+    output_format: str = "mp4"
+) -> str:
+    """
+    Adds a soundtrack (already AAC and fitted to duration) to a rendered video by stream copy,
+    so variants of the same slideshow with different music share one video encode.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    args = ["-i", video_path]
+    if audio_path:
+        args += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+    else:
+        args += ["-map", "0:v:0"]
+    args += ["-c", "copy", "-t", f"{duration:.6f}"]
+    args += output_format_args(output_format, output_path, encoding=False) + [output_path]
+    run_ffmpeg(args)
+    return output_path
+
+
+def encode_at_bitrate(
+    video_path: str,
+    output_path: str,
+    video_bitrate: int,
+    output_format: str = "mp4",
+    preset: str = X264_PRESET
+) -> str:
+    """
+    Re-encodes the video track of a finished render at video_bitrate kbit/s, with the same rate control
+    as render_renditions; the audio is stream-copied. For renders whose engine cannot set a bitrate.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    args = ["-i", video_path, "-map", "0:v:0", "-map", "0:a:0?", "-c:v", "libx264", "-preset", preset]
+    args += _bitrate_args(video_bitrate) + ["-c:a", "copy"]
+    args += output_format_args(output_format, output_path) + [output_path]
+    run_ffmpeg(args)
+    return output_path
+
+
+def encode_image_segment(
+    image_path: str,
+    output_path: str,
+    frames: int,
+    fps: int,
+    streaming: bool = False,
+    threads: Optional[int] = None
+) -> str:
+    """
+    Encodes one still image as a self-contained H.264 segment of `frames` frames. Every segment starts
+    on a keyframe with identical encoder settings, so segments can be joined by stream copy.
+    With streaming, keyframes are also placed every STREAMING_KEYFRAME_INTERVAL seconds.
+    """
+    args = ["-loop", "1", "-framerate", str(fps), "-i", image_path, "-frames:v", str(frames)]
+    args += ["-vf", "setsar=1,format=yuv420p", "-c:v", "libx264", "-preset", X264_PRESET]
+    if threads:
+        args += ["-threads", str(threads)]
+    if streaming:
+        args += ["-force_key_frames", f"expr:gte(t,n_forced*{STREAMING_KEYFRAME_INTERVAL})"]
+    # Fixed timescale so every segment's timestamps line up when concatenated
+    args += ["-video_track_timescale", str(fps * 1000), "-an", "-f", "mp4", output_path]
+    run_ffmpeg(args)
+    return output_path
+
+
+def concat_segments(
+    segment_paths: List[str],
+    audio_path: Optional[str],
+    output_path: str,
+    work_dir: str,
+    duration: float,
+    output_format: str = "mp4"
+) -> str:
+    """
+    Joins encoded segments by stream copy and muxes in a soundtrack (AAC, already fitted to duration).
+    Nothing is decoded or encoded.
+    """
+    if not segment_paths:
+        raise FFmpegError("Segment list is empty.")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    list_path = os.path.join(work_dir, f"segments-{os.urandom(4).hex()}.txt")
+    with open(list_path, "w") as f:
+        f.write("ffconcat version 1.0\n")
+        for path in segment_paths:
+            f.write(f"file {_concat_path(path)}\n")
+    try:
+        args = ["-f", "concat", "-safe", "0", "-i", list_path]
+        if audio_path:
+            args += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+        else:
+            args += ["-map", "0:v:0"]
+        args += ["-c", "copy", "-t", f"{duration:.6f}"]
+        args += output_format_args(output_format, output_path, encoding=False) + [output_path]
+        run_ffmpeg(args)
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+    return output_path
@@ -0,0 +1,53 @@
+import os
+import logging
+import threading
+from typing import Tuple
+
+from PIL import Image, ImageOps
+
+from render_cache import file_digest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_CACHE_DIR = os.getenv(
+    "IMAGE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "derived", "images"),
+)
+
+
+class ImageCache:
+    """
+    Derived-asset store of images decoded once, letterboxed to a target resolution and saved as
+    fast-to-decode PNG. Entries are keyed by the source content hash, so an edited file is re-derived.
+    """
+
+    def __init__(self, directory: str = DEFAULT_IMAGE_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, image_path: str, size: Tuple[int, int]) -> str:
+        digest = file_digest(image_path) # Memoized on mtime, so cheap for unchanged files
+        return os.path.join(self.directory, f"{digest[:32]}_{size[0]}x{size[1]}.png")
+
+    def get(self, image_path: str, size: Tuple[int, int]) -> str:
+        """Returns the normalized image for size, deriving it on first use."""
+        cached_path = self.path_for(image_path, size)
+        if os.path.exists(cached_path):
+            return cached_path
+
+        with Image.open(image_path) as img:
+            # JPEGs are decoded at a reduced scale that still covers size (either orientation), which is
+            # much faster than a full decode for small targets and a no-op for full-size renders
+            img.draft("RGB", (max(size), max(size)))
+            img = ImageOps.exif_transpose(img).convert("RGB")
+            normalized = ImageOps.pad(img, size, method=Image.LANCZOS, color=(0, 0, 0))
+        # Write under a temporary name so concurrent renders never read a half-written file
+        tmp_path = f"{cached_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            normalized.save(tmp_path, format="PNG", compress_level=1)
+            os.replace(tmp_path, cached_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        logger.info(f"Normalized {os.path.basename(image_path)} to {size[0]}x{size[1]}")
+        return cached_path
@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RENDER_QUEUE_DB_PATH = os.getenv(
+    "RENDER_QUEUE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "render_queue.db"),
+)
+# WAL needs shared memory between the processes using the database; set DELETE when the workers reach
+# it over a network filesystem
+RENDER_QUEUE_JOURNAL_MODE = os.getenv("RENDER_QUEUE_JOURNAL_MODE", "WAL")
+# A worker renews its lease every RENDER_HEARTBEAT_SECONDS; a task whose lease ran out (the worker
+# crashed or lost the store) is queued again, up to RENDER_MAX_ATTEMPTS runs in total
+RENDER_LEASE_SECONDS = float(os.getenv("RENDER_LEASE_SECONDS", "30"))
+RENDER_HEARTBEAT_SECONDS = float(os.getenv("RENDER_HEARTBEAT_SECONDS", "2"))
+RENDER_MAX_ATTEMPTS = int(os.getenv("RENDER_MAX_ATTEMPTS", "3"))
+FINISHED_TASK_TTL = 24 * 3600 # Finished tasks are kept this long for the API to pick up their results
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    args TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    lease_expires_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, created_at);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    hostname TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    current_task TEXT,
+    accepting INTEGER NOT NULL DEFAULT 1,
+    tasks_succeeded INTEGER NOT NULL DEFAULT 0,
+    tasks_failed INTEGER NOT NULL DEFAULT 0,
+    outputs INTEGER NOT NULL DEFAULT 0,
+    frames INTEGER NOT NULL DEFAULT 0,
+    busy_seconds REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobStore:
+    """
+    Shared render queue for workers on several machines. The API enqueues pool tasks; workers claim
+    them under a lease that they renew with heartbeats while rendering. A task whose lease expires is
+    queued again for another worker, so a crashed worker only delays its render. Every update from a
+    worker is conditional on it still holding the lease, so a worker that lost its task cannot
+    overwrite the result of the one that took it over. Plain SQL with IMMEDIATE transactions.
+    """
+
+    def __init__(self, db_path: str = RENDER_QUEUE_DB_PATH, lease_seconds: float = RENDER_LEASE_SECONDS, max_attempts: int = RENDER_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            if "accepting" not in {row["name"] for row in conn.execute("PRAGMA table_info(workers)")}: # Queues made before it
+                conn.execute("ALTER TABLE workers ADD COLUMN accepting INTEGER NOT NULL DEFAULT 1")
+
+    def _open(self) -> sqlite3.Connection:
+        # One short-lived connection per call keeps this safe to use from any thread
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA journal_mode={RENDER_QUEUE_JOURNAL_MODE}")
+        return conn
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = self._open()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._open()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def enqueue(self, task_id: str, kind: str, args: List[Any]):
+        """Queues a pool task: kind names the render function in jobs.RENDER_TASKS, args its JSON arguments."""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO tasks (task_id, kind, args, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (task_id, kind, json.dumps(args), time.time()),
+            )
+
+    def _requeue_expired(self, conn: sqlite3.Connection, now: float) -> int:
+        expired = conn.execute(
+            "SELECT task_id, worker_id, attempts FROM tasks WHERE status = 'running' AND lease_expires_at < ?", (now,)
+        ).fetchall()
+        for row in expired:
+            if row["attempts"] >= self.max_attempts:
+                conn.execute(
+                    "UPDATE tasks SET status = 'failed', error = ?, finished_at = ?, worker_id = NULL, lease_expires_at = NULL WHERE task_id = ?",
+                    (f"Render worker lost the task {row['attempts']} times", now, row["task_id"]),
+                )
+                logger.error(f"Render task {row['task_id']} failed: its lease expired {row['attempts']} times")
+            else:
+                conn.execute(
+                    "UPDATE tasks SET status = 'queued', progress = 0, worker_id = NULL, lease_expires_at = NULL WHERE task_id = ?",
+                    (row["task_id"],),
+                )
+                logger.warning(f"Lease of render task {row['task_id']} held by {row['worker_id']} expired, queued it again")
+        return len(expired)
+
+    def requeue_expired(self) -> int:
+        """Queues again (or fails, after max_attempts) the running tasks whose lease has expired."""
+        with self._transaction() as conn:
+            return self._requeue_expired(conn, time.time())
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Leases the oldest queued task to worker_id; returns it with decoded args, or None if the queue is empty."""
+        now = time.time()
+        with self._transaction() as conn:
+            self._requeue_expired(conn, now)
+            row = conn.execute(
+                "SELECT task_id, kind, args, attempts FROM tasks WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                """
+                UPDATE tasks SET status = 'running', worker_id = ?, lease_expires_at = ?, attempts = attempts + 1,
+                    progress = 0, started_at = ?
+                WHERE task_id = ?
+                """,
+                (worker_id, now + self.lease_seconds, now, row["task_id"]),
+            )
+            conn.execute("UPDATE workers SET current_task = ?, last_seen = ? WHERE worker_id = ?", (row["task_id"], now, worker_id))
+        return {"task_id": row["task_id"], "kind": row["kind"], "args": json.loads(row["args"]), "attempt": row["attempts"] + 1}
+
+    def heartbeat(self, task_id: str, worker_id: str, progress: float) -> bool:
+        """Extends the lease and records progress. False means the lease was lost and the task belongs to someone else."""
+        now = time.time()
+        with self._transaction() as conn:
+            held = conn.execute(
+                """
+                UPDATE tasks SET lease_expires_at = ?, progress = ?
+                WHERE task_id = ? AND worker_id = ? AND status = 'running'
+                """,
+                (now + self.lease_seconds, progress, task_id, worker_id),
+            ).rowcount
+            conn.execute("UPDATE workers SET last_seen = ? WHERE worker_id = ?", (now, worker_id))
+        return bool(held)
+
+    def finish(self, task_id: str, worker_id: str, result: Any = None, error: Optional[str] = None) -> bool:
+        """Stores the outcome of a task (result, or error if it raised); ignored, returning False, without the lease."""
+        with self._transaction() as conn:
+            return bool(conn.execute(
+                """
+                UPDATE tasks SET status = ?, result = ?, error = ?, progress = ?, finished_at = ?, lease_expires_at = NULL
+                WHERE task_id = ? AND worker_id = ? AND status = 'running'
+                """,
+                ("failed" if error is not None else "succeeded", json.dumps(result), error,
+                 0.0 if error is not None else 1.0, time.time(), task_id, worker_id),
+            ).rowcount)
+
+    def tasks(self, task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not task_ids:
+            return {}
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM tasks WHERE task_id IN ({', '.join('?' * len(task_ids))})", task_ids
+            ).fetchall()
+        tasks = {}
+        for row in rows:
+            task = dict(row)
+            task["result"] = json.loads(task["result"]) if task["result"] else None
+            task.pop("args")
+            tasks[task["task_id"]] = task
+        return tasks
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            return {row[0]: row[1] for row in conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status")}
+
+    def prune(self, max_age: float = FINISHED_TASK_TTL) -> int:
+        with self._transaction() as conn:
+            return conn.execute(
+                "DELETE FROM tasks WHERE status IN ('succeeded', 'failed') AND finished_at < ?", (time.time() - max_age,)
+            ).rowcount
+
+    def register_worker(self, worker_id: str):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO workers (worker_id, hostname, pid, started_at, last_seen) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (worker_id) DO UPDATE SET hostname = excluded.hostname, pid = excluded.pid,
+                    started_at = excluded.started_at, last_seen = excluded.last_seen, current_task = NULL, accepting = 1
+                """,
+                (worker_id, socket.gethostname(), os.getpid(), now, now),
+            )
+
+    def touch_worker(self, worker_id: str, accepting: bool = True):
+        """Marks an idle worker live; accepting=False while it cannot take tasks (e.g. out of scratch space)."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE workers SET last_seen = ?, accepting = ? WHERE worker_id = ?", (time.time(), int(accepting), worker_id))
+
+    def record_task(self, worker_id: str, succeeded: bool, busy_seconds: float, outputs: int, frames: int):
+        """Adds a finished task to the worker's throughput counters."""
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                UPDATE workers SET current_task = NULL, last_seen = ?, tasks_succeeded = tasks_succeeded + ?,
+                    tasks_failed = tasks_failed + ?, outputs = outputs + ?, frames = frames + ?, busy_seconds = busy_seconds + ?
+                WHERE worker_id = ?
+                """,
+                (time.time(), int(succeeded), int(not succeeded), outputs, frames, busy_seconds, worker_id),
+            )
+
+    def live_workers(self) -> int:
+        """Workers seen within a lease that are taking tasks: the queue's rendering capacity."""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM workers WHERE last_seen >= ? AND accepting = 1", (time.time() - self.lease_seconds,)
+            ).fetchone()[0]
+
+    def worker_stats(self) -> List[Dict[str, Any]]:
+        """Throughput of every worker seen within the last day: tasks, outputs, utilization and encode rate."""
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM workers WHERE last_seen >= ? ORDER BY worker_id", (now - FINISHED_TASK_TTL,)
+            ).fetchall()
+        workers = []
+        for row in rows:
+            uptime = max(row["last_seen"] - row["started_at"], 1e-9)
+            tasks = row["tasks_succeeded"] + row["tasks_failed"]
+            workers.append({
+                "worker_id": row["worker_id"],
+                "hostname": row["hostname"],
+                "pid": row["pid"],
+                "alive": row["last_seen"] >= now - self.lease_seconds,
+                "current_task": row["current_task"],
+                "accepting": bool(row["accepting"]),
+                "tasks_succeeded": row["tasks_succeeded"],
+                "tasks_failed": row["tasks_failed"],
+                "outputs": row["outputs"],
+                "uptime_seconds": round(uptime, 1),
+                "busy_seconds": round(row["busy_seconds"], 2),
+                "utilization": round(min(row["busy_seconds"] / uptime, 1.0), 3),
+                "tasks_per_hour": round(tasks * 3600 / uptime, 2),
+                "frames_per_busy_second": round(row["frames"] / row["busy_seconds"], 2) if row["busy_seconds"] else None,
+            })
+        return workers
@@ -0,0 +1,537 @@
+import os
+import time
+import uuid
+import shutil
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
+from dataclasses import dataclass, field, asdict
+from typing import Any, Callable, Dict, List, Optional
+
+from movie import MovieGenerator, DEFAULT_RENDER_ENGINE, DEFAULT_IMAGE_SIZE, image_durations_for
+from render_metrics import RenderMetrics
+from scratch import ScratchSpace, SCRATCH_BYTES_PER_SECOND
+from blobs import BlobStore
+from job_store import JobStore
+
+logger = logging.getLogger(__name__)
+
+# Pool sizing, overridable from the environment
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+RENDER_QUEUE_DEPTH = int(os.getenv("RENDER_QUEUE_DEPTH", "16"))
+MAX_FINISHED_JOBS = int(os.getenv("RENDER_MAX_FINISHED_JOBS", "500"))
+# "local" renders on this machine's process pool, "queue" hands tasks to render_worker.py processes
+# through the shared JobStore
+RENDER_BACKENDS = ("local", "queue")
+RENDER_BACKEND = os.getenv("RENDER_BACKEND", "local")
+RENDER_POLL_SECONDS = float(os.getenv("RENDER_POLL_SECONDS", "1"))
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the render queue is full."""
+
+
+# Per worker process: one generator, with its caches, reused by every job the worker runs
+_worker_generator: Optional[MovieGenerator] = None
+_worker_scratch: Optional[ScratchSpace] = None
+
+
+def _worker_state():
+    global _worker_generator, _worker_scratch
+    if _worker_generator is None:
+        _worker_generator = MovieGenerator()
+        _worker_scratch = ScratchSpace()
+        try:
+            # Derived image/audio caches key on file hashes; uploads already have theirs in the blob store
+            BlobStore().seed_digests()
+        except Exception as e:
+            logger.warning(f"Could not load blob digests: {e}")
+    return _worker_generator, _worker_scratch
+
+
+def _warm_worker() -> int:
+    # Loads the whole render stack, MoviePy included, before the worker's first job
+    import moviepy.editor # noqa: F401
+
+    _worker_state()
+    return os.getpid()
+
+
+def scratch_estimate(params: Dict[str, Any], outputs: int = 1) -> int:
+    """Rough scratch bytes a render of params needs, used to pick tmpfs and to refuse jobs on a full disk."""
+    durations = image_durations_for(
+        len(params["image_paths"]), params.get("image_duration", 3.0), params.get("video_duration"), params.get("image_durations")
+    )
+    return int(sum(durations) * SCRATCH_BYTES_PER_SECOND * outputs)
+
+
+@dataclass
+class RenderJob:
+    job_id: str
+    params: Dict[str, Any]
+    output_path: str
+    status: str = "queued" # queued -> running -> succeeded | failed
+    progress: float = 0.0
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result_path: Optional[str] = None
+    error: Optional[str] = None
+    cache_key: Optional[str] = None
+    stats: Optional[Dict[str, Any]] = None # Stage timings reported by MovieGenerator
+    task_id: Optional[str] = None # Pool task producing this output, shared by the variants of a batch group
+    worker: Optional[str] = None # Render worker running the task, with the queue backend
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        # Keep server-side paths out of API responses
+        for key in ("params", "output_path", "result_path", "cache_key", "task_id"):
+            data.pop(key)
+        data["filename"] = os.path.basename(self.result_path) if self.result_path else None
+        return data
+
+
+def _render_video(job_id: str, params: Dict[str, Any], output_path: str, progress) -> Dict[str, Any]:
+    """
+    Runs inside a pool worker process. `progress` is a Manager dict shared with the API process.
+    Returns the result path (None on failure) and the render's stage timings.
+    """
+    progress[job_id] = {"status": "running", "progress": 0.0, "started_at": time.time()}
+
+    def report(fraction: float):
+        progress[job_id] = {"status": "running", "progress": fraction, "started_at": progress[job_id]["started_at"]}
+
+    generator, scratch = _worker_state()
+    with scratch.job_dir(scratch_estimate(params)) as temp_dir, generator.job_scratch(temp_dir):
+        result_path = generator.create_video_from_images_and_music(
+            image_paths=params["image_paths"],
+            output_path=output_path,
+            music_path=params.get("music_path"),
+            video_duration=params.get("video_duration"),
+            image_duration=params.get("image_duration", 3.0),
+            fps=params.get("fps", 24),
+            image_size=tuple(params["image_size"]) if params.get("image_size") else DEFAULT_IMAGE_SIZE,
+            progress_callback=report,
+            engine=params.get("engine") or DEFAULT_RENDER_ENGINE,
+            output_format=params.get("output_format", "mp4"),
+            image_durations=params.get("image_durations"),
+        )
+        return {"result_path": result_path, "stats": generator.last_render_stats}
+
+
+def _group_progress(job_ids: List[str], progress) -> Callable[[float], None]:
+    # The jobs of one pool task share its progress
+    started_at = time.time()
+
+    def report(fraction: float):
+        for job_id in job_ids:
+            progress[job_id] = {"status": "running", "progress": fraction, "started_at": started_at}
+
+    report(0.0)
+    return report
+
+
+def _render_variants(job_ids: List[str], params: Dict[str, Any], variants: List[Dict[str, Any]], progress) -> List[Dict[str, Any]]:
+    """
+    Runs inside a pool worker process. Renders the variants of one slideshow (one job each) with a
+    single shared video encode, see MovieGenerator.create_video_variants.
+    """
+    report = _group_progress(job_ids, progress)
+    generator, scratch = _worker_state()
+    with scratch.job_dir(scratch_estimate(params, len(variants))) as temp_dir, generator.job_scratch(temp_dir):
+        return generator.create_video_variants(
+            image_paths=params["image_paths"],
+            variants=variants,
+            image_duration=params.get("image_duration", 3.0),
+            fps=params.get("fps", 24),
+            video_duration=params.get("video_duration"),
+            image_size=tuple(params["image_size"]) if params.get("image_size") else DEFAULT_IMAGE_SIZE,
+            progress_callback=report,
+            engine=params.get("engine") or DEFAULT_RENDER_ENGINE,
+            output_format=params.get("output_format", "mp4"),
+            image_durations=params.get("image_durations"),
+        )
+
+
+def _render_renditions(job_ids: List[str], params: Dict[str, Any], renditions: List[Dict[str, Any]], progress) -> List[Dict[str, Any]]:
+    """
+    Runs inside a pool worker process. Renders the renditions of one slideshow (one job each) from a
+    single decode and soundtrack pass, see MovieGenerator.create_video_renditions.
+    """
+    report = _group_progress(job_ids, progress)
+    generator, scratch = _worker_state()
+    with scratch.job_dir(scratch_estimate(params, len(renditions))) as temp_dir, generator.job_scratch(temp_dir):
+        return generator.create_video_renditions(
+            image_paths=params["image_paths"],
+            music_path=params.get("music_path"),
+            renditions=renditions,
+            image_duration=params.get("image_duration", 3.0),
+            fps=params.get("fps", 24),
+            video_duration=params.get("video_duration"),
+            progress_callback=report,
+            engine=params.get("engine") or DEFAULT_RENDER_ENGINE,
+            output_format=params.get("output_format", "mp4"),
+            image_durations=params.get("image_durations"),
+        )
+
+
+# Pool task functions by name, the name is what the queue backend stores
+RENDER_TASKS = {
+    "video": _render_video,
+    "variants": _render_variants,
+    "renditions": _render_renditions,
+}
+
+
+class JobManager:
+    """
+    Runs video renders on a bounded process pool so the API event loop never blocks on encoding.
+    At most `max_workers` renders run at once and at most `max_queue` more wait for a slot.
+    With the "queue" backend the tasks go to the shared JobStore instead and are rendered by
+    render_worker.py processes, on this machine or others; a poller thread follows their progress.
+    """
+
+    def __init__(self, max_workers: int = RENDER_WORKERS, max_queue: int = RENDER_QUEUE_DEPTH, backend: str = RENDER_BACKEND):
+        if backend not in RENDER_BACKENDS:
+            raise ValueError(f"Unknown render backend '{backend}', use one of: {', '.join(RENDER_BACKENDS)}")
+        self.backend = backend
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._jobs: Dict[str, RenderJob] = {}
+        self._inflight: Dict[str, str] = {} # cache_key -> job_id of the render producing it
+        self._on_success: Dict[str, Callable[[RenderJob], None]] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._progress = None
+        self._store: Optional[JobStore] = None
+        self._poller: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.metrics = RenderMetrics()
+
+    def _ensure_pool(self):
+        # Started lazily so importing the API (or a worker re-importing this module) stays cheap
+        if self.backend == "queue":
+            if self._poller is None:
+                self._store = JobStore()
+                self._poller = threading.Thread(target=self._poll_store, name="render-queue-poller", daemon=True)
+                self._poller.start()
+                logger.info(f"Rendering through the shared queue at {self._store.db_path}, queue depth {self.max_queue}")
+        elif self._executor is None:
+            ctx = multiprocessing.get_context("spawn")
+            self._manager = ctx.Manager()
+            self._progress = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx)
+            logger.info(f"Started render pool with {self.max_workers} workers, queue depth {self.max_queue}")
+
+    def warm_up(self) -> int:
+        """
+        Starts the pool and has its workers import the render stack now instead of on their first job.
+        Blocks until they are done; returns how many distinct workers were warmed. The queue backend's
+        workers warm themselves when they start.
+        """
+        with self._lock:
+            self._ensure_pool()
+            executor = self._executor
+        if executor is None:
+            return 0
+        futures = [executor.submit(_warm_worker) for _ in range(self.max_workers)]
+        return len({future.result() for future in futures})
+
+    def _has_capacity(self) -> bool:
+        if self.backend == "queue":
+            # Shared by every API process: the live workers plus max_queue waiting tasks
+            counts = self._store.counts()
+            return counts.get("queued", 0) + counts.get("running", 0) < self._store.live_workers() + self.max_queue
+        # Counts pool tasks, the variants of a batch group share one
+        active = {job.task_id for job in self._jobs.values() if job.status in ("queued", "running")}
+        return len(active) < self.max_workers + self.max_queue
+
+    def _dispatch(self, kind: str, job_ids: List[str], args: List[Any]):
+        """Starts the pool task RENDER_TASKS[kind](*args, progress) for job_ids, on the pool or through the store."""
+        if self.backend == "queue":
+            self._store.enqueue(self._jobs[job_ids[0]].task_id, kind, args)
+            return
+        future = self._executor.submit(RENDER_TASKS[kind], *args, self._progress)
+        future.add_done_callback(lambda f: self._on_done(job_ids, f))
+
+    def _new_job(
+        self,
+        params: Dict[str, Any],
+        output_dir: str,
+        output_filename: Optional[str],
+        cache_key: Optional[str],
+        on_success: Optional[Callable[[RenderJob], None]],
+        task_id: Optional[str] = None
+    ) -> RenderJob:
+        job_id = uuid.uuid4().hex
+        output_path = os.path.join(output_dir, output_filename or f"generated_video_{job_id}.mp4")
+        job = RenderJob(job_id=job_id, params=params, output_path=output_path, cache_key=cache_key, task_id=task_id or job_id)
+        self._jobs[job_id] = job
+        if cache_key:
+            self._inflight[cache_key] = job_id
+        if on_success:
+            self._on_success[job_id] = on_success
+        return job
+
+    def submit(
+        self,
+        params: Dict[str, Any],
+        output_dir: str,
+        output_filename: Optional[str] = None,
+        cache_key: Optional[str] = None,
+        on_success: Optional[Callable[[RenderJob], None]] = None
+    ) -> RenderJob:
+        """
+        Queues a render. Submitting a cache_key that is already being rendered returns the
+        in-flight job instead of starting a duplicate; on_success runs once the output exists.
+        """
+        with self._lock:
+            if cache_key and cache_key in self._inflight:
+                return self._jobs[self._inflight[cache_key]]
+            self._ensure_pool()
+            if not self._has_capacity():
+                raise QueueFullError("Render queue is full, try again later")
+            job = self._new_job(params, output_dir, output_filename, cache_key, on_success)
+            self._prune_finished()
+            self._dispatch("video", [job.job_id], [job.job_id, params, job.output_path])
+        logger.info(f"Queued render job {job.job_id}")
+        return job
+
+    def submit_variants(
+        self,
+        params: Dict[str, Any],
+        variants: List[Dict[str, Any]],
+        output_dir: str,
+        on_success: Optional[Callable[[RenderJob], None]] = None
+    ) -> List[RenderJob]:
+        """
+        Queues variants of one slideshow that differ only in music ({"music_path", "output_filename",
+        "cache_key"} each) as a single pool task that encodes the video once. Every variant still gets
+        its own job; variants already rendering return their in-flight job.
+        """
+        return self._submit_group("variants", ("music_path",), params, variants, output_dir, on_success)
+
+    def submit_renditions(
+        self,
+        params: Dict[str, Any],
+        renditions: List[Dict[str, Any]],
+        output_dir: str,
+        on_success: Optional[Callable[[RenderJob], None]] = None
+    ) -> List[RenderJob]:
+        """
+        Queues one slideshow at several sizes ({"image_size", "video_bitrate", "output_filename", "cache_key"}
+        each) as a single pool task that decodes the images and prepares the soundtrack once. Same job and
+        in-flight handling as submit_variants.
+        """
+        return self._submit_group("renditions", ("image_size", "video_bitrate"), params, renditions, output_dir, on_success)
+
+    def _submit_group(
+        self,
+        kind: str,
+        fields: tuple,
+        params: Dict[str, Any],
+        variants: List[Dict[str, Any]],
+        output_dir: str,
+        on_success: Optional[Callable[[RenderJob], None]]
+    ) -> List[RenderJob]:
+        # One job per variant (params plus the variant's fields), all rendered by a single pool task
+        with self._lock:
+            jobs: List[Optional[RenderJob]] = []
+            pending = []
+            for variant in variants:
+                cache_key = variant.get("cache_key")
+                if cache_key and cache_key in self._inflight:
+                    jobs.append(self._jobs[self._inflight[cache_key]])
+                else:
+                    jobs.append(None)
+                    pending.append(len(jobs) - 1)
+            if not pending:
+                return jobs
+            self._ensure_pool()
+            if not self._has_capacity():
+                raise QueueFullError("Render queue is full, try again later")
+            task_id = uuid.uuid4().hex
+            for index in pending:
+                variant = variants[index]
+                jobs[index] = self._new_job(
+                    dict(params, **{name: variant.get(name) for name in fields}), output_dir,
+                    variant.get("output_filename"), variant.get("cache_key"), on_success, task_id=task_id,
+                )
+            task_jobs = [jobs[index] for index in pending]
+            job_ids = [job.job_id for job in task_jobs]
+            self._prune_finished()
+            self._dispatch(kind, job_ids, [
+                job_ids,
+                params,
+                [dict({name: job.params.get(name) for name in fields}, output_path=job.output_path) for job in task_jobs],
+            ])
+        logger.info(f"Queued {len(task_jobs)} renders of one slideshow as task {task_id}")
+        return jobs
+
+    def _on_done(self, job_ids: List[str], future: Future):
+        try:
+            outcomes = future.result()
+            error = None
+        except Exception as e:
+            outcomes = None
+            error = e
+        self._finish(job_ids, outcomes, error)
+
+    def _finish(self, job_ids: List[str], outcomes: Any, error: Optional[Any]):
+        if isinstance(outcomes, dict): # Single render
+            outcomes = [outcomes]
+
+        hooks = []
+        with self._lock:
+            for i, job_id in enumerate(job_ids):
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                self._sync_progress(job)
+                job.finished_at = time.time()
+                if error is not None:
+                    job.status = "failed"
+                    job.error = str(error)
+                    logger.error(f"Render job {job_id} failed: {error}")
+                else:
+                    result_path = outcomes[i]["result_path"]
+                    job.stats = outcomes[i]["stats"]
+                    if job.stats:
+                        self.metrics.record(job.stats)
+                    if result_path and os.path.exists(result_path):
+                        job.status = "succeeded"
+                        job.progress = 1.0
+                        job.result_path = result_path
+                    else:
+                        job.status = "failed"
+                        job.error = "Failed to generate video or result path not found."
+                if job.status == "failed":
+                    self._remove_partial_output(job)
+                if self._progress is not None:
+                    self._progress.pop(job_id, None)
+                if job.cache_key:
+                    self._inflight.pop(job.cache_key, None)
+                on_success = self._on_success.pop(job_id, None)
+                if on_success and job.status == "succeeded":
+                    hooks.append((on_success, job))
+        for on_success, job in hooks:
+            try:
+                on_success(job)
+            except Exception as e:
+                logger.error(f"Post-render hook for job {job.job_id} failed: {e}")
+
+    def _remove_partial_output(self, job: RenderJob):
+        # Streaming formats write straight to the output path, don't leave half a video behind
+        target = os.path.dirname(job.output_path) if job.params.get("output_format") == "hls" else job.output_path
+        try:
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            elif os.path.exists(target):
+                os.remove(target)
+        except Exception as e:
+            logger.warning(f"Could not remove partial output of job {job.job_id}: {e}")
+
+    def _poll_store(self):
+        # Mirrors the shared queue into this process's jobs: progress, requeues, and finished tasks
+        while not self._stopped.wait(RENDER_POLL_SECONDS):
+            try:
+                self._sync_store()
+            except Exception as e:
+                logger.warning(f"Could not poll the render queue: {e}")
+
+    def _sync_store(self):
+        self._store.requeue_expired()
+        with self._lock:
+            pending: Dict[str, List[str]] = {}
+            for job in self._jobs.values():
+                if job.status in ("queued", "running"):
+                    pending.setdefault(job.task_id, []).append(job.job_id)
+        tasks = self._store.tasks(list(pending))
+        finished = []
+        with self._lock:
+            for task_id, job_ids in pending.items():
+                task = tasks.get(task_id)
+                if task is None:
+                    # Deleted from the store (or the store was replaced): no worker will ever report it
+                    finished.append((job_ids, {"status": "failed", "result": None, "error": "render task disappeared from queue"}))
+                    continue
+                for job_id in job_ids:
+                    job = self._jobs.get(job_id)
+                    if job is None:
+                        continue
+                    job.worker = task["worker_id"] or job.worker
+                    if task["status"] in ("queued", "running"):
+                        job.status = task["status"]
+                        job.progress = task["progress"]
+                        job.started_at = task["started_at"] if task["status"] == "running" else None
+                    elif job.started_at is None:
+                        job.started_at = task["started_at"]
+                if task["status"] in ("succeeded", "failed"):
+                    finished.append((job_ids, task))
+        for job_ids, task in finished:
+            # Job ids in a task are in the order of its outcomes
+            self._finish(job_ids, task["result"], task["error"] if task["status"] == "failed" else None)
+
+    def _sync_progress(self, job: RenderJob):
+        if self._progress is None or job.status not in ("queued", "running"):
+            return
+        try:
+            state = self._progress.get(job.job_id)
+        except Exception: # Manager already shut down
+            return
+        if state:
+            job.status = state["status"]
+            job.progress = state["progress"]
+            job.started_at = state["started_at"]
+
+    def _prune_finished(self):
+        finished = [job for job in self._jobs.values() if job.status in ("succeeded", "failed")]
+        if len(finished) <= MAX_FINISHED_JOBS:
+            return
+        finished.sort(key=lambda job: job.finished_at or 0)
+        for job in finished[:len(finished) - MAX_FINISHED_JOBS]:
+            del self._jobs[job.job_id]
+
+    def get(self, job_id: str) -> Optional[RenderJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._sync_progress(job)
+            return job
+
+    def list(self) -> List[RenderJob]:
+        with self._lock:
+            for job in self._jobs.values():
+                self._sync_progress(job)
+            return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def queue_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                self._sync_progress(job)
+                counts[job.status] = counts.get(job.status, 0) + 1
+        stats = {"backend": self.backend, "workers": self.max_workers, "queue_depth": self.max_queue, "jobs": counts}
+        if self.backend == "queue":
+            store = self._store or JobStore()
+            stats["workers"] = store.live_workers()
+            stats["tasks"] = store.counts()
+        return stats
+
+    def worker_stats(self) -> List[Dict[str, Any]]:
+        """Per-worker throughput from the shared queue; empty with the local backend."""
+        if self.backend != "queue":
+            return []
+        return (self._store or JobStore()).worker_stats()
+
+    def shutdown(self):
+        self._stopped.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+            self._progress = None
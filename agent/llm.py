@@ -0,0 +1,211 @@
+import os
+import re
+import asyncio
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from llm_cache import LLMResponseCache, LLM_CACHE_ENABLED, cache_key
+
+# langchain_deepseek pulls in LangChain and the OpenAI SDK (over a second of imports), so it is
+# imported when the first chat model is built rather than with this module
+if TYPE_CHECKING:
+    from langchain_deepseek import ChatDeepSeek
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# OpenAI-compatible endpoint used by every agent, overridable from the environment (e.g. a local mock server)
+LLM_API_BASE = os.getenv("LLM_API_BASE", "https://api.siliconflow.cn/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "deepseek-ai/DeepSeek-V3")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8")) # in-flight LLM calls per process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120")) # seconds per attempt
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+# Retried by the OpenAI client with exponential backoff on connection errors, timeouts, 429 and 5xx
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_KEEPALIVE_EXPIRY = 60.0
+
+_CJK = re.compile(r"[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count without a tokenizer: about one token per CJK character and per four other characters."""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+
+def _build_response_models():
+    from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+    # The OpenAI response models defer building their schema until first use. LangChain dumps async
+    # responses in executor threads, and concurrent first dumps can come back empty, so build them once here.
+    ChatCompletion.model_rebuild()
+    ChatCompletionChunk.model_rebuild()
+
+
+def _cached_message(content: str):
+    # Only reached once a chain exists, so LangChain is already loaded
+    from langchain_core.messages import AIMessage
+
+    return AIMessage(content=content)
+
+
+class LLMClients:
+    """
+    Process-wide LLM clients. One pooled keep-alive HTTP client (sync and async) is shared by all
+    chat models, chat models are reused per (model, temperature), and a semaphore caps concurrent calls.
+    Completions are looked up in an optional response cache (anything with get/put/stats) first.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, cache: Optional[Any] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._http_client: Optional[httpx.Client] = None
+        self._async_http_client: Optional[httpx.AsyncClient] = None
+        self._models: Dict[Any, "ChatDeepSeek"] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+        self.in_flight = 0
+
+    def chat_model(self, temperature: float, model: str = LLM_MODEL) -> "ChatDeepSeek":
+        from langchain_deepseek import ChatDeepSeek
+
+        with self._lock:
+            key = (model, temperature)
+            if key not in self._models:
+                if self._http_client is None:
+                    _build_response_models()
+                    self._http_client = httpx.Client(limits=_limits(), timeout=_timeout())
+                    self._async_http_client = httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+                self._models[key] = ChatDeepSeek(
+                    temperature=temperature,
+                    api_base=LLM_API_BASE,
+                    model=model,
+                    timeout=LLM_TIMEOUT,
+                    max_retries=LLM_MAX_RETRIES,
+                    http_client=self._http_client,
+                    http_async_client=self._async_http_client,
+                )
+            return self._models[key]
+
+    def cache_key(self, llm: "ChatDeepSeek", template: str, variables: Dict[str, Any], use_cache: bool = True) -> Optional[str]:
+        """Key of this prompt in the response cache, or None when caching is off for it."""
+        if self.cache is None or not use_cache:
+            return None
+        return cache_key(llm.model_name, llm.temperature, template, variables)
+
+    def invoke(self, chain, variables: Dict[str, Any], key: Optional[str] = None):
+        """Blocking chain.invoke, answered from the response cache when key is given and present."""
+        if key is not None:
+            content = self.cache.get(key)
+            if content is not None:
+                return _cached_message(content)
+        result = chain.invoke(variables)
+        if key is not None:
+            self.cache.put(key, result.content)
+        return result
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def memory_cached(self, key: Optional[str]) -> Optional[str]:
+        """The cached completion if it is in the memory tier; never touches disk, misses are not counted."""
+        return self.cache.get_memory(key) if key is not None else None
+
+    async def acached(self, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        # Memory hits are answered inline, only the SQLite lookup goes to a thread
+        content = self.cache.get_memory(key)
+        if content is None:
+            content = await asyncio.to_thread(self.cache.get, key)
+        return content
+
+    async def astore(self, key: Optional[str], content: str):
+        # An empty completion is never worth keeping, it would be the cached answer for good
+        if key is not None and content:
+            await asyncio.to_thread(self.cache.put, key, content)
+
+    async def ainvoke(self, chain, variables: Dict[str, Any], key: Optional[str] = None):
+        """Runs chain.ainvoke once a concurrency slot is free, unless the response cache has it."""
+        content = await self.acached(key)
+        if content is not None:
+            return _cached_message(content)
+        async with self._get_semaphore():
+            self.in_flight += 1
+            try:
+                result = await chain.ainvoke(variables)
+            finally:
+                self.in_flight -= 1
+        await self.astore(key, result.content)
+        return result
+
+    async def astream(self, chain, variables: Dict[str, Any], key: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Yields the completion text as the model generates it; a cached completion arrives in one piece.
+        The concurrency slot is held until the stream ends. Only streams the model ended normally
+        (finish_reason "stop") are cached; a cut-off or truncated one would become the permanent answer.
+        """
+        content = await self.acached(key)
+        if content is not None:
+            yield content
+            return
+        parts = []
+        finish_reason = None
+        async with self._get_semaphore():
+            self.in_flight += 1
+            try:
+                async for chunk in chain.astream(variables):
+                    finish_reason = chunk.response_metadata.get("finish_reason") or finish_reason
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        yield chunk.content
+            finally:
+                self.in_flight -= 1
+        if finish_reason == "stop":
+            await self.astore(key, "".join(parts))
+        elif key is not None:
+            logger.warning(f"Not caching a stream that ended with finish_reason={finish_reason}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "models": len(self._models),
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+    async def aclose(self):
+        with self._lock:
+            http_client, async_http_client = self._http_client, self._async_http_client
+            self._http_client = self._async_http_client = None
+            self._models.clear()
+        if async_http_client is not None:
+            await async_http_client.aclose()
+        if http_client is not None:
+            http_client.close()
+
+
+llm_clients = LLMClients(cache=LLMResponseCache() if LLM_CACHE_ENABLED else None)
@@ -0,0 +1,145 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from contextlib import contextmanager
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "llm_cache.db"),
+)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_MEMORY_ITEMS = int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "1024"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires_at);
+"""
+
+_SPACES = re.compile(r"[ \t　\xa0]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def normalize_text(text: str) -> str:
+    """Folds differences that do not change what the model is asked: Unicode form, runs of spaces, trailing and blank lines."""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n")
+    lines = [_SPACES.sub(" ", line).strip() for line in text.split("\n")]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def cache_key(model: str, temperature: float, template: str, variables: Dict[str, Any]) -> str:
+    normalized = {k: normalize_text(v) if isinstance(v, str) else v for k, v in variables.items()}
+    payload = json.dumps([model, temperature, template, normalized], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache of LLM completions: an in-process LRU in front of a SQLite table shared by all
+    workers and restarts. Entries expire after ttl seconds in both tiers.
+    """
+
+    def __init__(self, db_path: str = LLM_CACHE_PATH, memory_items: int = LLM_CACHE_MEMORY_ITEMS, ttl: int = LLM_CACHE_TTL):
+        self.db_path = db_path
+        self.memory_items = memory_items
+        self.ttl = ttl
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict() # key -> (content, expires_at)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self.purge_expired()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per call keeps this safe to use from any thread; committed on
+        # success and always closed
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _remember(self, key: str, content: str, expires_at: float):
+        self._memory[key] = (content, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_memory(self, key: str) -> Optional[str]:
+        """Memory tier only, cheap enough to call on the event loop. Misses are counted by get()."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return entry[0]
+
+    def get(self, key: str) -> Optional[str]:
+        content = self.get_memory(key)
+        if content is not None:
+            return content
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT content, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, row[0], row[1])
+        return row[0]
+
+    def put(self, key: str, content: str):
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._remember(key, content, expires_at)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, content, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, content, now, expires_at),
+            )
+
+    def purge_expired(self) -> int:
+        with self._connect() as conn:
+            removed = conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),)).rowcount
+        if removed:
+            logger.info(f"Removed {removed} expired LLM cache entries")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (hits / lookups) if lookups else 0.0,
+            }
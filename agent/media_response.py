@@ -0,0 +1,76 @@
+import os
+import logging
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+
+logger = logging.getLogger(__name__)
+
+# When set (e.g. "/protected-media"), files are handed to the nginx front end with X-Accel-Redirect
+# so it can serve them with sendfile; see nginx.conf. The prefix maps onto the assets directory.
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _not_modified_since(if_modified_since: str, mtime: float) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return int(mtime) <= since.timestamp()
+
+
+def media_file_response(
+    request_headers: Headers,
+    path: str,
+    filename: str,
+    sha256: str,
+    assets_dir: str,
+    immutable: bool = False
+) -> Response:
+    """
+    Serves a media file with a strong content-hash ETag, long-lived caching for immutable outputs,
+    304s for If-None-Match/If-Modified-Since and byte ranges. Whole files go out zero-copy when
+    the front end or the server supports it (X-Accel-Redirect, or FileResponse's pathsend).
+    """
+    stat_result = os.stat(path)
+    headers = {
+        "etag": f'"{sha256}"',
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "cache-control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        "accept-ranges": "bytes",
+    }
+
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, headers["etag"])
+    else:
+        if_modified_since = request_headers.get("if-modified-since")
+        not_modified = bool(if_modified_since) and _not_modified_since(if_modified_since, stat_result.st_mtime)
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+
+    if MEDIA_ACCEL_REDIRECT_PREFIX:
+        relative_path = os.path.relpath(os.path.abspath(path), os.path.abspath(assets_dir))
+        headers["x-accel-redirect"] = f"{MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quote(relative_path)}"
+        quoted_filename = quote(filename)
+        if quoted_filename != filename:
+            headers["content-disposition"] = f"attachment; filename*=utf-8''{quoted_filename}"
+        else:
+            headers["content-disposition"] = f'attachment; filename="{filename}"'
+        return Response(status_code=200, headers=headers)
+
+    # FileResponse answers Range requests with 206 and keeps the etag and last-modified given here
+    return FileResponse(path=path, filename=filename, headers=headers, stat_result=stat_result)
@@ -1,31 +1,248 @@
 import os
 import subprocess
-from typing import List, Optional, Tuple
-from moviepy.editor import (
-    ImageClip, AudioFileClip, CompositeAudioClip, concatenate_videoclips,
-    concatenate_audioclips # Added for looping audio
-)
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import tempfile
+import time
 import logging
 import shutil # For copying files
+from proglog import ProgressBarLogger # MoviePy's progress reporting
 
-# Pillow (PIL) for creating dummy images for testing
-from PIL import Image, ImageDraw
-
-# For music download
-import requests
-from bs4 import BeautifulSoup
-import urllib.parse # For URL encoding keywords
+from ffmpeg_engine import FFmpegError, render_slideshow, render_renditions, mux_audio, concat_segments, encode_at_bitrate, output_format_args
+from image_cache import ImageCache
+from audio_cache import SoundtrackCache
+from segment_cache import SegmentCache
+from scratch import SCRATCH_DIR, JOB_DIR_PREFIX
+from render_metrics import RenderStats
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Render engines: "segments" joins cached per-image segments so edits only re-encode what changed,
+# "ffmpeg" is the single-invocation fast path for static slideshows, "moviepy" composites every
+# frame in Python, "auto" tries them in that order.
+RENDER_ENGINES = ("auto", "segments", "ffmpeg", "moviepy")
+DEFAULT_RENDER_ENGINE = os.getenv("RENDER_ENGINE", "auto")
+DEFAULT_IMAGE_SIZE = (1280, 720)
+# Concurrent x264 encoders per render (segments, or timeline chunks), each given an equal share of the
+# cores. RENDER_CHUNK_SIZE > 0 splits single-pass ffmpeg renders into chunks of that many images.
+ENCODE_WORKERS = int(os.getenv("RENDER_ENCODE_WORKERS", "0")) or os.cpu_count() or 1
+RENDER_CHUNK_SIZE = int(os.getenv("RENDER_CHUNK_SIZE", "0"))
+
+
+def image_durations_for(
+    num_images: int,
+    image_duration: float,
+    video_duration: Optional[float] = None,
+    image_durations: Optional[List[float]] = None
+) -> List[float]:
+    """Per-image display times: explicit image_durations, else video_duration split evenly, else image_duration."""
+    if image_durations:
+        return list(image_durations)
+    if video_duration and num_images > 0:
+        return [video_duration / num_images] * num_images
+    return [image_duration] * num_images
+
+
+def encoder_threads(workers: int) -> Optional[int]:
+    """x264 threads per encoder when `workers` encoders run at once, None to let x264 decide."""
+    if workers <= 1:
+        return None
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+class RenderProgressLogger(ProgressBarLogger):
+    """Forwards MoviePy's frame progress bar to a callback as a 0.0-1.0 fraction."""
+
+    def __init__(self, callback: Callable[[float], None], step: float = 0.01):
+        super().__init__()
+        self.progress_callback = callback
+        self.step = step # Only report when progress moved by at least this much
+        self._last_reported = 0.0
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        if bar != "t" or attr != "index":
+            return
+        total = self.bars[bar].get("total") or 0
+        if total <= 0:
+            return
+        fraction = min(1.0, (value + 1) / total)
+        if fraction - self._last_reported >= self.step or fraction >= 1.0:
+            self._last_reported = fraction
+            try:
+                self.progress_callback(fraction)
+            except Exception as e:
+                logger.debug(f"Progress callback failed: {e}")
+
+
 class MovieGenerator:
-    def __init__(self):
+    def __init__(
+        self,
+        image_cache: Optional[ImageCache] = None,
+        soundtrack_cache: Optional[SoundtrackCache] = None,
+        segment_cache: Optional[SegmentCache] = None
+    ):
         """Initialize the video generator."""
-        self.temp_dir = tempfile.mkdtemp()
-        logger.info(f"Created temporary directory: {self.temp_dir}")
+        self._temp_dir: Optional[str] = None
+        self.image_cache = image_cache or ImageCache()
+        self.soundtrack_cache = soundtrack_cache or SoundtrackCache()
+        self.segment_cache = segment_cache or SegmentCache()
+        self.last_render_stats: Optional[dict] = None
+
+    def __enter__(self) -> "MovieGenerator":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+    @property
+    def temp_dir(self) -> str:
+        # Created on first use, so a long-lived (pooled) generator only holds scratch space during a job
+        if self._temp_dir is None:
+            os.makedirs(SCRATCH_DIR, exist_ok=True)
+            self._temp_dir = tempfile.mkdtemp(prefix=f"{JOB_DIR_PREFIX}{os.getpid()}-", dir=SCRATCH_DIR)
+            logger.info(f"Created temporary directory: {self._temp_dir}")
+        return self._temp_dir
+
+    @contextmanager
+    def job_scratch(self, temp_dir: str):
+        """Runs one job of a reused generator in temp_dir (owned by the caller, e.g. ScratchSpace.job_dir)."""
+        previous = self._temp_dir
+        self._temp_dir = temp_dir
+        try:
+            yield self
+        finally:
+            self._temp_dir = previous
+
+    def normalize_images(self, image_paths: List[str], image_size: Optional[Tuple[int, int]]) -> Tuple[List[str], bool]:
+        """
+        Swaps each image for its pre-normalized copy at image_size from the image cache.
+        Returns the paths to render and whether they are already at image_size.
+        """
+        if not image_size:
+            return image_paths, False
+        try:
+            return [self.image_cache.get(p, image_size) for p in image_paths], True
+        except Exception as e:
+            logger.warning(f"Could not use normalized images, resizing during render instead: {e}")
+            return image_paths, False
+
+    def prepare_soundtrack(self, audio_path: Optional[str], duration: float) -> Optional[str]:
+        """
+        Returns the cached AAC soundtrack already looped/trimmed to duration, or None when there is no
+        usable audio or the cache fails (the render then processes the original file itself).
+        """
+        if not audio_path or not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
+            return None
+        try:
+            return self.soundtrack_cache.fitted(audio_path, duration)
+        except Exception as e:
+            logger.warning(f"Could not use cached soundtrack for '{audio_path}', processing it during render instead: {e}")
+            return None
+
+    def render_segments(
+        self,
+        image_paths: List[str],
+        image_durations: List[float],
+        soundtrack: Optional[str],
+        output_path: str,
+        fps: int,
+        progress_callback: Optional[Callable[[float], None]] = None,
+        output_format: str = "mp4",
+        workers: int = ENCODE_WORKERS
+    ) -> str:
+        """
+        Builds the video from cached per-image segments, encoding the ones not cached yet on up to
+        `workers` concurrent encoders, then joins them and muxes the soundtrack by stream copy. Images must
+        already be normalized to one size and the soundtrack fitted to the total duration
+        (see normalize_images and prepare_soundtrack).
+        """
+        streaming = output_format != "mp4"
+        frames = [max(1, int(round(duration * fps))) for duration in image_durations]
+        segment_paths: List[Optional[str]] = [None] * len(image_paths)
+        encoded = 0
+        workers = max(1, min(workers, len(image_paths)))
+        threads = encoder_threads(workers)
+        # Threads are enough here: the encoding happens in ffmpeg subprocesses
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self.segment_cache.get, path, frames[i], fps, streaming, threads): i
+                for i, path in enumerate(image_paths)
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                segment_paths[futures[future]], was_encoded = future.result()
+                encoded += was_encoded
+                if progress_callback:
+                    progress_callback(0.95 * done / len(image_paths))
+        logger.info(f"Encoded {encoded} of {len(image_paths)} segments with {workers} workers, reused {len(image_paths) - encoded}")
+
+        concat_segments(segment_paths, soundtrack, output_path, self.temp_dir, sum(image_durations), output_format)
+        if progress_callback:
+            progress_callback(1.0)
+        return output_path
+
+    def render_chunked(
+        self,
+        image_paths: List[str],
+        image_durations: List[float],
+        soundtrack: Optional[str],
+        output_path: str,
+        fps: int,
+        chunk_size: int,
+        progress_callback: Optional[Callable[[float], None]] = None,
+        output_format: str = "mp4",
+        workers: int = ENCODE_WORKERS
+    ) -> str:
+        """
+        Splits the timeline into chunks of chunk_size images, encodes the chunks concurrently on up to
+        `workers` encoders and joins them by stream copy with the soundtrack muxed over the whole video.
+        Same preconditions as render_segments.
+        """
+        chunks = [
+            (image_paths[start:start + chunk_size], image_durations[start:start + chunk_size])
+            for start in range(0, len(image_paths), chunk_size)
+        ]
+        workers = max(1, min(workers, len(chunks)))
+        threads = encoder_threads(workers)
+        # Chunks are re-joined by stream copy, so streaming layouts need their keyframes in every chunk
+        chunk_format = "mp4" if output_format == "mp4" else "fmp4"
+        chunk_paths = [os.path.join(self.temp_dir, f"chunk-{os.urandom(4).hex()}-{i:05d}.mp4") for i in range(len(chunks))]
+        chunk_progress = [0.0] * len(chunks)
+
+        def encode(i: int) -> str:
+            def report(fraction: float):
+                chunk_progress[i] = fraction
+                if progress_callback:
+                    progress_callback(0.95 * sum(chunk_progress) / len(chunks))
+
+            chunk_images, chunk_durations = chunks[i]
+            return render_slideshow(
+                image_paths=chunk_images,
+                audio_path=None,
+                output_path=chunk_paths[i],
+                work_dir=self.temp_dir,
+                fps=fps,
+                progress_callback=report,
+                output_format=chunk_format,
+                image_durations=chunk_durations,
+                threads=threads,
+            )
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(encode, range(len(chunks))))
+            logger.info(f"Encoded {len(image_paths)} images as {len(chunks)} chunks with {workers} workers")
+            concat_segments(chunk_paths, soundtrack, output_path, self.temp_dir, sum(image_durations), output_format)
+        finally:
+            for path in chunk_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+        if progress_callback:
+            progress_callback(1.0)
+        return output_path
+
     def download_or_get_music(self, search_keywords: List[str], desired_duration: float) -> Optional[str]:
         """Downloads or gets music based on search keywords and desired duration."""
         return "/Users/vincent/code/happy-ai/agent/test_movie_assets/musics/brain-implant-cyberpunk-sci-fi-trailer-action-intro-330416.mp3"
@@ -38,11 +255,52 @@ class MovieGenerator:
         image_duration: float = 3.0,
         fps: int = 24,
         video_duration: Optional[float] = None,
-        image_size: Optional[Tuple[int, int]] = None
+        image_size: Optional[Tuple[int, int]] = None,
+        progress_callback: Optional[Callable[[float], None]] = None,
+        engine: str = DEFAULT_RENDER_ENGINE,
+        output_format: str = "mp4",
+        image_durations: Optional[List[float]] = None,
+        encode_workers: Optional[int] = None,
+        chunk_size: Optional[int] = None
     ) -> Optional[str]:
         """
         Merges images and audio into a video.
+        progress_callback, if given, receives the encode progress as a 0.0-1.0 fraction.
+        engine selects the renderer, see RENDER_ENGINES; output_format the container, see OUTPUT_FORMATS.
+        image_durations, if given, sets each image's display time and overrides the other durations.
+        encode_workers (default ENCODE_WORKERS) caps concurrent encoders; chunk_size (default
+        RENDER_CHUNK_SIZE, 0 to disable) splits the single-pass ffmpeg render into parallel chunks.
+        Per-stage timings of the render are left in self.last_render_stats.
         """
+        stats = RenderStats(engine=engine)
+        result = None
+        try:
+            result = self._merge_images_and_audio(
+                stats, image_paths, audio_path, output_path, image_duration, fps,
+                video_duration, image_size, progress_callback, engine, output_format, image_durations,
+                encode_workers or ENCODE_WORKERS, RENDER_CHUNK_SIZE if chunk_size is None else chunk_size
+            )
+            return result
+        finally:
+            self.last_render_stats = stats.finish(succeeded=result is not None)
+
+    def _merge_images_and_audio(
+        self,
+        stats: RenderStats,
+        image_paths: List[str],
+        audio_path: Optional[str],
+        output_path: str,
+        image_duration: float,
+        fps: int,
+        video_duration: Optional[float],
+        image_size: Optional[Tuple[int, int]],
+        progress_callback: Optional[Callable[[float], None]],
+        engine: str,
+        output_format: str,
+        image_durations: Optional[List[float]],
+        encode_workers: int,
+        chunk_size: int
+    ) -> Optional[str]:
         clips_to_close = []
         temp_media_files_for_moviepy = [] # Keep track of files copied to temp_dir for MoviePy
 
@@ -57,33 +315,98 @@ class MovieGenerator:
                     return None
 
             num_images = len(image_paths)
-            actual_image_duration = (video_duration / num_images) if (video_duration and num_images > 0) else image_duration
-            logger.info(f"Each image will be displayed for {actual_image_duration:.2f}s. Total images: {num_images}")
+            durations = image_durations_for(num_images, image_duration, video_duration, image_durations)
+            if len(durations) != num_images:
+                logger.error(f"Got {len(durations)} image durations for {num_images} images.")
+                return None
+            total_duration = sum(durations)
+            logger.info(f"Showing {num_images} images for {total_duration:.2f}s in total")
+
+            stats.frames = int(round(total_duration * fps))
+
+            with stats.stage("normalize_images"):
+                image_paths, images_normalized = self.normalize_images(image_paths, image_size)
+            with stats.stage("soundtrack"):
+                soundtrack = self.prepare_soundtrack(audio_path, total_duration)
+            has_audio = bool(audio_path and os.path.exists(audio_path) and os.path.getsize(audio_path) > 0)
+
+            if engine in ("auto", "segments"):
+                if images_normalized and (soundtrack or not has_audio):
+                    stats.engine = "segments"
+                    try:
+                        with stats.stage("encode"):
+                            return self.render_segments(
+                                image_paths, durations, soundtrack, output_path, fps, progress_callback, output_format,
+                                workers=encode_workers,
+                            )
+                    except FFmpegError as e:
+                        if engine == "segments":
+                            logger.error(f"Segment render failed: {e}")
+                            return None
+                        logger.warning(f"Segment render failed, falling back to a single ffmpeg pass: {e}")
+                        stats.stages.pop("encode", None)
+                elif engine == "segments":
+                    logger.error("Segment rendering needs images normalized to image_size and a cached soundtrack.")
+                    return None
+
+            if engine in ("auto", "ffmpeg"):
+                stats.engine = "ffmpeg"
+                try:
+                    with stats.stage("encode"):
+                        if chunk_size and num_images > chunk_size and images_normalized and (soundtrack or not has_audio):
+                            return self.render_chunked(
+                                image_paths, durations, soundtrack, output_path, fps, chunk_size, progress_callback,
+                                output_format, workers=encode_workers,
+                            )
+                        return render_slideshow(
+                            image_paths=image_paths,
+                            audio_path=soundtrack or audio_path,
+                            audio_fitted=soundtrack is not None,
+                            output_path=output_path,
+                            work_dir=self.temp_dir,
+                            image_duration=image_duration,
+                            fps=fps,
+                            video_duration=video_duration,
+                            image_size=None if images_normalized else image_size,
+                            progress_callback=progress_callback,
+                            output_format=output_format,
+                            image_durations=durations,
+                        )
+                except FFmpegError as e:
+                    if engine == "ffmpeg":
+                        logger.error(f"ffmpeg fast path failed: {e}")
+                        return None
+                    logger.warning(f"ffmpeg fast path failed, falling back to MoviePy: {e}")
+                    stats.stages.pop("encode", None)
+
+            stats.engine = "moviepy"
+            # Imported here: moviepy.editor loads numpy and imageio, which only this engine needs
+            from moviepy.editor import ImageClip, AudioFileClip, concatenate_videoclips, concatenate_audioclips
 
             image_clips_list = []
-            for i, original_img_path in enumerate(image_paths):
-                _, extension = os.path.splitext(original_img_path)
-                temp_img_filename = f"temp_image_{i}{extension}"
-                temp_img_path_for_moviepy = os.path.join(self.temp_dir, temp_img_filename)
-                shutil.copy(original_img_path, temp_img_path_for_moviepy)
-                temp_media_files_for_moviepy.append(temp_img_path_for_moviepy)
-
-                img_clip = ImageClip(temp_img_path_for_moviepy).set_duration(actual_image_duration)
-                if image_size:
-                    img_clip = img_clip.resize(width=image_size[0], height=image_size[1])
-                image_clips_list.append(img_clip)
-                clips_to_close.append(img_clip)
+            with stats.stage("load_images"):
+                for img_path, duration in zip(image_paths, durations):
+                    img_clip = ImageClip(img_path).set_duration(duration)
+                    if image_size and not images_normalized:
+                        img_clip = img_clip.resize(width=image_size[0], height=image_size[1])
+                    image_clips_list.append(img_clip)
+                    clips_to_close.append(img_clip)
             
             if not image_clips_list:
                 logger.error("Failed to create any image clips.")
                 return None
 
-            video_clip = concatenate_videoclips(image_clips_list, method="compose")
+            with stats.stage("concat"):
+                video_clip = concatenate_videoclips(image_clips_list, method="compose")
             clips_to_close.append(video_clip)
             logger.info(f"Video track created successfully. Total duration: {video_clip.duration:.2f}s.")
 
             final_audio_for_video = None
-            if audio_path and os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
+            if soundtrack:
+                # Already fitted to the video; MoviePy's writer muxes a file path by stream copy
+                logger.info(f"Using cached soundtrack for '{audio_path}'")
+            elif audio_path and os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
+                audio_started = time.perf_counter()
                 try:
                     _, audio_ext = os.path.splitext(audio_path)
                     temp_audio_filename = f"temp_audio_main{audio_ext}"
@@ -115,6 +438,7 @@ class MovieGenerator:
 
                 except Exception as e:
                     logger.error(f"Failed to load or process audio file '{audio_path}': {e}. Video will have no external audio.", exc_info=True)
+                stats.stages["audio"] = time.perf_counter() - audio_started
             else:
                 if audio_path and (not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0) :
                      logger.warning(f"Provided audio file '{audio_path}' does not exist or is empty. Video will have no external audio.")
@@ -131,14 +455,17 @@ class MovieGenerator:
             temp_media_files_for_moviepy.append(temp_audiofile_for_write) # Add to list for cleanup
 
             logger.info(f"Writing video file to: {output_path}")
-            video_clip.write_videofile(
-                output_path,
-                fps=fps,
-                codec='libx264',
-                audio_codec='aac',
-                temp_audiofile=temp_audiofile_for_write,
-                # logger='bar' # or None
-            )
+            with stats.stage("encode"):
+                video_clip.write_videofile(
+                    output_path,
+                    fps=fps,
+                    codec='libx264',
+                    audio=soundtrack or True,
+                    audio_codec='aac',
+                    temp_audiofile=temp_audiofile_for_write,
+                    logger=RenderProgressLogger(progress_callback) if progress_callback else 'bar',
+                    ffmpeg_params=output_format_args(output_format, output_path),
+                )
             
             logger.info(f"Video composition complete: {output_path}")
             return output_path
@@ -173,10 +500,17 @@ class MovieGenerator:
         image_duration: float = 3.0,
         fps: int = 24,
         video_duration: Optional[float] = None,
-        image_size: Optional[Tuple[int, int]] = (1280, 720)
+        image_size: Optional[Tuple[int, int]] = DEFAULT_IMAGE_SIZE,
+        progress_callback: Optional[Callable[[float], None]] = None,
+        engine: str = DEFAULT_RENDER_ENGINE,
+        output_format: str = "mp4",
+        image_durations: Optional[List[float]] = None,
+        encode_workers: Optional[int] = None,
+        chunk_size: Optional[int] = None
     ) -> Optional[str]:
         """
         Creates a video from images and music based on keywords (e.g., style, mood).
+        encode_workers and chunk_size tune parallel encoding, see merge_images_and_audio.
         """
         logger.info(f"Starting video creation for '{output_path}'")
     
@@ -198,19 +532,259 @@ class MovieGenerator:
             image_duration=image_duration,
             fps=fps,
             video_duration=video_duration,
-            image_size=image_size
+            image_size=image_size,
+            progress_callback=progress_callback,
+            engine=engine,
+            output_format=output_format,
+            image_durations=image_durations,
+            encode_workers=encode_workers,
+            chunk_size=chunk_size
         )
         
         return final_video_path
 
+    def create_video_variants(
+        self,
+        image_paths: List[str],
+        variants: List[Dict[str, Any]],
+        image_duration: float = 3.0,
+        fps: int = 24,
+        video_duration: Optional[float] = None,
+        image_size: Optional[Tuple[int, int]] = DEFAULT_IMAGE_SIZE,
+        progress_callback: Optional[Callable[[float], None]] = None,
+        engine: str = DEFAULT_RENDER_ENGINE,
+        output_format: str = "mp4",
+        image_durations: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Renders the same slideshow once per variant ({"output_path", "music_path"}), encoding the video
+        track a single time and muxing each soundtrack into it by stream copy.
+        Returns one {"result_path", "stats"} per variant; the shared encode is timed in the first muxed variant's stats.
+        """
+        durations = image_durations_for(len(image_paths), image_duration, video_duration, image_durations)
+        if engine == "moviepy" or len(variants) < 2 or len(durations) != len(image_paths):
+            return self._create_variants_separately(
+                image_paths, variants, durations, fps, image_size, progress_callback, engine, output_format
+            )
+
+        total_duration = sum(durations)
+        shared = RenderStats(engine=engine)
+        shared.frames = int(round(total_duration * fps))
+        # Streaming layouts are stream-copied from a track that already has their keyframes
+        track_path = os.path.join(self.temp_dir, f"video-track-{os.urandom(4).hex()}.mp4")
+        track_format = "mp4" if output_format == "mp4" else "fmp4"
+        try:
+            with shared.stage("normalize_images"):
+                track_images, images_normalized = self.normalize_images(image_paths, image_size)
+            with shared.stage("encode"):
+                if engine in ("auto", "segments") and images_normalized:
+                    shared.engine = "segments"
+                    self.render_segments(track_images, durations, None, track_path, fps, progress_callback, track_format)
+                elif engine == "segments":
+                    raise FFmpegError("Segment rendering needs images normalized to image_size.")
+                else:
+                    shared.engine = "ffmpeg"
+                    render_slideshow(
+                        image_paths=track_images,
+                        audio_path=None,
+                        output_path=track_path,
+                        work_dir=self.temp_dir,
+                        fps=fps,
+                        image_size=None if images_normalized else image_size,
+                        progress_callback=progress_callback,
+                        output_format=track_format,
+                        image_durations=durations,
+                    )
+        except FFmpegError as e:
+            if engine != "auto":
+                logger.error(f"Shared video track failed: {e}")
+                failed = shared.finish(succeeded=False)
+                return [{"result_path": None, "stats": failed if i == 0 else None} for i in range(len(variants))]
+            logger.warning(f"Shared video track failed, rendering variants separately: {e}")
+            return self._create_variants_separately(
+                image_paths, variants, durations, fps, image_size, None, "moviepy", output_format
+            )
+        logger.info(f"Encoded shared video track for {len(variants)} variants in {shared.stages['encode']:.2f}s")
+
+        results = []
+        try:
+            for variant in variants:
+                stats = RenderStats(engine=shared.engine) if shared.finished else shared
+                result_path = None
+                try:
+                    with stats.stage("soundtrack"):
+                        soundtrack = self.prepare_soundtrack(variant.get("music_path"), total_duration)
+                    if soundtrack is None and variant.get("music_path") and os.path.exists(variant["music_path"]):
+                        # The soundtrack cache could not fit this track, let a full render handle it
+                        results += self._create_variants_separately(
+                            image_paths, [variant], durations, fps, image_size, None, engine, output_format
+                        )
+                        continue
+                    with stats.stage("mux"):
+                        result_path = mux_audio(track_path, soundtrack, variant["output_path"], total_duration, output_format)
+                except FFmpegError as e:
+                    logger.error(f"Failed to mux variant '{variant['output_path']}': {e}")
+                results.append({"result_path": result_path, "stats": stats.finish(succeeded=result_path is not None)})
+        finally:
+            if os.path.exists(track_path):
+                os.remove(track_path)
+        return results
+
+    def _create_variants_separately(
+        self,
+        image_paths: List[str],
+        variants: List[Dict[str, Any]],
+        image_durations: List[float],
+        fps: int,
+        image_size: Optional[Tuple[int, int]],
+        progress_callback: Optional[Callable[[float], None]],
+        engine: str,
+        output_format: str
+    ) -> List[Dict[str, Any]]:
+        results = []
+        for variant in variants:
+            result_path = self.create_video_from_images_and_music(
+                image_paths=image_paths,
+                output_path=variant["output_path"],
+                music_path=variant.get("music_path"),
+                fps=fps,
+                image_size=image_size,
+                progress_callback=progress_callback,
+                engine=engine,
+                output_format=output_format,
+                image_durations=image_durations,
+            )
+            results.append({"result_path": result_path, "stats": self.last_render_stats})
+        return results
+
+    def create_video_renditions(
+        self,
+        image_paths: List[str],
+        music_path: Optional[str],
+        renditions: List[Dict[str, Any]],
+        image_duration: float = 3.0,
+        fps: int = 24,
+        video_duration: Optional[float] = None,
+        progress_callback: Optional[Callable[[float], None]] = None,
+        engine: str = DEFAULT_RENDER_ENGINE,
+        output_format: str = "mp4",
+        image_durations: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Renders the same slideshow at several sizes ({"output_path", "image_size", "video_bitrate"} each, see
+        render_renditions). The images are normalized once at the largest size and the soundtrack fitted
+        once, then a single ffmpeg pass decodes them once and encodes every rendition. The "segments" and
+        "moviepy" engines render each rendition on its own instead, and re-encode it when it has a bitrate.
+        Returns a manifest: one {"result_path", "image_size", "video_bitrate", "bytes", "stats"} per
+        rendition; the shared pass is timed in the first rendition's stats.
+        """
+        durations = image_durations_for(len(image_paths), image_duration, video_duration, image_durations)
+        missing = [path for path in image_paths if not os.path.exists(path)]
+        if engine in ("segments", "moviepy") or not image_paths or missing or len(durations) != len(image_paths):
+            return self._create_renditions_separately(
+                image_paths, music_path, renditions, durations, fps, progress_callback, engine, output_format
+            )
+
+        total_duration = sum(durations)
+        stats = RenderStats(engine="ffmpeg")
+        stats.frames = int(round(total_duration * fps))
+        largest = max((tuple(r["image_size"]) for r in renditions), key=lambda size: size[0] * size[1])
+        result = None
+        try:
+            with stats.stage("normalize_images"):
+                images, images_normalized = self.normalize_images(image_paths, largest)
+            with stats.stage("soundtrack"):
+                soundtrack = self.prepare_soundtrack(music_path, total_duration)
+            with stats.stage("encode"):
+                result = render_renditions(
+                    image_paths=images,
+                    audio_path=soundtrack or music_path,
+                    audio_fitted=soundtrack is not None,
+                    renditions=renditions,
+                    work_dir=self.temp_dir,
+                    image_durations=durations,
+                    fps=fps,
+                    image_size=None if images_normalized else largest,
+                    progress_callback=progress_callback,
+                    output_format=output_format,
+                )
+        except FFmpegError as e:
+            if engine == "ffmpeg":
+                logger.error(f"Rendition ladder failed: {e}")
+            else:
+                logger.warning(f"Rendition ladder failed, rendering each rendition separately: {e}")
+                return self._create_renditions_separately(
+                    image_paths, music_path, renditions, durations, fps, None, "auto", output_format
+                )
+        finally:
+            shared_stats = stats.finish(succeeded=result is not None)
+        if result:
+            logger.info(f"Rendered {len(renditions)} renditions in one pass in {shared_stats['total_seconds']:.2f}s")
+        return [
+            self._rendition_entry(rendition, result[i] if result else None, shared_stats if i == 0 else None)
+            for i, rendition in enumerate(renditions)
+        ]
+
+    def _rendition_entry(self, rendition: Dict[str, Any], result_path: Optional[str], stats: Optional[dict]) -> Dict[str, Any]:
+        exists = bool(result_path and os.path.exists(result_path))
+        return {
+            "result_path": result_path if exists else None,
+            "image_size": list(rendition["image_size"]),
+            "video_bitrate": rendition.get("video_bitrate"),
+            "bytes": os.path.getsize(result_path) if exists and os.path.isfile(result_path) else None,
+            "stats": stats,
+        }
+
+    def _create_renditions_separately(
+        self,
+        image_paths: List[str],
+        music_path: Optional[str],
+        renditions: List[Dict[str, Any]],
+        image_durations: List[float],
+        fps: int,
+        progress_callback: Optional[Callable[[float], None]],
+        engine: str,
+        output_format: str
+    ) -> List[Dict[str, Any]]:
+        results = []
+        for rendition in renditions:
+            bitrate = rendition.get("video_bitrate")
+            # The engines render at x264's default quality; a rendition with a bitrate is re-encoded from a scratch copy
+            render_path = os.path.join(self.temp_dir, f"rendition-{os.urandom(4).hex()}.mp4") if bitrate else rendition["output_path"]
+            result_path = self.create_video_from_images_and_music(
+                image_paths=image_paths,
+                output_path=render_path,
+                music_path=music_path,
+                fps=fps,
+                image_size=tuple(rendition["image_size"]),
+                progress_callback=progress_callback,
+                engine=engine,
+                output_format=output_format if not bitrate else "mp4",
+                image_durations=image_durations,
+            )
+            stats = self.last_render_stats
+            if bitrate and result_path and os.path.exists(result_path):
+                try:
+                    result_path = encode_at_bitrate(result_path, rendition["output_path"], bitrate, output_format)
+                except FFmpegError as e:
+                    logger.error(f"Could not encode rendition '{rendition['output_path']}' at {bitrate} kbit/s: {e}")
+                    result_path = None
+                finally:
+                    os.remove(render_path)
+            results.append(self._rendition_entry(rendition, result_path, stats))
+        return results
+
     def cleanup(self):
         """Cleans up the temporary directory."""
+        if self._temp_dir is None:
+            return
         try:
-            if os.path.exists(self.temp_dir):
-                shutil.rmtree(self.temp_dir)
-                logger.info(f"Temporary directory cleaned: {self.temp_dir}")
+            if os.path.exists(self._temp_dir):
+                shutil.rmtree(self._temp_dir)
+                logger.info(f"Temporary directory cleaned: {self._temp_dir}")
+            self._temp_dir = None
         except Exception as e:
-            logger.error(f"Failed to clean temporary directory '{self.temp_dir}': {e}", exc_info=True)
+            logger.error(f"Failed to clean temporary directory '{self._temp_dir}': {e}", exc_info=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+import os
+import logging
+import tempfile
+import threading
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageOps
+
+from ffmpeg_engine import PREVIEW_X264_PRESET, render_slideshow
+from image_cache import ImageCache
+from audio_cache import SoundtrackCache
+from render_cache import render_cache_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREVIEW_DIR = os.getenv(
+    "PREVIEW_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "derived", "previews"),
+)
+# Previews are for checking order and timing: small, few frames, fastest encoder settings
+PREVIEW_WIDTH = int(os.getenv("PREVIEW_WIDTH", "480"))
+PREVIEW_FPS = int(os.getenv("PREVIEW_FPS", "6"))
+POSTER_WIDTH = 1280
+THUMBNAIL_WIDTH = 160
+CONTACT_SHEET_COLUMNS = 8
+CONTACT_SHEET_GAP = 4
+
+
+def preview_size(image_size: Tuple[int, int], width: int = PREVIEW_WIDTH) -> Tuple[int, int]:
+    """image_size scaled down to width, keeping the aspect ratio and both sides even for x264."""
+    width = min(width, image_size[0])
+    height = max(2, int(round(width * image_size[1] / image_size[0])))
+    return width - width % 2, height - height % 2
+
+
+def _thumbnail(image_path: str, size: Tuple[int, int]) -> Image.Image:
+    with Image.open(image_path) as img:
+        # Lets the JPEG decoder scale down while decoding, much cheaper than a full-size decode
+        img.draft("RGB", (max(size), max(size)))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        return ImageOps.pad(img, size, method=Image.BILINEAR, color=(0, 0, 0))
+
+
+class PreviewRenderer:
+    """
+    Draft renders and thumbnails for checking a slideshow before the full render. Outputs are
+    content-addressed derived assets, so asking again for the same preview costs a file lookup.
+    """
+
+    def __init__(self, image_cache: ImageCache, soundtrack_cache: SoundtrackCache, directory: str = DEFAULT_PREVIEW_DIR):
+        self.image_cache = image_cache
+        self.soundtrack_cache = soundtrack_cache
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def render(
+        self,
+        image_paths: List[str],
+        music_path: Optional[str],
+        image_durations: List[float],
+        image_size: Tuple[int, int],
+        fps: int = PREVIEW_FPS,
+        include_audio: bool = False
+    ) -> str:
+        """Renders a low-resolution, low-fps draft in one ultrafast ffmpeg pass and returns its path."""
+        size = preview_size(image_size)
+        music_path = music_path if include_audio else None
+        params = {"kind": "preview", "durations": image_durations, "size": list(size), "fps": fps, "preset": PREVIEW_X264_PRESET}
+        output_path = os.path.join(self.directory, f"preview_{render_cache_key(image_paths, music_path, params)[:16]}.mp4")
+        if os.path.exists(output_path):
+            return output_path
+
+        normalized = [self.image_cache.get(path, size) for path in image_paths]
+        soundtrack = None
+        if music_path:
+            try:
+                soundtrack = self.soundtrack_cache.fitted(music_path, sum(image_durations))
+            except Exception as e:
+                logger.warning(f"Could not prepare soundtrack for preview, rendering it silent: {e}")
+        with tempfile.TemporaryDirectory(dir=self.directory) as work_dir:
+            tmp_path = os.path.join(work_dir, "preview.mp4")
+            render_slideshow(
+                image_paths=normalized,
+                audio_path=soundtrack,
+                audio_fitted=True,
+                output_path=tmp_path,
+                work_dir=work_dir,
+                fps=fps,
+                image_durations=image_durations,
+                preset=PREVIEW_X264_PRESET,
+            )
+            os.replace(tmp_path, output_path)
+        return output_path
+
+    def contact_sheet(
+        self,
+        image_paths: List[str],
+        image_size: Tuple[int, int],
+        columns: int = CONTACT_SHEET_COLUMNS,
+        thumbnail_width: int = THUMBNAIL_WIDTH
+    ) -> Tuple[str, str]:
+        """
+        Returns (poster, contact sheet) JPEG paths, made with Pillow straight from the images: the poster
+        is the first image framed like the video, the sheet a numbered grid of every image in order.
+        """
+        poster_size = preview_size(image_size, POSTER_WIDTH)
+        thumb_size = preview_size(image_size, thumbnail_width)
+        columns = max(1, min(columns, len(image_paths)))
+        params = {"kind": "contact_sheet", "poster": list(poster_size), "thumb": list(thumb_size), "columns": columns}
+        key = render_cache_key(image_paths, None, params)[:16]
+        poster_path = os.path.join(self.directory, f"poster_{key}.jpg")
+        sheet_path = os.path.join(self.directory, f"sheet_{key}.jpg")
+        if os.path.exists(poster_path) and os.path.exists(sheet_path):
+            return poster_path, sheet_path
+
+        rows = (len(image_paths) + columns - 1) // columns
+        sheet = Image.new(
+            "RGB",
+            (columns * (thumb_size[0] + CONTACT_SHEET_GAP) + CONTACT_SHEET_GAP, rows * (thumb_size[1] + CONTACT_SHEET_GAP) + CONTACT_SHEET_GAP),
+            (32, 32, 32),
+        )
+        draw = ImageDraw.Draw(sheet)
+        for i, path in enumerate(image_paths):
+            x = CONTACT_SHEET_GAP + (i % columns) * (thumb_size[0] + CONTACT_SHEET_GAP)
+            y = CONTACT_SHEET_GAP + (i // columns) * (thumb_size[1] + CONTACT_SHEET_GAP)
+            sheet.paste(_thumbnail(path, thumb_size), (x, y))
+            draw.rectangle([x, y, x + 22, y + 13], fill=(0, 0, 0))
+            draw.text((x + 3, y + 1), str(i + 1), fill=(255, 255, 255))
+
+        # Written under temporary names so a concurrent request never serves a half-written file
+        for image, path in ((_thumbnail(image_paths[0], poster_size), poster_path), (sheet, sheet_path)):
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            image.save(tmp_path, format="JPEG", quality=85)
+            os.replace(tmp_path, path)
+        return poster_path, sheet_path
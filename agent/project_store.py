@@ -0,0 +1,151 @@
+import os
+import time
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from llm import estimate_tokens
+
+PROJECT_DB_PATH = os.getenv(
+    "PROJECT_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "projects.db"),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    name TEXT PRIMARY KEY,
+    project_purpose TEXT NOT NULL DEFAULT '',
+    user_personality TEXT NOT NULL DEFAULT '',
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_through INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project TEXT NOT NULL REFERENCES projects (name),
+    text TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_project ON events (project, id);
+"""
+
+
+def format_event(event: Dict[str, Any]) -> str:
+    return f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(event['created_at']))} {event['text']}"
+
+
+class ProjectStore:
+    """
+    SQLite store of coach projects. Each project has an append-only event log and a rolling summary
+    of the events up to summarized_through, so prompts can carry the summary plus recent events
+    instead of the whole history.
+    """
+
+    def __init__(self, db_path: str = PROJECT_DB_PATH, seed: Optional[Dict[str, Dict[str, str]]] = None):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            now = time.time()
+            # Seed projects are only inserted once, later edits are kept
+            for name, project in (seed or {}).items():
+                created = conn.execute(
+                    """
+                    INSERT OR IGNORE INTO projects (name, project_purpose, user_personality, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (name, project.get("project_purpose", ""), project.get("user_personality", ""), now, now),
+                ).rowcount
+                if created and project.get("current_event_logs"):
+                    self._append(conn, name, project["current_event_logs"], now)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per call keeps this safe to use from any thread; committed on
+        # success and always closed
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_project(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM projects WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return None
+            counts = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(id > ?), 0) FROM events WHERE project = ?",
+                (row["summarized_through"], name),
+            ).fetchone()
+        project = dict(row)
+        project["events"], project["unsummarized_events"] = counts[0], counts[1]
+        return project
+
+    def upsert_project(self, name: str, project_purpose: Optional[str] = None, user_personality: Optional[str] = None) -> Dict[str, Any]:
+        """Creates the project or updates the fields that are given."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO projects (name, project_purpose, user_personality, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    project_purpose = COALESCE(?, project_purpose),
+                    user_personality = COALESCE(?, user_personality),
+                    updated_at = excluded.updated_at
+                """,
+                (name, project_purpose or "", user_personality or "", now, now, project_purpose, user_personality),
+            )
+        return self.get_project(name)
+
+    def _append(self, conn: sqlite3.Connection, name: str, text: str, now: float) -> int:
+        cursor = conn.execute(
+            "INSERT INTO events (project, text, tokens, created_at) VALUES (?, ?, ?, ?)",
+            (name, text, estimate_tokens(text), now),
+        )
+        conn.execute("UPDATE projects SET updated_at = ? WHERE name = ?", (now, name))
+        return cursor.lastrowid
+
+    def append_event(self, name: str, text: str) -> int:
+        with self._connect() as conn:
+            return self._append(conn, name, text, time.time())
+
+    def unsummarized_events(self, name: str) -> List[Dict[str, Any]]:
+        """Events after the summary, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT e.id, e.text, e.tokens, e.created_at FROM events e JOIN projects p ON p.name = e.project
+                WHERE e.project = ? AND e.id > p.summarized_through ORDER BY e.id
+                """,
+                (name,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def set_summary(self, name: str, summary: str, through_id: int, expected_through: int) -> bool:
+        """
+        Stores a summary covering events up to through_id. Compare-and-set on the previous position,
+        so two concurrent summarizations of the same project cannot overwrite each other.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE projects SET summary = ?, summarized_through = ?, updated_at = ? WHERE name = ? AND summarized_through = ?",
+                (summary, through_id, time.time(), name, expected_through),
+            )
+        return cursor.rowcount == 1
+
+    def prompt_events(self, name: str, token_budget: int) -> List[Dict[str, Any]]:
+        """The newest unsummarized events that fit in token_budget, oldest first. The latest one is always included."""
+        selected, used = [], 0
+        for event in reversed(self.unsummarized_events(name)):
+            if selected and used + event["tokens"] > token_budget:
+                break
+            selected.append(event)
+            used += event["tokens"]
+        return list(reversed(selected))
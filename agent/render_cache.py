@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import hashlib
+import shutil
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+INDEX_FILENAME = ".render_cache.json" # Dotfile so /list/generated_video skips it
+# Access times from cache hits are written to the index at most this often; puts are written at once
+RENDER_CACHE_FLUSH_SECONDS = float(os.getenv("RENDER_CACHE_FLUSH_SECONDS", "30"))
+
+_digest_memo: Dict[str, Tuple[int, int, str]] = {}
+_digest_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's contents, memoized on (size, mtime) so unchanged files are hashed once."""
+    stat = os.stat(path)
+    with _digest_lock:
+        memo = _digest_memo.get(path)
+    if memo and memo[0] == stat.st_size and memo[1] == stat.st_mtime_ns:
+        return memo[2]
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    with _digest_lock:
+        _digest_memo[path] = (stat.st_size, stat.st_mtime_ns, digest)
+    return digest
+
+
+def remember_digest(path: str, sha256: str):
+    """Records a digest that is already known (e.g. from an upload or the blob store) so file_digest skips hashing."""
+    stat = os.stat(path)
+    with _digest_lock:
+        _digest_memo[path] = (stat.st_size, stat.st_mtime_ns, sha256)
+
+
+def render_cache_key(image_paths: List[str], music_path: Optional[str], params: Dict[str, Any]) -> str:
+    """Key of a render: the contents of every input file plus the parameters that affect the output."""
+    payload = {
+        "images": [file_digest(p) for p in image_paths],
+        "music": file_digest(music_path) if music_path else None,
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """
+    Content-addressed cache of generated videos in a directory, evicted least-recently-used
+    once the cached outputs exceed max_bytes. The index is kept in a JSON file next to the videos.
+    Hits only update access times in memory; they reach the index lazily, see RENDER_CACHE_FLUSH_SECONDS.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = RENDER_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.index_path) as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable render cache index {self.index_path}: {e}")
+            return {}
+        # Drop entries whose video was removed behind our back
+        return {k: v for k, v in entries.items() if os.path.isfile(os.path.join(self.directory, v["filename"]))}
+
+    def _save(self):
+        # A unique temp name: every API process sharing the directory saves the same index
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{INDEX_FILENAME}.", suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def _save_lazily(self):
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= RENDER_CACHE_FLUSH_SECONDS:
+            self._save()
+
+    def flush(self):
+        """Writes access times not yet in the index, e.g. on shutdown."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def output_filename(self, key: str, output_format: str = "mp4") -> str:
+        """Output path relative to the cache directory; HLS renders get a directory of their own."""
+        if output_format == "hls":
+            return os.path.join(f"generated_video_{key[:16]}", "index.m3u8")
+        return f"generated_video_{key[:16]}.mp4"
+
+    def _entry_root(self, filename: str) -> str:
+        # The file itself, or the directory holding a playlist and its segments
+        top = filename.split(os.sep, 1)[0]
+        return os.path.join(self.directory, top)
+
+    def _size_of(self, filename: str) -> int:
+        root = self._entry_root(filename)
+        if os.path.isdir(root):
+            return sum(entry.stat().st_size for entry in os.scandir(root) if entry.is_file())
+        return os.path.getsize(root)
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached video's path and marks it as recently used, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            path = os.path.join(self.directory, entry["filename"]) if entry else None
+            if path is None or not os.path.isfile(path):
+                if entry:
+                    del self._entries[key]
+                    self._save_lazily()
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry["last_access"] = time.time()
+            self._save_lazily()
+            return path
+
+    def put(self, key: str, path: str):
+        """Registers a finished render and evicts old entries if the cache is over budget."""
+        with self._lock:
+            now = time.time()
+            filename = os.path.relpath(path, self.directory)
+            self._entries[key] = {
+                "filename": filename,
+                "size": self._size_of(filename),
+                "created": now,
+                "last_access": now,
+            }
+            self._evict(keep=key)
+            self._save()
+
+    def _evict(self, keep: str):
+        total = sum(entry["size"] for entry in self._entries.values())
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                root = self._entry_root(entry["filename"])
+                if os.path.isdir(root):
+                    shutil.rmtree(root)
+                else:
+                    os.remove(root)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Could not evict cached video {entry['filename']}: {e}")
+                continue
+            del self._entries[key]
+            total -= entry["size"]
+            self.evictions += 1
+            logger.info(f"Evicted cached video {entry['filename']}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(entry["size"] for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
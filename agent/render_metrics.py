@@ -0,0 +1,207 @@
+import os
+import sys
+import time
+import weakref
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+RSS_SAMPLE_INTERVAL = float(os.getenv("RENDER_RSS_SAMPLE_INTERVAL", "0.2"))
+_PROC_AVAILABLE = os.path.isdir("/proc/self") and os.path.exists("/proc/self/status")
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Peak resident memory of this process and its finished children (ffmpeg), in MB, over the whole
+    process lifetime. Only a per-render figure in a fresh process, see RssSampler for running ones.
+    """
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return max(own, children) / scale
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _descendants(pid: int) -> List[int]:
+    # ffmpeg runs as a child of the render process (or of its encode threads), so walk the ppid tree
+    children: Dict[int, List[int]] = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(name))
+    found, stack = [], [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def current_rss_kb() -> int:
+    """Resident memory of this process plus its running descendants (ffmpeg encoders), in kB."""
+    pid = os.getpid()
+    return _rss_kb(pid) + sum(_rss_kb(child) for child in _descendants(pid))
+
+
+class RssSampler:
+    """
+    One background thread per process that samples current_rss_kb every RSS_SAMPLE_INTERVAL while
+    renders are running, and raises the peak of each. Renders that overlap in one process (previews in
+    the API) see each other's memory; pool workers run one render at a time, so theirs is exact.
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._active: "weakref.WeakSet[RenderStats]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, stats: "RenderStats"):
+        stats.peak_rss_kb = max(stats.peak_rss_kb, current_rss_kb())
+        with self._lock:
+            self._active.add(stats)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="render-rss-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def untrack(self, stats: "RenderStats"):
+        with self._lock:
+            self._active.discard(stats)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._wake.clear()
+            if not active:
+                # Sleeps until the next render starts
+                self._wake.wait()
+                continue
+            rss = current_rss_kb()
+            for stats in active:
+                stats.peak_rss_kb = max(stats.peak_rss_kb, rss)
+            del active
+            time.sleep(self.interval)
+
+
+_sampler = RssSampler()
+
+
+class RenderStats:
+    """Per-render stage timings, collected with `with stats.stage("encode"): ...`."""
+
+    def __init__(self, engine: str):
+        self.engine = engine
+        self.stages: Dict[str, float] = {}
+        self.frames = 0
+        self.finished = False
+        self.peak_rss_kb = 0
+        self._started = time.perf_counter()
+        if _PROC_AVAILABLE:
+            _sampler.track(self)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def finish(self, succeeded: bool) -> Dict[str, Any]:
+        self.finished = True
+        total = time.perf_counter() - self._started
+        if _PROC_AVAILABLE:
+            _sampler.untrack(self)
+            # Peak of this process and its ffmpeg children while the render ran
+            peak_rss, peak_rss_scope = round(self.peak_rss_kb / 1024, 1), "render"
+        else:
+            peak_rss, peak_rss_scope = peak_rss_mb(), "process_lifetime"
+        encode = self.stages.get("encode")
+        result = {
+            "engine": self.engine,
+            "succeeded": succeeded,
+            "total_seconds": round(total, 4),
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "frames": self.frames,
+            "frames_per_second": round(self.frames / encode, 2) if encode else None,
+            "peak_rss_mb": peak_rss,
+            "peak_rss_scope": peak_rss_scope,
+        }
+        stage_summary = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in self.stages.items())
+        logger.info(
+            f"Render {'finished' if succeeded else 'failed'} in {total:.2f}s with {self.engine}: {stage_summary}; "
+            f"{self.frames} frames, {result['frames_per_second']} fps, peak RSS {result['peak_rss_mb']} MB"
+        )
+        return result
+
+
+class RenderMetrics:
+    """Process-wide aggregate of RenderStats results, served by /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.frames = 0
+        self.stage_seconds: Dict[str, float] = {}
+        self.max_peak_rss_mb: Optional[float] = None
+        self.by_engine: Dict[str, int] = {}
+
+    def record(self, stats: Dict[str, Any]):
+        with self._lock:
+            self.renders += 1
+            if not stats["succeeded"]:
+                self.failures += 1
+            self.total_seconds += stats["total_seconds"]
+            self.frames += stats["frames"]
+            for name, seconds in stats["stages"].items():
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+            if stats.get("peak_rss_mb") is not None:
+                self.max_peak_rss_mb = max(self.max_peak_rss_mb or 0.0, stats["peak_rss_mb"])
+            self.by_engine[stats["engine"]] = self.by_engine.get(stats["engine"], 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            encode_seconds = self.stage_seconds.get("encode", 0.0)
+            return {
+                "renders": self.renders,
+                "failures": self.failures,
+                "by_engine": dict(self.by_engine),
+                "total_seconds": round(self.total_seconds, 4),
+                "avg_seconds": round(self.total_seconds / self.renders, 4) if self.renders else None,
+                "stage_seconds": {name: round(seconds, 4) for name, seconds in self.stage_seconds.items()},
+                "frames": self.frames,
+                "frames_per_second": round(self.frames / encode_seconds, 2) if encode_seconds else None,
+                "max_peak_rss_mb": self.max_peak_rss_mb,
+            }
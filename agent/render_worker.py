@@ -0,0 +1,313 @@
+"""
+Render worker for the shared render queue. Claims tasks from the JobStore that API processes with
+RENDER_BACKEND=queue fill, renders them with the same code as the API's local pool, and writes the
+outputs to the paths the API chose under its VIDEO_DIR, so every node must mount the shared assets
+at the same path. Each attempt renders to hidden temporary paths that are renamed into place only
+while the worker still holds the task, so two workers never write the same output. While a task runs,
+a heartbeat renews its lease and reports progress; if the worker dies, the lease expires and another
+worker renders the task again. A worker that finds its lease lost kills its render right away.
+
+    python render_worker.py                 # until SIGTERM/SIGINT, finishing the current task first
+    python render_worker.py --max-tasks 10  # exit after ten tasks
+
+Start one per core (or per container replica) to scale rendering separately from the API.
+"""
+import os
+import sys
+import time
+import shutil
+import signal
+import logging
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from job_store import JobStore, RENDER_HEARTBEAT_SECONDS, default_worker_id
+from jobs import RENDER_TASKS, _warm_worker
+from scratch import ScratchSpace, ScratchSpaceError
+
+logger = logging.getLogger(__name__)
+
+RENDER_WORKER_IDLE_SECONDS = float(os.getenv("RENDER_WORKER_IDLE_SECONDS", "1"))
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+def _outcome_counts(result: Any) -> Tuple[int, int]:
+    # (outputs, frames encoded) of a task's result, for the worker's throughput counters
+    outcomes = [result] if isinstance(result, dict) else (result or [])
+    outputs = sum(1 for outcome in outcomes if outcome.get("result_path"))
+    frames = sum((outcome.get("stats") or {}).get("frames", 0) for outcome in outcomes)
+    return outputs, frames
+
+
+def _stage_outputs(task: Dict[str, Any]) -> Dict[str, Tuple[str, str, str]]:
+    """
+    Points the task's outputs at hidden paths of this attempt, in place in task["args"]. Returns, by
+    staged output path: the final output path, and the staged and final entries to rename (the file,
+    or the directory of an HLS playlist and its segments).
+    """
+    args = task["args"]
+    suffix = f"{task['task_id']}.{task['attempt']}.tmp"
+    hls = args[1].get("output_format") == "hls"
+    staged: Dict[str, Tuple[str, str, str]] = {}
+
+    def stage(path: str) -> str:
+        if hls:
+            final_root = os.path.dirname(path)
+            staged_root = os.path.join(os.path.dirname(final_root), f".{os.path.basename(final_root)}.{suffix}")
+            staged_path = os.path.join(staged_root, os.path.basename(path))
+        else:
+            stem, ext = os.path.splitext(os.path.basename(path))
+            final_root = path
+            staged_root = staged_path = os.path.join(os.path.dirname(path), f".{stem}.{suffix}{ext}") # ffmpeg picks the muxer by extension
+        staged[staged_path] = (path, staged_root, final_root)
+        return staged_path
+
+    if task["kind"] == "video":
+        args[2] = stage(args[2])
+    else: # variants and renditions: one {"output_path", ...} per job
+        for output in args[2]:
+            output["output_path"] = stage(output["output_path"])
+    return staged
+
+
+def _remove(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _publish(result: Any, staged: Dict[str, Tuple[str, str, str]]) -> Any:
+    # Renames the finished outputs into place and returns the result with their final paths
+    outcomes = [result] if isinstance(result, dict) else (result or [])
+    for outcome in outcomes:
+        target = staged.get(outcome.get("result_path"))
+        if target is None:
+            continue
+        final_path, staged_root, final_root = target
+        if os.path.isdir(staged_root) and os.path.exists(final_root):
+            # A directory only replaces an empty one; an earlier attempt may have left a full one
+            _remove(final_root)
+        os.replace(staged_root, final_root)
+        outcome["result_path"] = final_path
+    return result
+
+
+def _discard(staged: Dict[str, Tuple[str, str, str]]):
+    for _, staged_root, _ in staged.values():
+        try:
+            _remove(staged_root)
+        except OSError as e:
+            logger.warning(f"Could not remove staged output {staged_root}: {e}")
+
+
+def _exit_with_worker(worker_pid: int):
+    # A killed worker cannot kill its render, so the render stops itself once the worker is gone
+    while os.getppid() == worker_pid:
+        time.sleep(1)
+    os.killpg(0, signal.SIGKILL)
+
+
+class _SharedProgress(dict):
+    """Progress dict for the task functions that also publishes the fraction to the worker process."""
+
+    def __init__(self, fraction):
+        super().__init__()
+        self.fraction = fraction
+
+    def __setitem__(self, job_id: str, state: Dict[str, Any]):
+        super().__setitem__(job_id, state)
+        self.fraction.value = min(s["progress"] for s in self.values())
+
+
+_render_progress = None # Shared with the worker, set by _init_render_process
+
+
+def _init_render_process(log_level: int, progress):
+    global _render_progress
+    # The render process leads its own group, so killing the group also stops its ffmpeg children
+    os.setpgrp()
+    logging.basicConfig(level=log_level, format=LOG_FORMAT)
+    threading.Thread(target=_exit_with_worker, args=(os.getppid(),), daemon=True).start()
+    _render_progress = progress
+
+
+def _render(kind: str, args: list) -> Any:
+    # Runs in the render process
+    return RENDER_TASKS[kind](*args, _SharedProgress(_render_progress))
+
+
+class RenderWorker:
+    """Claims and renders one task at a time from the shared queue until stopped."""
+
+    def __init__(self, store: Optional[JobStore] = None, worker_id: Optional[str] = None, heartbeat_seconds: float = RENDER_HEARTBEAT_SECONDS):
+        self.store = store or JobStore()
+        self.worker_id = worker_id or default_worker_id()
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stopping = threading.Event()
+        self.scratch = ScratchSpace()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._progress = None
+        self._render_pid: Optional[int] = None
+
+    def _start_renderer(self):
+        # One warm render process, so a render whose lease was lost can be killed without killing the worker
+        ctx = multiprocessing.get_context("spawn")
+        self._progress = ctx.Value("d", 0.0, lock=False) # A float, written only by the render process
+        self.scratch.purge_orphans() # Left by a killed render, or by a crashed worker before this one
+        self._executor = ProcessPoolExecutor(
+            max_workers=1, mp_context=ctx, initializer=_init_render_process,
+            initargs=(logging.getLogger().getEffectiveLevel(), self._progress),
+        )
+        self._render_pid = self._executor.submit(_warm_worker).result()
+
+    def _kill_renderer(self):
+        if self._executor is None:
+            return
+        try:
+            os.killpg(self._render_pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def _heartbeat(self, task_id: str, done: threading.Event, lost: threading.Event):
+        # Renews the lease until the task is done; on a lost lease it kills the render
+        while not done.wait(self.heartbeat_seconds):
+            try:
+                held = self.store.heartbeat(task_id, self.worker_id, self._progress.value)
+            except Exception as e:
+                logger.warning(f"Heartbeat for render task {task_id} failed: {e}")
+                continue
+            if not held:
+                logger.error(f"Lost the lease on render task {task_id}, stopping its render")
+                lost.set()
+                self._kill_renderer()
+                return
+
+    def run_task(self, task: Dict[str, Any]) -> bool:
+        """Renders one claimed task and stores its outcome; returns whether it succeeded."""
+        task_id = task["task_id"]
+        logger.info(f"Worker {self.worker_id} rendering task {task_id} ({task['kind']}, attempt {task['attempt']})")
+        if self._executor is None:
+            self._start_renderer()
+        staged = _stage_outputs(task)
+        self._progress.value = 0.0
+        done, lost = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(task_id, done, lost), daemon=True)
+        heartbeat.start()
+        started = time.perf_counter()
+        result, error = None, None
+        try:
+            result = self._executor.submit(_render, task["kind"], task["args"]).result()
+        except BrokenProcessPool as e:
+            error = f"Render process died: {e}"
+            if not lost.is_set():
+                logger.error(f"Render task {task_id} failed: {error}")
+                self._kill_renderer() # The next task starts a fresh one
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            logger.error(f"Render task {task_id} failed: {e}")
+        finally:
+            done.set()
+            heartbeat.join()
+        busy_seconds = time.perf_counter() - started
+
+        if lost.is_set():
+            _discard(staged)
+            self.store.record_task(self.worker_id, False, busy_seconds, 0, 0)
+            return False
+        # Outputs go in place while the lease is held, before the API can see the task succeed
+        published = False
+        if error is None and self.store.heartbeat(task_id, self.worker_id, 1.0):
+            try:
+                result = _publish(result, staged)
+                published = True
+            except OSError as e:
+                error = f"Could not move the outputs into place: {e}"
+                logger.error(f"Render task {task_id} failed: {error}")
+        if not published:
+            _discard(staged)
+        if not self.store.finish(task_id, self.worker_id, result, error):
+            # Published outputs stay: they are complete, and the worker that took over replaces them with its own
+            logger.error(f"Render task {task_id} was taken over by another worker, discarded this result")
+        outputs, frames = _outcome_counts(result) if published else (0, 0)
+        succeeded = error is None and outputs > 0
+        self.store.record_task(self.worker_id, succeeded, busy_seconds, outputs, frames)
+        logger.info(f"Render task {task_id} {'succeeded' if succeeded else 'failed'} in {busy_seconds:.2f}s")
+        return succeeded
+
+    def run(self, max_tasks: Optional[int] = None) -> int:
+        """Works through the queue until stop() or max_tasks; returns the number of tasks run."""
+        self.store.register_worker(self.worker_id)
+        self._start_renderer()
+        logger.info(f"Render worker {self.worker_id} ready, queue at {self.store.db_path}")
+        done = 0
+        out_of_space = False
+        while not self.stopping.is_set() and (max_tasks is None or done < max_tasks):
+            try:
+                # The API cannot see this machine's scratch space, so a full worker leaves tasks to the others
+                self.scratch.check_free()
+                if out_of_space:
+                    logger.info("Scratch space freed up, claiming render tasks again")
+                    self.store.touch_worker(self.worker_id)
+                out_of_space = False
+            except ScratchSpaceError as e:
+                if not out_of_space:
+                    logger.warning(f"Not claiming render tasks: {e}")
+                out_of_space = True
+                self.store.touch_worker(self.worker_id, accepting=False) # Not counted as capacity by the API
+                self.stopping.wait(RENDER_WORKER_IDLE_SECONDS)
+                continue
+            task = self.store.claim(self.worker_id)
+            if task is None:
+                self.store.touch_worker(self.worker_id) # Counts as live while idle
+                self.stopping.wait(RENDER_WORKER_IDLE_SECONDS)
+                continue
+            self.run_task(task)
+            done += 1
+            if done % 50 == 0:
+                self.store.prune()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        logger.info(f"Render worker {self.worker_id} stopped after {done} tasks")
+        return done
+
+    def stop(self):
+        self.stopping.set()
+
+    def abort(self):
+        """Kills the current render; its lease runs out and another worker renders the task."""
+        self.stopping.set()
+        self._kill_renderer()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Render videos from the shared render queue.")
+    parser.add_argument("--worker-id", default=None, help="Name in /metrics (default: <hostname>-<pid>)")
+    parser.add_argument("--max-tasks", type=int, default=None, help="Exit after this many tasks")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
+    worker = RenderWorker(worker_id=args.worker_id)
+
+    def handle_signal(signum, frame):
+        if worker.stopping.is_set(): # Second signal: leave now, the lease hands the task to another worker
+            worker.abort()
+            sys.exit(1)
+        logger.info("Stopping after the current task (signal again to exit now)")
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    worker.run(args.max_tasks)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import os
+import time
+import shutil
+import logging
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Render scratch space. Every job gets its own directory named job-<pid>-<random>, so directories
+# left behind by a crashed worker can be recognised and reaped by purge_orphans().
+SCRATCH_DIR = os.getenv("RENDER_SCRATCH_DIR", os.path.join(tempfile.gettempdir(), "render-scratch"))
+# Optional RAM-backed scratch (e.g. /dev/shm) for jobs expected to need at most SCRATCH_TMPFS_MAX_BYTES
+SCRATCH_TMPFS_DIR = os.getenv("RENDER_SCRATCH_TMPFS_DIR")
+SCRATCH_TMPFS_MAX_BYTES = int(os.getenv("RENDER_SCRATCH_TMPFS_MAX_BYTES", str(256 * 1024 ** 2)))
+# Jobs are refused while a scratch filesystem would drop below this much free space
+SCRATCH_MIN_FREE_BYTES = int(os.getenv("RENDER_SCRATCH_MIN_FREE_BYTES", str(1024 ** 3)))
+# Without /proc a live pid may belong to another process than the directory's; such directories are
+# reaped after this long instead
+SCRATCH_MAX_AGE = int(os.getenv("RENDER_SCRATCH_MAX_AGE", str(6 * 3600)))
+SCRATCH_JANITOR_INTERVAL = int(os.getenv("RENDER_SCRATCH_JANITOR_INTERVAL", "600"))
+# Rough upper bound of scratch bytes per second of output (intermediate tracks, chunks, temp audio)
+SCRATCH_BYTES_PER_SECOND = 1024 ** 2
+
+JOB_DIR_PREFIX = "job-"
+
+
+class ScratchSpaceError(Exception):
+    """Raised when there is not enough free space to start a job."""
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError: # Exists, owned by someone else
+        return True
+    return True
+
+
+def _process_started_at(pid: int) -> Optional[float]:
+    # Start time of pid as a Unix timestamp, from /proc; None where that is not available
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split() # The command name may contain spaces
+        with open("/proc/stat") as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith("btime "))
+        return boot_time + int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+
+
+def _owner_alive(pid: int, modified_at: float, max_age: int) -> bool:
+    # Whether the process that made a job directory still runs. Its pid may have been reused since, by
+    # a process started after the directory was last written (btime has a one-second resolution)
+    if not _pid_alive(pid):
+        return False
+    started_at = _process_started_at(pid)
+    if started_at is None:
+        return time.time() - modified_at < max_age
+    return started_at <= modified_at + 1
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ScratchSpace:
+    """Allocates per-job scratch directories on disk or tmpfs, with free-space checks and orphan cleanup."""
+
+    def __init__(
+        self,
+        root: str = SCRATCH_DIR,
+        tmpfs_root: Optional[str] = SCRATCH_TMPFS_DIR,
+        tmpfs_max_bytes: int = SCRATCH_TMPFS_MAX_BYTES,
+        min_free_bytes: int = SCRATCH_MIN_FREE_BYTES,
+        max_age: int = SCRATCH_MAX_AGE
+    ):
+        self.root = root
+        self.tmpfs_root = os.path.join(tmpfs_root, "render-scratch") if tmpfs_root else None
+        self.tmpfs_max_bytes = tmpfs_max_bytes
+        self.min_free_bytes = min_free_bytes
+        self.max_age = max_age
+        for directory in self.roots():
+            os.makedirs(directory, exist_ok=True)
+
+    def roots(self) -> List[str]:
+        return [self.root] + ([self.tmpfs_root] if self.tmpfs_root else [])
+
+    def _free(self, root: str) -> int:
+        return shutil.disk_usage(root).free
+
+    def check_free(self, estimated_bytes: int = 0):
+        """Raises ScratchSpaceError if the disk scratch cannot take a job of estimated_bytes."""
+        free = self._free(self.root)
+        if free - estimated_bytes < self.min_free_bytes:
+            raise ScratchSpaceError(
+                f"Not enough scratch space: {free // 1024 ** 2} MB free in {self.root}, "
+                f"{(estimated_bytes + self.min_free_bytes) // 1024 ** 2} MB needed"
+            )
+
+    def make_dir(self, estimated_bytes: int = 0) -> str:
+        """Creates a job directory, in RAM when the job is small and tmpfs has room for it."""
+        root = self.root
+        if self.tmpfs_root and estimated_bytes <= self.tmpfs_max_bytes:
+            # tmpfs is memory, keep the same headroom there as on disk but scaled to its size
+            total = shutil.disk_usage(self.tmpfs_root).total
+            if self._free(self.tmpfs_root) - estimated_bytes >= min(self.min_free_bytes, total // 4):
+                root = self.tmpfs_root
+        if root == self.root:
+            self.check_free(estimated_bytes)
+        return tempfile.mkdtemp(prefix=f"{JOB_DIR_PREFIX}{os.getpid()}-", dir=root)
+
+    @contextmanager
+    def job_dir(self, estimated_bytes: int = 0) -> Iterator[str]:
+        """A job directory that is removed when the block exits, whatever happens inside it."""
+        path = self.make_dir(estimated_bytes)
+        try:
+            yield path
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def purge_orphans(self) -> int:
+        """
+        Removes job directories whose process is gone. A directory's age alone never removes it, since a
+        long render leaves its scratch untouched for hours; max_age only applies where /proc is missing.
+        """
+        removed = 0
+        for root in self.roots():
+            try:
+                entries = list(os.scandir(root))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if not entry.name.startswith(JOB_DIR_PREFIX) or not entry.is_dir():
+                    continue
+                try:
+                    pid = int(entry.name[len(JOB_DIR_PREFIX):].split("-", 1)[0])
+                    modified_at = entry.stat().st_mtime
+                except (ValueError, OSError):
+                    continue
+                if _owner_alive(pid, modified_at, self.max_age):
+                    continue
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} orphaned scratch directories")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        result = {}
+        for root in self.roots():
+            job_dirs = [e.path for e in os.scandir(root) if e.name.startswith(JOB_DIR_PREFIX) and e.is_dir()]
+            usage = shutil.disk_usage(root)
+            result[root] = {
+                "job_dirs": len(job_dirs),
+                "bytes": sum(_dir_size(path) for path in job_dirs),
+                "free_bytes": usage.free,
+                "total_bytes": usage.total,
+            }
+        return result
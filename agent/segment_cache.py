@@ -0,0 +1,55 @@
+import os
+import logging
+import threading
+from typing import Optional, Tuple
+
+from ffmpeg_engine import X264_PRESET, encode_image_segment
+from render_cache import file_digest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENT_CACHE_DIR = os.getenv(
+    "SEGMENT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "derived", "segments"),
+)
+
+
+class SegmentCache:
+    """
+    Derived-asset store of per-image video segments, keyed by (image content hash, frame count, fps,
+    encoder settings). Images are the normalized copies, so the hash also covers the render size.
+    Slideshows are assembled from these by stream copy, so editing one image only re-encodes its segment.
+    """
+
+    def __init__(self, directory: str = DEFAULT_SEGMENT_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, image_path: str, frames: int, fps: int, streaming: bool) -> str:
+        digest = file_digest(image_path)[:32] # Memoized on mtime, so cheap for unchanged files
+        layout = "stream" if streaming else "plain"
+        return os.path.join(self.directory, f"{digest}_{frames}f_{fps}fps_{X264_PRESET}_{layout}.mp4")
+
+    def get(
+        self,
+        image_path: str,
+        frames: int,
+        fps: int,
+        streaming: bool = False,
+        threads: Optional[int] = None
+    ) -> Tuple[str, bool]:
+        """Returns (segment path, whether it had to be encoded now)."""
+        segment_path = self.path_for(image_path, frames, fps, streaming)
+        if os.path.exists(segment_path):
+            return segment_path, False
+
+        # Encode under a temporary name so concurrent renders never read a half-written segment
+        tmp_path = f"{segment_path}.{os.getpid()}.{threading.get_ident()}.tmp.mp4"
+        try:
+            encode_image_segment(image_path, tmp_path, frames, fps, streaming, threads)
+            os.replace(tmp_path, segment_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        logger.info(f"Encoded segment of {os.path.basename(image_path)} ({frames} frames at {fps} fps)")
+        return segment_path, True
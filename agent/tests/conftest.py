@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+# The agent modules are flat scripts imported by name, as in the Docker image (WORKDIR /app)
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AGENT_DIR)
+
+# Keep the stores that are created at import time out of the real assets directory
+_state_dir = tempfile.mkdtemp(prefix="agent-tests-")
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(_state_dir, "llm_cache.db"))
+os.environ.setdefault("PROJECT_DB_PATH", os.path.join(_state_dir, "projects.db"))
+for _name, _dir in (("IMAGE_CACHE_DIR", "images"), ("AUDIO_CACHE_DIR", "audio"), ("SEGMENT_CACHE_DIR", "segments")):
+    os.environ.setdefault(_name, os.path.join(_state_dir, "derived", _dir))
@@ -0,0 +1,51 @@
+"""Shared render queue: leases, requeueing after a lost lease, and the capacity workers offer."""
+import time
+
+import pytest
+
+from job_store import JobStore
+
+LEASE = 0.2 # seconds
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "queue.db"), lease_seconds=LEASE, max_attempts=2)
+
+
+def test_lost_lease_is_requeued_and_fenced(store):
+    store.enqueue("t1", "video", ["job", {}, "out.mp4"])
+    first = store.claim("w1")
+    assert first["attempt"] == 1 and store.claim("w2") is None # Leased to w1
+
+    time.sleep(LEASE * 1.5) # w1 stops heartbeating
+    second = store.claim("w2")
+    assert second["task_id"] == "t1" and second["attempt"] == 2
+
+    # w1 lost the task: it can neither renew the lease nor report a result
+    assert not store.heartbeat("t1", "w1", 0.5)
+    assert not store.finish("t1", "w1", {"result_path": "w1.mp4"})
+    assert store.heartbeat("t1", "w2", 0.5)
+    assert store.finish("t1", "w2", {"result_path": "w2.mp4"})
+    task = store.tasks(["t1"])["t1"]
+    assert (task["status"], task["worker_id"], task["result"]) == ("succeeded", "w2", {"result_path": "w2.mp4"})
+
+
+def test_task_fails_after_max_attempts(store):
+    store.enqueue("t1", "video", [])
+    for worker_id in ("w1", "w2"):
+        assert store.claim(worker_id) is not None
+        time.sleep(LEASE * 1.5)
+    assert store.claim("w3") is None
+    task = store.tasks(["t1"])["t1"]
+    assert task["status"] == "failed" and "2 times" in task["error"]
+
+
+def test_only_accepting_workers_count_as_capacity(store):
+    for worker_id in ("w1", "w2"):
+        store.register_worker(worker_id)
+    store.touch_worker("w2", accepting=False) # Out of scratch space
+    assert store.live_workers() == 1
+    assert [w["accepting"] for w in store.worker_stats()] == [True, False]
+    store.touch_worker("w2")
+    assert store.live_workers() == 2
@@ -0,0 +1,194 @@
+"""LLMClients against a local OpenAI-compatible stub server: pooled connections, the concurrency cap and streaming."""
+import json
+import time
+import socket
+import asyncio
+import threading
+
+import pytest
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from langchain_core.prompts import ChatPromptTemplate
+
+import llm
+from llm import LLMClients
+
+STREAM_PARTS = ["Hel", "lo", " world"]
+
+
+class StubLLM:
+    """Answers /v1/chat/completions after `delay` seconds, recording client ports and peak concurrency."""
+
+    def __init__(self):
+        self.delay = 0.0
+        self.chunk_delay = 0.0
+        self.stream_finish = "stop" # None ends the stream without a finish_reason, like a dropped upstream
+        self.ports = []
+        self.active = 0
+        self.peak = 0
+        self.app = Starlette(routes=[Route("/v1/chat/completions", self.chat, methods=["POST"])])
+
+    def reset(self):
+        self.delay = self.chunk_delay = 0.0
+        self.stream_finish = "stop"
+        self.ports, self.active, self.peak = [], 0, 0
+
+    async def chat(self, request: Request):
+        body = await request.json()
+        self.ports.append(request.client.port)
+        if body.get("stream"):
+            return StreamingResponse(self._stream(body["model"]), media_type="text/event-stream")
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return JSONResponse({
+            "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        })
+
+    async def _stream(self, model: str):
+        def event(delta, finish_reason=None):
+            chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            return f"data: {json.dumps(chunk)}\n\n"
+
+        for part in STREAM_PARTS:
+            yield event({"role": "assistant", "content": part})
+            await asyncio.sleep(self.chunk_delay)
+        if self.stream_finish is not None:
+            yield event({}, self.stream_finish)
+        yield "data: [DONE]\n\n"
+
+
+@pytest.fixture(scope="module")
+def stub_server():
+    stub = StubLLM()
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(stub.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        assert time.monotonic() < deadline, "stub LLM server did not start"
+        time.sleep(0.05)
+    stub.url = f"http://127.0.0.1:{port}/v1"
+    yield stub
+    server.should_exit = True
+    thread.join(timeout=10)
+
+
+@pytest.fixture
+def stub(stub_server, monkeypatch):
+    stub_server.reset()
+    monkeypatch.setattr(llm, "LLM_API_BASE", stub_server.url)
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test-key")
+    return stub_server
+
+
+def _chain(clients: LLMClients, temperature: float = 0.3):
+    return ChatPromptTemplate.from_template("{question}") | clients.chat_model(temperature=temperature)
+
+
+def test_models_share_one_pooled_connection(stub):
+    clients = LLMClients(cache=None)
+    assert clients.chat_model(0.3) is clients.chat_model(0.3)
+
+    async def run():
+        try:
+            # Two agents with different settings, one after the other
+            for temperature in (0.3, 0.0, 0.3, 0.0):
+                result = await clients.ainvoke(_chain(clients, temperature), {"question": "hi"})
+                assert result.content == "ok"
+        finally:
+            await clients.aclose()
+
+    asyncio.run(run())
+    assert len(stub.ports) == 4
+    assert len(set(stub.ports)) == 1, "every call should reuse the same keep-alive connection"
+
+
+def test_concurrency_is_capped(stub):
+    stub.delay = 0.2
+    clients = LLMClients(max_concurrency=2, cache=None)
+
+    async def run():
+        try:
+            chain = _chain(clients)
+            results = await asyncio.gather(*(clients.ainvoke(chain, {"question": f"q{i}"}) for i in range(6)))
+            assert [result.content for result in results] == ["ok"] * 6
+        finally:
+            await clients.aclose()
+
+    asyncio.run(run())
+    assert len(stub.ports) == 6
+    assert stub.peak == 2
+    assert clients.in_flight == 0
+
+
+def test_stream_yields_chunks_as_they_arrive(stub):
+    stub.chunk_delay = 0.2
+    clients = LLMClients(max_concurrency=1, cache=None)
+
+    async def run():
+        received = []
+        started = time.perf_counter()
+        try:
+            async for part in clients.astream(_chain(clients), {"question": "hi"}):
+                received.append((part, time.perf_counter() - started, clients.in_flight))
+        finally:
+            await clients.aclose()
+        return received, time.perf_counter() - started
+
+    received, total = asyncio.run(run())
+    assert [part for part, _, _ in received] == STREAM_PARTS
+    # The first part is delivered before the server has sent the rest
+    assert received[0][1] < total - 0.3
+    # The concurrency slot is held while the stream is open
+    assert all(in_flight == 1 for _, _, in_flight in received)
+    assert clients.in_flight == 0
+
+
+class DictCache:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    get_memory = get
+
+    def put(self, key, content):
+        self.entries[key] = content
+
+    def stats(self):
+        return {"entries": len(self.entries)}
+
+
+@pytest.mark.parametrize("finish_reason, cached", [("stop", True), (None, False), ("length", False)])
+def test_only_finished_streams_are_cached(stub, finish_reason, cached):
+    stub.stream_finish = finish_reason
+    clients = LLMClients(cache=DictCache())
+
+    async def run():
+        try:
+            chain = _chain(clients)
+            key = clients.cache_key(clients.chat_model(0.3), "{question}", {"question": "hi"})
+            parts = [part async for part in clients.astream(chain, {"question": "hi"}, key)]
+            return key, parts
+        finally:
+            await clients.aclose()
+
+    key, parts = asyncio.run(run())
+    assert parts == STREAM_PARTS
+    assert (key in clients.cache.entries) is cached
+    if cached:
+        assert clients.cache.entries[key] == "".join(STREAM_PARTS)
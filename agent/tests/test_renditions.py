@@ -0,0 +1,41 @@
+"""
+Rendition ladders on every render engine: each rendition is cached under a key that includes its
+video_bitrate, so the output must actually be encoded at that bitrate whichever engine renders it.
+"""
+import os
+
+import pytest
+
+from bench_render import make_images
+from movie import MovieGenerator
+
+DURATION = 3.0 # seconds: three images, one second each
+LOW_BITRATE, HIGH_BITRATE = 100, 3000 # kbit/s
+
+
+@pytest.fixture(scope="module")
+def images(tmp_path_factory):
+    return make_images(str(tmp_path_factory.mktemp("images")), 3, (640, 360))
+
+
+@pytest.mark.parametrize("engine", ["ffmpeg", "segments", "moviepy"])
+def test_ladder_bitrates_are_honoured(engine, images, tmp_path):
+    generator = MovieGenerator()
+    try:
+        outcomes = generator.create_video_renditions(
+            image_paths=images,
+            music_path=None,
+            renditions=[
+                {"output_path": str(tmp_path / "low.mp4"), "image_size": [640, 360], "video_bitrate": LOW_BITRATE},
+                {"output_path": str(tmp_path / "high.mp4"), "image_size": [640, 360], "video_bitrate": HIGH_BITRATE},
+            ],
+            image_duration=1.0,
+            fps=12,
+            engine=engine,
+        )
+    finally:
+        generator.cleanup()
+
+    low, high = (os.path.getsize(outcome["result_path"]) * 8 / DURATION / 1000 for outcome in outcomes)
+    assert low <= 1.5 * LOW_BITRATE, f"{engine}: {low:.0f} kbit/s for a {LOW_BITRATE} kbit/s rendition"
+    assert high > 1.5 * low, f"{engine}: {high:.0f} kbit/s vs {low:.0f} kbit/s"
@@ -0,0 +1,28 @@
+"""Scratch janitor: a job directory is reaped when its process is gone, never for its age alone."""
+import os
+import subprocess
+import sys
+import time
+
+from scratch import JOB_DIR_PREFIX, ScratchSpace
+
+
+def _job_dir(root, pid: int, modified_at: float) -> str:
+    path = os.path.join(root, f"{JOB_DIR_PREFIX}{pid}-test{len(os.listdir(root))}")
+    os.makedirs(path)
+    os.utime(path, (modified_at, modified_at))
+    return path
+
+
+def test_purge_orphans(tmp_path):
+    scratch = ScratchSpace(root=str(tmp_path), tmpfs_root=None, max_age=0)
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+
+    running = _job_dir(str(tmp_path), os.getpid(), time.time()) # Past max_age, but its render is still going
+    orphaned = _job_dir(str(tmp_path), dead.pid, time.time())
+    reused = _job_dir(str(tmp_path), os.getpid(), time.time() - 30 * 24 * 3600) # Older than this process: pid reused
+
+    assert scratch.purge_orphans() == 2
+    assert os.path.isdir(running)
+    assert not os.path.exists(orphaned) and not os.path.exists(reused)
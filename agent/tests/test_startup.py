@@ -0,0 +1,44 @@
+"""
+Cold start of the API: `import api` in a fresh interpreter must stay within a time budget and must not
+load any of bench_startup.LAZY_MODULES. The budget is STARTUP_TEST_BUDGET_SECONDS, twice the benchmark's
+default so slower CI machines pass; set it to 0 to skip the timing check.
+"""
+import glob
+import os
+import shutil
+import statistics
+
+import pytest
+
+import bench_startup
+from bench_startup import LAZY_MODULES, STARTUP_BUDGET_SECONDS, run_once
+
+STARTUP_TEST_BUDGET_SECONDS = float(os.getenv("STARTUP_TEST_BUDGET_SECONDS", str(2 * STARTUP_BUDGET_SECONDS)))
+RUNS = 3
+
+
+@pytest.fixture(scope="module")
+def api_copy(tmp_path_factory):
+    # Importing api creates its assets directories next to the module, so import a copy
+    directory = tmp_path_factory.mktemp("api")
+    for path in glob.glob(os.path.join(os.path.dirname(bench_startup.__file__), "*.py")):
+        shutil.copy(path, directory)
+    run_once(str(directory)) # Writes the bytecode caches, as bench_startup does before timing
+    return str(directory)
+
+
+def test_api_import_leaves_heavy_modules_unloaded(api_copy):
+    loaded = {name.split(".")[0] for name in run_once(api_copy)["modules"]}
+    assert not loaded & set(LAZY_MODULES), f"imported at startup: {sorted(loaded & set(LAZY_MODULES))}"
+
+
+def test_api_import_within_budget(api_copy):
+    if STARTUP_TEST_BUDGET_SECONDS <= 0:
+        pytest.skip("STARTUP_TEST_BUDGET_SECONDS is 0")
+    runs = [run_once(api_copy) for _ in range(RUNS)]
+    median = statistics.median(run["import_seconds"] for run in runs)
+    slowest = list(bench_startup.breakdown(runs[-1]["self_seconds"]).items())[:5]
+    assert median <= STARTUP_TEST_BUDGET_SECONDS, (
+        f"import api took {median:.3f}s (median of {RUNS}), budget {STARTUP_TEST_BUDGET_SECONDS:.3f}s; slowest packages: "
+        + ", ".join(f"{package} {seconds * 1000:.0f} ms" for package, seconds in slowest)
+    )
@@ -0,0 +1,68 @@
+"""Resumable uploads: completing a session races neither a retried complete nor a chunk in flight."""
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from uploads import ResumableUploads, UploadBusyError, UploadNotFoundError
+
+DATA = b"slideshow" * 10000
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+def _received(tmp_path):
+    uploads = ResumableUploads(str(tmp_path / "uploads"))
+    session = uploads.create("image", "photo.jpg", len(DATA), 10 * len(DATA))
+    asyncio.run(uploads.append(session["upload_id"], 0, _chunks(DATA)))
+    return uploads, session["upload_id"]
+
+
+def test_double_complete(tmp_path):
+    uploads, upload_id = _received(tmp_path)
+    targets = [str(tmp_path / f"photo{i}.jpg") for i in range(8)]
+    start = threading.Barrier(len(targets))
+
+    def complete(target):
+        start.wait()
+        try:
+            return uploads.complete(upload_id, target)
+        except (UploadBusyError, UploadNotFoundError) as e:
+            return e
+
+    with ThreadPoolExecutor(len(targets)) as pool:
+        outcomes = list(pool.map(complete, targets))
+    completed = [outcome for outcome in outcomes if isinstance(outcome, dict)]
+    assert len(completed) == 1
+    assert completed[0] == {"size": len(DATA), "sha256": hashlib.sha256(DATA).hexdigest()}
+    # Done: a retry now finds no session
+    with pytest.raises(UploadNotFoundError):
+        uploads.complete(upload_id, targets[0])
+
+
+def test_complete_refused_while_receiving(tmp_path):
+    uploads = ResumableUploads(str(tmp_path / "uploads"))
+    upload_id = uploads.create("image", "photo.jpg", len(DATA), 10 * len(DATA))["upload_id"]
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_chunks():
+            yield DATA[:10]
+            await release.wait()
+            yield DATA[10:]
+
+        append = asyncio.create_task(uploads.append(upload_id, 0, slow_chunks()))
+        await asyncio.sleep(0.1)
+        with pytest.raises(UploadBusyError):
+            uploads.complete(upload_id, str(tmp_path / "photo.jpg"))
+        release.set()
+        await append
+
+    asyncio.run(scenario())
+    assert uploads.complete(upload_id, str(tmp_path / "photo.jpg"))["size"] == len(DATA)
@@ -0,0 +1,30 @@
+"""YC coach projects: named projects keep an event history, the shared default profile never does."""
+import pytest
+
+from project_store import ProjectStore
+from yc_coach import SHARED_PROJECT, YCCoach, project
+
+
+@pytest.fixture
+def coach(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test-key") # Only builds the clients, nothing is requested
+    return YCCoach(store=ProjectStore(str(tmp_path / "projects.db"), seed=project))
+
+
+@pytest.mark.parametrize("project_name", [None, SHARED_PROJECT])
+def test_shared_profile_keeps_no_history(coach, project_name):
+    assert not coach.keeps_history(project_name)
+    for logs in ("caller one", "caller two"):
+        variables = coach.stateless_prompt(logs)
+        assert variables["current_event_logs"] == logs # Nothing from the other caller
+        assert variables["user_personality"] == project[SHARED_PROJECT]["user_personality"]
+    with pytest.raises(ValueError):
+        coach.record_event(SHARED_PROJECT, "caller three")
+    assert coach.store.get_project(SHARED_PROJECT)["events"] == 0
+
+
+def test_named_project_keeps_history(coach):
+    assert coach.keeps_history("yc")
+    coach.record_event("yc", "shipped the landing page")
+    assert coach.store.get_project("yc")["events"] == 1
+    assert "shipped the landing page" in coach.project_prompt("yc")["current_event_logs"]
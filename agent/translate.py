@@ -1,56 +1,376 @@
-from typing import Dict, Any
+import os
+import re
+import json
+import asyncio
+import hashlib
+import logging
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
 from langchain.prompts import ChatPromptTemplate
-from langchain_deepseek import ChatDeepSeek
-from dotenv import load_dotenv
 
-load_dotenv()
+from llm import llm_clients, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Long documents are translated in chunks of about this many tokens, up to TRANSLATION_MAX_PARALLEL at a time
+TRANSLATION_CHUNK_TOKENS = int(os.getenv("TRANSLATION_CHUNK_TOKENS", "1200"))
+TRANSLATION_MAX_PARALLEL = int(os.getenv("TRANSLATION_MAX_PARALLEL", "4"))
+# Tail of the previous chunk's source shown with each chunk, to keep style and terms consistent
+TRANSLATION_CONTEXT_CHARS = int(os.getenv("TRANSLATION_CONTEXT_CHARS", "200"))
+# Besides the token budget, a chunk also ends after any paragraph whose hash is 0 modulo this. Boundaries
+# then follow the content instead of positions, so an edit does not shift every later chunk (and its cache key).
+CHUNK_BOUNDARY_MODULUS = 4
+
+# Many short texts are packed into one prompt of up to this many tokens / items
+TRANSLATION_BATCH_TOKENS = int(os.getenv("TRANSLATION_BATCH_TOKENS", "1500"))
+TRANSLATION_BATCH_MAX_ITEMS = int(os.getenv("TRANSLATION_BATCH_MAX_ITEMS", "40"))
+# Single translations arriving this close together are sent as one batch
+TRANSLATION_BATCH_WINDOW = float(os.getenv("TRANSLATION_BATCH_WINDOW_MS", "20")) / 1000
+
+# Targets written without spaces between sentences
+UNSPACED_LANGS = ("zh", "ja", "ko")
+
+_CJK = re.compile(r"[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]") # Sentences joined without a space
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_BREAK = re.compile(r"(?<=[。！？!?；])|(?<=[.;])\s+")
+
+# Create the translation prompt
+TRANSLATION_TEMPLATE = """你是一个旅游游记翻译专家，在翻译过程中注意
+        1. 只需要输出翻译结果，不需要其他内容
+        2. 翻译质量要高，要符合游记风格
+        翻译游记从 {source_lang} 到 {target_lang}:
         
-class TranslationAgent:
-    def __init__(self):
-        # Initialize any necessary components for translation
-        pass
-    def translate(self, text: str, source_lang: str = "auto", target_lang: str = "en") -> str:
-        """
-        Translate text from source language to target language using LangChain
+        游记内容: {text}
         
-        Args:
-            text (str): The text to translate
-            source_lang (str): Source language code (default: "auto" for auto-detection)
-            target_lang (str): Target language code (default: "en" for English)
-            
-        Returns:
-            str: Translated text
-        """
-     
-        # Initialize the LLM
-        llm = ChatDeepSeek(temperature=0,api_base="https://api.siliconflow.cn/v1", model="deepseek-ai/DeepSeek-V3")
+        翻译结果
         
-        # Create the translation prompt
-        template = """你是一个旅游游记翻译专家，在翻译过程中注意
+        """
+
+# One chunk of a longer document
+DOCUMENT_CHUNK_TEMPLATE = """你是一个旅游游记翻译专家，在翻译过程中注意
         1. 只需要输出翻译结果，不需要其他内容
         2. 翻译质量要高，要符合游记风格
+        3. 保持原文的段落划分，段落之间用空行分隔
+        4. 前文只用于保持风格和用词一致，不要翻译前文
         翻译游记从 {source_lang} 到 {target_lang}:
         
+        前文: {context}
+        
         游记内容: {text}
         
         翻译结果
         
         """
+
+
+# Many short texts at once, answered as JSON so each translation can be matched to its input
+BATCH_TEMPLATE = """你是一个旅游游记翻译专家，把下面 JSON 数组中每一项的 text 从 {source_lang} 翻译到 {target_lang}
+        1. 只输出一个 JSON 数组，每一项为 {{"id": 编号, "translation": "译文"}}，不需要其他内容
+        2. 每个 id 输出且只输出一项，不要合并或拆分
+        3. 翻译质量要高，要符合游记风格
         
-        prompt = ChatPromptTemplate.from_template(template)
+        {items}
+        """
+
+
+def _is_boundary(paragraph: str) -> bool:
+    return int(hashlib.md5(paragraph.encode("utf-8")).hexdigest()[:8], 16) % CHUNK_BOUNDARY_MODULUS == 0
+
+
+def _split_paragraph(paragraph: str, max_tokens: int) -> List[str]:
+    """Splits an oversized paragraph on sentence ends, and sentences that are still too long by length."""
+    pieces, current = [], ""
+    for sentence in filter(None, (s.strip() for s in _SENTENCE_BREAK.split(paragraph))):
+        tokens = estimate_tokens(sentence)
+        if tokens > max_tokens:
+            step = max(1, len(sentence) * max_tokens // tokens)
+            pieces.extend([current] if current else [])
+            pieces.extend(sentence[i:i + step] for i in range(0, len(sentence), step))
+            current = ""
+        elif current and estimate_tokens(current) + tokens > max_tokens:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current and not _CJK.match(sentence) else current + sentence
+    return pieces + ([current] if current else [])
+
+
+def split_document(text: str, max_tokens: int = TRANSLATION_CHUNK_TOKENS) -> List[Tuple[str, bool]]:
+    """
+    Splits text into chunks of whole paragraphs within max_tokens. Returns (chunk, continues_paragraph)
+    pairs; the flag is set on the later pieces of a paragraph that had to be split on sentence boundaries.
+    """
+    chunks: List[Tuple[str, bool]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for paragraph in filter(None, (p.strip() for p in _PARAGRAPH_BREAK.split(text))):
+        tokens = estimate_tokens(paragraph)
+        if current and (tokens > max_tokens or current_tokens + tokens > max_tokens):
+            chunks.append(("\n\n".join(current), False))
+            current, current_tokens = [], 0
+        if tokens > max_tokens:
+            chunks.extend((piece, i > 0) for i, piece in enumerate(_split_paragraph(paragraph, max_tokens)))
+            continue
+        current.append(paragraph)
+        current_tokens += tokens
+        if _is_boundary(paragraph):
+            chunks.append(("\n\n".join(current), False))
+            current, current_tokens = [], 0
+    if current:
+        chunks.append(("\n\n".join(current), False))
+    return chunks
+
+
+def _parse_batch(content: str, count: int) -> Dict[int, str]:
+    """Valid {id: translation} pairs from a batch answer; anything malformed or unknown is dropped."""
+    start, end = content.find("["), content.rfind("]")
+    try:
+        items = json.loads(content[start:end + 1]) if 0 <= start < end else []
+    except ValueError:
+        return {}
+    parsed = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        item_id, translation = item.get("id"), item.get("translation")
+        if isinstance(item_id, int) and 0 <= item_id < count and isinstance(translation, str) and translation.strip():
+            parsed.setdefault(item_id, translation.strip())
+    return parsed
+
         
-        # Create the chain
-        chain = prompt | llm
+class TranslationAgent:
+    def __init__(self, chunk_tokens: int = TRANSLATION_CHUNK_TOKENS, max_parallel: int = TRANSLATION_MAX_PARALLEL):
+        # The chat model (and its pooled HTTP connections) is shared process-wide
+        self.llm = llm_clients.chat_model(temperature=0)
+        self.chain = ChatPromptTemplate.from_template(TRANSLATION_TEMPLATE) | self.llm
+        self.document_chain = ChatPromptTemplate.from_template(DOCUMENT_CHUNK_TEMPLATE) | self.llm
+        self.batch_chain = ChatPromptTemplate.from_template(BATCH_TEMPLATE) | self.llm
+        self.chunk_tokens = chunk_tokens
+        self.max_parallel = max(1, max_parallel)
+
+    def translate(self, text: str, source_lang: str = "auto", target_lang: str = "en", use_cache: bool = True) -> str:
+        """
+        Translate text from source language to target language using LangChain
         
-        # Execute the translation
-        result = chain.invoke({
+        Args:
+            text (str): The text to translate
+            source_lang (str): Source language code (default: "auto" for auto-detection)
+            target_lang (str): Target language code (default: "en" for English)
+            use_cache (bool): Reuse an earlier translation of the same text (default: True)
+            
+        Returns:
+            str: Translated text
+        """
+        variables = {
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "text": text
+        }
+        key = llm_clients.cache_key(self.llm, TRANSLATION_TEMPLATE, variables, use_cache)
+        result = llm_clients.invoke(self.chain, variables, key)
+        
+        return result.content
+
+    async def atranslate(self, text: str, source_lang: str = "auto", target_lang: str = "en", use_cache: bool = True) -> str:
+        """
+        Async translate, for use inside the event loop; subject to the shared LLM concurrency cap.
+        Texts longer than chunk_tokens go through the chunked document pipeline.
+        """
+        if estimate_tokens(text) > self.chunk_tokens:
+            return await self.atranslate_document(text, source_lang, target_lang, use_cache)
+        variables = {
             "source_lang": source_lang,
             "target_lang": target_lang,
             "text": text
-        })
+        }
+        key = llm_clients.cache_key(self.llm, TRANSLATION_TEMPLATE, variables, use_cache)
+        result = await llm_clients.ainvoke(self.chain, variables, key)
         
         return result.content
 
+    async def astream_translate(self, text: str, source_lang: str = "auto", target_lang: str = "en", use_cache: bool = True) -> AsyncIterator[str]:
+        """Yields the translation as it is generated; long texts are yielded a chunk at a time, in order."""
+        if estimate_tokens(text) > self.chunk_tokens:
+            async for piece in self.aiter_document(text, source_lang, target_lang, use_cache):
+                yield piece
+            return
+        variables = {
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "text": text
+        }
+        key = llm_clients.cache_key(self.llm, TRANSLATION_TEMPLATE, variables, use_cache)
+        async for chunk in llm_clients.astream(self.chain, variables, key):
+            yield chunk
+
+    async def aiter_document(self, text: str, source_lang: str = "auto", target_lang: str = "en", use_cache: bool = True) -> AsyncIterator[str]:
+        """
+        Translates a long document chunk by chunk, up to max_parallel chunks at once, and yields the
+        translated chunks in document order (with their separators) as soon as each one is ready.
+        Chunks are cached individually, so after an edit only the chunks around it are translated again.
+        """
+        chunks = split_document(text, self.chunk_tokens)
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        joiner = "" if target_lang.lower().split("-")[0] in UNSPACED_LANGS else " "
+
+        async def translate_chunk(i: int) -> str:
+            variables = {
+                "source_lang": source_lang,
+                "target_lang": target_lang,
+                "context": chunks[i - 1][0][-TRANSLATION_CONTEXT_CHARS:] if i else "无",
+                "text": chunks[i][0],
+            }
+            key = llm_clients.cache_key(self.llm, DOCUMENT_CHUNK_TEMPLATE, variables, use_cache)
+            async with semaphore:
+                result = await llm_clients.ainvoke(self.document_chain, variables, key)
+            return result.content.strip()
+
+        tasks = [asyncio.create_task(translate_chunk(i)) for i in range(len(chunks))]
+        try:
+            for i, task in enumerate(tasks):
+                translated = await task
+                if i:
+                    yield (joiner if chunks[i][1] else "\n\n") + translated
+                else:
+                    yield translated
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def cache_key_for(self, text: str, source_lang: str, target_lang: str, use_cache: bool = True) -> Optional[str]:
+        """Response cache key of a plain translate() of text; batched translations are cached under it too."""
+        variables = {
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "text": text
+        }
+        return llm_clients.cache_key(self.llm, TRANSLATION_TEMPLATE, variables, use_cache)
+
+    def _pack(self, texts: List[str]) -> List[List[str]]:
+        batches, current, current_tokens = [], [], 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if current and (len(current) >= TRANSLATION_BATCH_MAX_ITEMS or current_tokens + tokens > TRANSLATION_BATCH_TOKENS):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        return batches + ([current] if current else [])
+
+    async def _translate_batch(self, batch: List[str], source_lang: str, target_lang: str) -> Dict[str, str]:
+        """
+        One batched prompt. Items missing from (or malformed in) the answer are retried: all of
+        them together if some came back, in two halves if none did, and alone as a last resort.
+        """
+        if len(batch) == 1:
+            return {batch[0]: await self.atranslate(batch[0], source_lang, target_lang, use_cache=False)}
+        variables = {
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "items": json.dumps([{"id": i, "text": text} for i, text in enumerate(batch)], ensure_ascii=False),
+        }
+        result = await llm_clients.ainvoke(self.batch_chain, variables)
+        parsed = _parse_batch(result.content, len(batch))
+        translated = {batch[i]: translation for i, translation in parsed.items()}
+        missing = [text for i, text in enumerate(batch) if i not in parsed]
+        if not missing:
+            return translated
+        logger.warning(f"Batch translation returned {len(parsed)} of {len(batch)} items, retrying the rest")
+        retries = [missing] if parsed else [missing[:len(missing) // 2], missing[len(missing) // 2:]]
+        for retried in await asyncio.gather(*(self._translate_batch(group, source_lang, target_lang) for group in retries)):
+            translated.update(retried)
+        return translated
+
+    async def atranslate_many(self, texts: List[str], source_lang: str = "auto", target_lang: str = "en", use_cache: bool = True) -> List[str]:
+        """
+        Translates many short texts with as few prompts as possible: cache hits and duplicates are
+        answered without a call, and the rest are packed into JSON batches run up to max_parallel at a time.
+        Texts too long to batch are translated on their own.
+        """
+        unique = list(dict.fromkeys(texts))
+        keys = {text: self.cache_key_for(text, source_lang, target_lang, use_cache) for text in unique}
+        results: Dict[str, str] = {}
+        for text in unique:
+            cached = await llm_clients.acached(keys[text])
+            if cached is not None:
+                results[text] = cached
+        pending = [text for text in unique if text not in results]
+        single = [text for text in pending if estimate_tokens(text) > TRANSLATION_BATCH_TOKENS // 2]
+        semaphore = asyncio.Semaphore(self.max_parallel)
+
+        async def run(batch: List[str]):
+            async with semaphore:
+                translated = await self._translate_batch(batch, source_lang, target_lang)
+            for text, translation in translated.items():
+                results[text] = translation
+                await llm_clients.astore(keys[text], translation)
+
+        batches = [[text] for text in single] + self._pack([text for text in pending if text not in single])
+        await asyncio.gather(*(run(batch) for batch in batches))
+        return [results[text] for text in texts]
+
+    async def atranslate_document(self, text: str, source_lang: str = "auto", target_lang: str = "en", use_cache: bool = True) -> str:
+        """The whole translation of a long document; see aiter_document."""
+        return "".join([piece async for piece in self.aiter_document(text, source_lang, target_lang, use_cache)])
+
+class TranslationBatcher:
+    """
+    Coalesces single translations that arrive within window seconds of each other (per language
+    pair) into one atranslate_many call. Memory-cached texts are answered without waiting.
+    """
+
+    def __init__(self, agent: TranslationAgent, window: float = TRANSLATION_BATCH_WINDOW, max_items: int = TRANSLATION_BATCH_MAX_ITEMS):
+        self.agent = agent
+        self.window = window
+        self.max_items = max_items
+        self.batches = 0
+        self.items = 0
+        self._pending: Dict[Tuple[str, str, bool], List[Tuple[str, asyncio.Future]]] = {}
+        self._timers: Dict[Tuple[str, str, bool], asyncio.TimerHandle] = {}
+        self._tasks = set()
+
+    async def translate(self, text: str, source_lang: str = "auto", target_lang: str = "en", use_cache: bool = True) -> str:
+        cached = llm_clients.memory_cached(self.agent.cache_key_for(text, source_lang, target_lang, use_cache))
+        if cached is not None:
+            return cached
+        loop = asyncio.get_running_loop()
+        group = (source_lang, target_lang, use_cache)
+        future = loop.create_future()
+        self._pending.setdefault(group, []).append((text, future))
+        if len(self._pending[group]) >= self.max_items:
+            self._flush(group)
+        elif group not in self._timers:
+            self._timers[group] = loop.call_later(self.window, self._flush, group)
+        return await future
+
+    def _flush(self, group: Tuple[str, str, bool]):
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._pending.pop(group, [])
+        if items:
+            task = asyncio.ensure_future(self._run(group, items))
+            self._tasks.add(task) # Keep a reference until it finishes
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, group: Tuple[str, str, bool], items: List[Tuple[str, asyncio.Future]]):
+        source_lang, target_lang, use_cache = group
+        self.batches += 1
+        self.items += len(items)
+        try:
+            results = await self.agent.atranslate_many([text for text, _ in items], source_lang, target_lang, use_cache)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"batches": self.batches, "items": self.items, "pending": sum(len(v) for v in self._pending.values())}
+
+
 def create_translation_agent() -> TranslationAgent:
     """
     Factory function to create a translation agent
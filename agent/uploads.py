@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, AsyncIterator, BinaryIO, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Per-type upload caps in bytes, overridable from the environment
+MAX_UPLOAD_BYTES = {
+    "music": int(os.getenv("MAX_MUSIC_UPLOAD_BYTES", str(100 * 1024 ** 2))),
+    "image": int(os.getenv("MAX_IMAGE_UPLOAD_BYTES", str(30 * 1024 ** 2))),
+    "video": int(os.getenv("MAX_VIDEO_UPLOAD_BYTES", str(2 * 1024 ** 3))),
+}
+COPY_CHUNK_SIZE = 1024 * 1024
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))
+
+
+class UploadError(Exception):
+    """Raised for invalid upload requests (bad offset, unknown session, checksum mismatch)."""
+
+
+class UploadTooLargeError(UploadError):
+    """Raised when an upload exceeds the size limit of its media type."""
+
+
+class UploadNotFoundError(UploadError):
+    """Raised for an unknown upload session, including one that was completed or purged meanwhile."""
+
+
+class UploadBusyError(UploadError):
+    """Raised when a session is already receiving a chunk or being completed."""
+
+
+def safe_filename(filename: str) -> str:
+    """Strips any directory components so uploads cannot escape their media directory."""
+    name = os.path.basename((filename or "").replace("\\", "/"))
+    if not name or name.startswith("."):
+        raise UploadError("Invalid filename")
+    return name
+
+
+def _temp_path_for(final_path: str) -> str:
+    # Dotfile in the destination directory: hidden from listings and renamed atomically on the same filesystem
+    directory, name = os.path.split(final_path)
+    return os.path.join(directory, f".{name}.{uuid.uuid4().hex}.part")
+
+
+async def write_stream_atomic(chunks: AsyncIterator[bytes], final_path: str, max_bytes: int) -> Tuple[int, str]:
+    """
+    Streams chunks to final_path under a temporary name, hashing on the fly, then renames it into place.
+    Returns (size, sha256). Nothing is left behind if the stream fails or exceeds max_bytes.
+    """
+    temp_path = _temp_path_for(final_path)
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as f:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"Upload exceeds the {max_bytes} byte limit")
+                sha.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        os.replace(temp_path, final_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return size, sha.hexdigest()
+
+
+async def iter_file(file: BinaryIO) -> AsyncIterator[bytes]:
+    """Adapts a blocking file object (e.g. a spooled multipart upload) to an async chunk iterator."""
+    while True:
+        chunk = await asyncio.to_thread(file.read, COPY_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+class ResumableUploads:
+    """
+    Resumable chunked uploads. Each session appends chunks at an explicit offset to a part file
+    in `directory`, with its metadata in a JSON sidecar so sessions survive a restart.
+    The part file is renamed into the media directory when the upload is completed.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+        self._hashers: Dict[str, Tuple[int, Any]] = {} # upload_id -> (offset, running sha256)
+        self._receiving = set() # upload_ids with a chunk currently being written
+        self._completing = set() # upload_ids being moved into place
+        self._lock = threading.Lock()
+
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f"{upload_id}.json")
+
+    def _part_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f"{upload_id}.part")
+
+    def _save(self, session: Dict[str, Any]):
+        tmp_path = f"{self._meta_path(session['upload_id'])}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(session, f)
+        os.replace(tmp_path, self._meta_path(session["upload_id"]))
+
+    def create(self, media_type: str, filename: str, total_size: int, max_bytes: int) -> Dict[str, Any]:
+        if total_size < 0:
+            raise UploadError("Invalid upload size")
+        if total_size > max_bytes:
+            raise UploadTooLargeError(f"Upload exceeds the {max_bytes} byte limit")
+        upload_id = uuid.uuid4().hex
+        session = {
+            "upload_id": upload_id,
+            "media_type": media_type,
+            "filename": safe_filename(filename),
+            "size": total_size,
+            "offset": 0,
+            "created_at": time.time(),
+        }
+        open(self._part_path(upload_id), "wb").close()
+        self._save(session)
+        return session
+
+    def get(self, upload_id: str) -> Dict[str, Any]:
+        if not upload_id.isalnum():
+            raise UploadNotFoundError("Unknown upload")
+        try:
+            with open(self._meta_path(upload_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadNotFoundError("Unknown upload")
+
+    def _hasher_at(self, upload_id: str, offset: int):
+        with self._lock:
+            state = self._hashers.get(upload_id)
+        if state and state[0] == offset:
+            return state[1]
+        # Not in memory (e.g. after a restart): rebuild the running hash from what is on disk
+        sha = hashlib.sha256()
+        with open(self._part_path(upload_id), "rb") as f:
+            for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+                sha.update(chunk)
+        return sha
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """Appends a chunk stream that must start at the session's current offset."""
+        with self._lock:
+            if upload_id in self._receiving:
+                raise UploadBusyError("Another chunk is being received for this upload")
+            if upload_id in self._completing:
+                raise UploadBusyError("Upload is being completed")
+            # Read while holding the upload, so the offset cannot move before the chunk is written
+            session = self.get(upload_id)
+            if offset != session["offset"]:
+                raise UploadError(f"Offset mismatch: upload is at byte {session['offset']}")
+            self._receiving.add(upload_id)
+        written = offset
+        sha = None
+        try:
+            sha = await asyncio.to_thread(self._hasher_at, upload_id, offset)
+            with open(self._part_path(upload_id), "r+b") as f:
+                f.seek(offset)
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    if written + len(chunk) > session["size"]:
+                        raise UploadTooLargeError("Chunk extends past the declared upload size")
+                    await asyncio.to_thread(f.write, chunk)
+                    sha.update(chunk)
+                    written += len(chunk)
+        finally:
+            # Keep whatever arrived so a dropped connection can resume from the last written byte
+            if written != session["offset"]:
+                with open(self._part_path(upload_id), "r+b") as f:
+                    f.truncate(written)
+                session["offset"] = written
+                self._save(session)
+            with self._lock:
+                if sha is not None:
+                    self._hashers[upload_id] = (written, sha)
+                self._receiving.discard(upload_id)
+        return session
+
+    def complete(self, upload_id: str, final_path: str, expected_sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Moves a fully received upload into place and returns its size and sha256."""
+        with self._lock:
+            # Holding the upload, like append: no chunk can be written to it while it moves, nor a retried complete run
+            if upload_id in self._receiving:
+                raise UploadBusyError("A chunk is still being received for this upload")
+            if upload_id in self._completing:
+                raise UploadBusyError("Upload is already being completed")
+            session = self.get(upload_id)
+            self._completing.add(upload_id)
+        try:
+            if session["offset"] != session["size"]:
+                raise UploadError(f"Upload incomplete: {session['offset']} of {session['size']} bytes received")
+            try:
+                digest = self._hasher_at(upload_id, session["offset"]).hexdigest()
+                if expected_sha256 and expected_sha256.lower() != digest:
+                    raise UploadError("Checksum mismatch")
+                os.replace(self._part_path(upload_id), final_path)
+            except FileNotFoundError: # Purged meanwhile
+                raise UploadNotFoundError("Unknown upload")
+            self._discard(upload_id)
+        finally:
+            with self._lock:
+                self._completing.discard(upload_id)
+        return {"size": session["size"], "sha256": digest}
+
+    def _discard(self, upload_id: str):
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+        for path in (self._meta_path(upload_id), self._part_path(upload_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def purge_expired(self, ttl: int = UPLOAD_SESSION_TTL):
+        """Drops sessions that have not been completed within ttl seconds."""
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            upload_id = name[:-len(".json")]
+            try:
+                session = self.get(upload_id)
+            except Exception:
+                continue
+            if now - session["created_at"] > ttl:
+                logger.info(f"Purging expired upload {upload_id}")
+                self._discard(upload_id)
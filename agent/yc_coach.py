@@ -1,9 +1,18 @@
-from typing import  Any, List
+import os
+import asyncio
+import logging
+from typing import  Any, AsyncIterator, Dict, List, Optional
 from langchain.prompts import ChatPromptTemplate
-from langchain_deepseek import ChatDeepSeek
-from dotenv import load_dotenv
 
-load_dotenv()
+from llm import llm_clients
+from project_store import ProjectStore, format_event
+
+logger = logging.getLogger(__name__)
+
+# Recent events sent verbatim with each prompt; older ones are folded into the project summary
+YC_PROMPT_EVENT_TOKENS = int(os.getenv("YC_PROMPT_EVENT_TOKENS", "1500"))
+# Profile of callers without a project of their own. Shared by all of them, so it never keeps events
+SHARED_PROJECT = "default"
 
 
 project = {
@@ -24,36 +33,8 @@ project = {
     }
 }
 
-def get_project(project_name: str) -> dict:
-    return project.get(project_name, None)
-
-class YCCoach:
-    def __init__(self):
-        self.llm = ChatDeepSeek(
-            temperature=0.3,
-            api_base="https://api.siliconflow.cn/v1", 
-            model="deepseek-ai/DeepSeek-V3"
-        )
-    
-    def suggest_next_steps(self, 
-                          project_purpose: str, 
-                          user_personality: str, 
-                          current_event_logs: str
-                          ) -> str:
-        """
-        你是一个专业的YC教练，你已经指导过数百个成功的创业项目，你已经知道如何帮助用户找到最适合他们的下一步行动。
-        
-        Args:
-            project_purpose (str): 终点，一般不发生改变
-            user_personality (str): 用户的性格特点， 可能随着项目发生改变
-            current_event_logs (str): 目前所在位置， 发生改变
-            
-        Returns:
-            str: 推荐的下一步行动计划
-        """
-        
-        # 创建提示模板
-        template = """你是一个纳瓦尔和 萨希尔·拉文吉亚， 你们写过纳瓦尔宝典和小而美， 有些人想和你们谈心解决问题， 请你基于他们提供的内容，帮助他们
+# 提示模板
+COACH_TEMPLATE = """你是一个纳瓦尔和 萨希尔·拉文吉亚， 你们写过纳瓦尔宝典和小而美， 有些人想和你们谈心解决问题， 请你基于他们提供的内容，帮助他们
         你唯一能提供的帮助是， 给出他们下一步做什么，并且在3个小时能够获取反馈
 
 用户信息
@@ -73,21 +54,162 @@ class YCCoach:
 
 请直接给出具体的下一步行动建议，不要有多余的解释。建议应该简洁明了，富有激励性。
 """
+
+
+# 摘要模板
+SUMMARY_TEMPLATE = """你在帮助一位创业者记录项目进展。请把已有的摘要和新的记录合并成一份新的摘要
+1. 保留目标、已完成的事情、遇到的问题、做过的决定和用户的状态变化
+2. 删除重复和不重要的细节，不超过300字
+3. 只输出摘要，不需要其他内容
+
+已有摘要: {summary}
+
+新的记录:
+{events}
+"""
+
+# The dict above seeds the store the first time it is created
+project_store = ProjectStore(seed=project)
+
+
+def get_project(project_name: str) -> Optional[dict]:
+    return project_store.get_project(project_name)
+
+class YCCoach:
+    def __init__(self, store: ProjectStore = project_store):
+        # Shared process-wide, so connections are pooled across requests
+        self.llm = llm_clients.chat_model(temperature=0.3)
+        self.chain = ChatPromptTemplate.from_template(COACH_TEMPLATE) | self.llm
+        self.summary_chain = ChatPromptTemplate.from_template(SUMMARY_TEMPLATE) | llm_clients.chat_model(temperature=0)
+        self.store = store
+
+    @staticmethod
+    def keeps_history(project_name: Optional[str]) -> bool:
+        """Whether requests for project_name record their events; not for none or the shared profile."""
+        return project_name is not None and project_name != SHARED_PROJECT
+
+    def record_event(self, project_name: str, text: str) -> int:
+        if not self.keeps_history(project_name):
+            raise ValueError(f"Project '{project_name}' keeps no event history")
+        return self.store.append_event(project_name, text)
+
+    def stateless_prompt(self, current_event_logs: str) -> Dict[str, str]:
+        """Prompt variables for a caller without a project: the shared profile and only the logs it sent."""
+        profile = self.store.get_project(SHARED_PROJECT) or {}
+        return {
+            "project_purpose": profile.get("project_purpose", ""),
+            "user_personality": profile.get("user_personality", ""),
+            "current_event_logs": current_event_logs,
+        }
+
+    def project_prompt(self, project_name: str) -> Optional[Dict[str, str]]:
+        """
+        Prompt variables for a stored project: its summary plus the newest events within
+        YC_PROMPT_EVENT_TOKENS, so the prompt stays the same size however long the log grows.
+        """
+        project = self.store.get_project(project_name)
+        if project is None:
+            return None
+        parts = []
+        if project["summary"]:
+            parts.append(f"之前的进展摘要: {project['summary']}")
+        events = self.store.prompt_events(project_name, YC_PROMPT_EVENT_TOKENS)
+        if events:
+            parts.append("最近的记录:\n" + "\n".join(format_event(event) for event in events))
+        return {
+            "project_purpose": project["project_purpose"],
+            "user_personality": project["user_personality"],
+            "current_event_logs": "\n".join(parts),
+        }
+
+    async def asummarize(self, project_name: str) -> bool:
+        """
+        Folds the events that no longer fit in the prompt into the project summary. Only those
+        events and the previous summary are sent, so each run costs the same however long the log is.
+        """
+        project = await asyncio.to_thread(self.store.get_project, project_name)
+        if project is None:
+            return False
+        kept = await asyncio.to_thread(self.store.prompt_events, project_name, YC_PROMPT_EVENT_TOKENS)
+        events = await asyncio.to_thread(self.store.unsummarized_events, project_name)
+        older = [event for event in events if kept and event["id"] < kept[0]["id"]]
+        if not older:
+            return False
+        try:
+            result = await llm_clients.ainvoke(self.summary_chain, {
+                "summary": project["summary"] or "无",
+                "events": "\n".join(format_event(event) for event in older),
+            })
+        except Exception as e:
+            logger.warning(f"Could not summarize project {project_name}: {e}")
+            return False
+        return await asyncio.to_thread(
+            self.store.set_summary, project_name, result.content.strip(), older[-1]["id"], project["summarized_through"]
+        )
+    
+    def suggest_next_steps(self, 
+                          project_purpose: str, 
+                          user_personality: str, 
+                          current_event_logs: str,
+                          use_cache: bool = True
+                          ) -> str:
+        """
+        你是一个专业的YC教练，你已经指导过数百个成功的创业项目，你已经知道如何帮助用户找到最适合他们的下一步行动。
         
-        prompt = ChatPromptTemplate.from_template(template)
-        
-        # 创建链
-        chain = prompt | self.llm
+        Args:
+            project_purpose (str): 终点，一般不发生改变
+            user_personality (str): 用户的性格特点， 可能随着项目发生改变
+            current_event_logs (str): 目前所在位置， 发生改变
+            use_cache (bool): 相同输入是否复用之前的建议
+            
+        Returns:
+            str: 推荐的下一步行动计划
+        """
         
         # 执行推理
-        result = chain.invoke({
+        variables = {
             "project_purpose": project_purpose,
             "user_personality": user_personality,
             "current_event_logs": current_event_logs,
-        })
+        }
+        key = llm_clients.cache_key(self.llm, COACH_TEMPLATE, variables, use_cache)
+        result = llm_clients.invoke(self.chain, variables, key)
         
         return result.content
 
+    async def asuggest_next_steps(self,
+                                  project_purpose: str,
+                                  user_personality: str,
+                                  current_event_logs: str,
+                                  use_cache: bool = True
+                                  ) -> str:
+        """Async suggest_next_steps, for use inside the event loop; subject to the shared LLM concurrency cap."""
+        variables = {
+            "project_purpose": project_purpose,
+            "user_personality": user_personality,
+            "current_event_logs": current_event_logs,
+        }
+        key = llm_clients.cache_key(self.llm, COACH_TEMPLATE, variables, use_cache)
+        result = await llm_clients.ainvoke(self.chain, variables, key)
+        
+        return result.content
+
+    async def astream_next_steps(self,
+                                 project_purpose: str,
+                                 user_personality: str,
+                                 current_event_logs: str,
+                                 use_cache: bool = True
+                                 ) -> AsyncIterator[str]:
+        """Yields the suggestion as it is generated."""
+        variables = {
+            "project_purpose": project_purpose,
+            "user_personality": user_personality,
+            "current_event_logs": current_event_logs,
+        }
+        key = llm_clients.cache_key(self.llm, COACH_TEMPLATE, variables, use_cache)
+        async for chunk in llm_clients.astream(self.chain, variables, key):
+            yield chunk
+
 
 def test_yc_next_step():
     """
@@ -179,11 +179,24 @@ export default function VideoGeneratorPage() {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(payload),
       });
-      const result = await response.json();
+      let result = await response.json();
       if (!response.ok) {
         throw new Error(result.detail || 'Video generation failed');
       }
-      setGeneratedVideo({ name: result.filename, url: `${API_BASE_URL}${result.url}` }); // Assuming result.url is like /static/videos/filename.mp4
+      // Renders run as background jobs: poll until the job finishes
+      while (result.status !== 'succeeded') {
+        if (result.status === 'failed') {
+          throw new Error(result.error || 'Video generation failed');
+        }
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const jobResponse = await fetch(`${API_BASE_URL}/video/jobs/${result.job_id}`);
+        const job = await jobResponse.json();
+        if (!jobResponse.ok) {
+          throw new Error(job.detail || 'Video generation failed');
+        }
+        result = job;
+      }
+      setGeneratedVideo({ name: result.filename, url: `${API_BASE_URL}${result.url}` }); // result.url is like /media/generated_video/filename.mp4
       setSuccessMessage(result.message || 'Video generated successfully!');
       
       // Clear images and music after successful generation